@@ -1,3 +1,3 @@
-from .auth import get_current_user, authenticate_user, create_access_token
+from .auth import get_current_user, require_admin, authenticate_user, create_access_token
 
-__all__ = ["get_current_user", "authenticate_user", "create_access_token"]
\ No newline at end of file
+__all__ = ["get_current_user", "require_admin", "authenticate_user", "create_access_token"]
\ No newline at end of file
@@ -88,6 +88,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     - Esta função não consulta um banco; apenas retorna os dados contidos no token.
     - Use esta dependência em rotas que exigem autenticação.
     """
+    return decode_token(token)
+
+
+def decode_token(token: Optional[str]) -> Dict[str, Any]:
+    """
+    Valida um JWT e retorna {"username", "role"}; lança 401 se inválido.
+
+    Usada por get_current_user (header Authorization) e pelo WebSocket do
+    chat, que recebe o token na conexão.
+    """
     if not token:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -104,10 +114,26 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
                 detail="Token inválido"
             )
         # retorno simples com informações mínimas do usuário
-        return {"username": username, "role": payload.get("role", "user")}
+        # ("exp" permite a conexões longas, como o WebSocket, detectar a expiração)
+        return {"username": username, "role": payload.get("role", "user"), "exp": payload.get("exp")}
     except JWTError:
         # token inválido, expirado ou assinatura incorreta
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido"
-        )
\ No newline at end of file
+        )
+
+
+async def require_admin(current_user: dict = Depends(get_current_user)):
+    """
+    Dependência FastAPI para rotas administrativas.
+
+    - Reaproveita get_current_user para validar o token.
+    - Exige a claim 'role' igual a 'admin'; caso contrário, retorna 403.
+    """
+    if current_user.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito a administradores"
+        )
+    return current_user
@@ -44,6 +44,32 @@ class Settings:
         # Pega a senha do admin do .env e remove espaços extras
         self.admin_password: str = os.getenv("ADMIN_PASSWORD", "change_this_password").strip()
 
+        # -----------------------------
+        # Chat via WebSocket
+        # -----------------------------
+        # Perguntas simultâneas por conexão
+        self.ws_max_in_flight: int = int(os.getenv("WS_MAX_IN_FLIGHT", 4))
+        # Prazo para a mensagem de autenticação (primeira mensagem)
+        self.ws_auth_timeout_seconds: float = float(os.getenv("WS_AUTH_TIMEOUT_SECONDS", 10))
+
+        # -----------------------------
+        # Idempotency-Key do /chat
+        # -----------------------------
+        # Por quanto tempo a resposta fica disponível para repetições
+        self.idempotency_ttl_seconds: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 3600))
+        # Validade da reserva de uma execução em andamento (libera se o worker morrer)
+        self.idempotency_lock_seconds: int = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 120))
+        # Quanto uma repetição espera a execução em andamento antes de responder 409
+        self.idempotency_wait_seconds: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 60))
+
+        # -----------------------------
+        # Prazo das perguntas
+        # -----------------------------
+        # Prazo padrão de cada pergunta (histórico, busca, rerank e geração)
+        self.request_deadline_seconds: float = float(os.getenv("REQUEST_DEADLINE_SECONDS", 30))
+        # Maior prazo aceito no header X-Request-Timeout
+        self.request_deadline_max_seconds: float = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", 120))
+
 
 
 # -----------------------------
@@ -0,0 +1,88 @@
+"""
+Prazo (deadline) de uma pergunta e cancelamento pelo cliente.
+
+O prazo é fixado quando a requisição chega: `REQUEST_DEADLINE_SECONDS` ou o
+header `X-Request-Timeout` (segundos, limitado a
+`REQUEST_DEADLINE_MAX_SECONDS`). O mesmo objeto acompanha o pipeline
+(histórico, embeddings, busca, rerank e geração), que divide o tempo
+restante entre as etapas e degrada de forma explícita quando ele não basta
+(ver RAGSystem.answer_query).
+
+O cancelamento (cliente desconectou ou cancelou a pergunta no WebSocket) é
+sinalizado por `cancel()` a partir de outra thread e verificado pelo
+pipeline entre as etapas e a cada trecho da resposta em streaming.
+"""
+import math
+import time
+import threading
+from typing import Optional
+
+from .config import get_settings
+
+TIMEOUT_HEADER = "X-Request-Timeout"
+
+
+class RequestCancelled(Exception):
+    """O cliente desistiu da pergunta (desconexão ou cancelamento)."""
+
+
+class Deadline:
+    """
+    Instante limite (time.monotonic) de uma pergunta e sinal de cancelamento.
+
+    Sem `seconds`, não há prazo: `remaining()` é infinito e `at` é None.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.started_at = time.monotonic()
+        self.seconds = seconds
+        self.at: Optional[float] = None if seconds is None else self.started_at + seconds
+        self._cancelled = threading.Event()
+
+    def budget(self, fraction: float) -> Optional[float]:
+        """Instante em que se esgota a fração `fraction` do prazo (None sem prazo)"""
+        return None if self.at is None else self.started_at + self.seconds * fraction
+
+    def remaining(self, until: Optional[float] = None) -> float:
+        """Segundos até `until` (padrão: o fim do prazo)"""
+        until = self.at if until is None else until
+        return math.inf if until is None else until - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    # -----------------------------
+    # Cancelamento
+    # -----------------------------
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Lança RequestCancelled se o cliente desistiu da pergunta"""
+        if self._cancelled.is_set():
+            raise RequestCancelled()
+
+
+def request_deadline(requested: Optional[str] = None) -> Deadline:
+    """
+    Prazo de uma nova pergunta: o pedido pelo cliente (header
+    X-Request-Timeout) ou o padrão, limitado ao máximo configurado.
+
+    Raises:
+        ValueError: valor do header não é um número positivo
+    """
+    settings = get_settings()
+    seconds = settings.request_deadline_seconds
+    if requested is not None and str(requested).strip():
+        try:
+            seconds = float(requested)
+        except ValueError:
+            raise ValueError(f"{TIMEOUT_HEADER} inválido: {requested!r} (use segundos, ex.: 15)")
+        if not math.isfinite(seconds) or seconds <= 0:
+            raise ValueError(f"{TIMEOUT_HEADER} deve ser positivo")
+    return Deadline(min(seconds, settings.request_deadline_max_seconds))
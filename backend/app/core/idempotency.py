@@ -0,0 +1,146 @@
+"""
+Idempotency-Key do POST /chat.
+
+Clientes e proxies repetem a requisição quando o /chat demora; sem
+proteção, cada repetição roda de novo o pipeline RAG e o LLM. Com o header
+`Idempotency-Key`, a primeira requisição de um usuário com a chave reserva
+a execução no Redis (SET NX com prazo) e as repetições:
+
+- esperam a execução em andamento (no mesmo worker, pelo Future local; em
+  outro worker, consultando o Redis) e devolvem o mesmo resultado;
+- depois de concluída, recebem a resposta gravada (até o TTL expirar).
+
+Uma repetição com a mesma chave e outro conteúdo é rejeitada (422). Se a
+execução original falhar, a reserva é liberada e a repetição executa.
+Sem Redis, a requisição segue sem idempotência.
+"""
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from . import metrics
+from .config import get_settings
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_PREFIX = "ifsc:idem:"
+RUNNING, DONE = "running", "done"
+POLL_INTERVAL = 0.2                            # Espera entre consultas a uma execução de outro worker
+MAX_KEY_LENGTH = 255
+
+# Execuções em andamento neste worker (chave Redis → Future com a resposta)
+_local: Dict[str, asyncio.Future] = {}
+
+
+class IdempotencyError(Exception):
+    """Requisição não pode ser atendida com esta chave (status HTTP e detalhe)."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _redis_key(user: str, key: str) -> str:
+    digest = hashlib.sha256(f"{user}\n{key}".encode("utf-8")).hexdigest()[:32]
+    return f"{IDEMPOTENCY_PREFIX}{digest}"
+
+
+def fingerprint(*parts: Any) -> str:
+    """Impressão digital do conteúdo da requisição (para detectar reuso da chave)"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def _load(redis_key: str) -> Optional[Dict[str, Any]]:
+    raw = redis_client.get(redis_key)
+    return json.loads(raw) if raw else None
+
+
+def _claim(redis_key: str, request_fingerprint: str, lock_seconds: int) -> bool:
+    record = {"status": RUNNING, "fingerprint": request_fingerprint, "started_at": time.time()}
+    return bool(redis_client.set(redis_key, json.dumps(record), nx=True, ex=lock_seconds))
+
+
+async def run(user: str, key: str, request_fingerprint: str,
+              execute: Callable[[], Awaitable[Tuple[Dict[str, Any], bool]]]) -> Tuple[Dict[str, Any], str]:
+    """
+    Executa `execute` uma única vez por (usuário, chave).
+
+    Args:
+        execute: corrotina que retorna (resposta JSON, gravar?); respostas de
+            erro não são gravadas, para que a repetição tente de novo
+
+    Returns:
+        (resposta, origem) com origem "executed", "attached" (esperou a
+        execução em andamento) ou "replayed" (resposta já gravada)
+
+    Raises:
+        IdempotencyError: chave inválida, reutilizada com outro conteúdo
+            ou execução original ainda em andamento após a espera
+    """
+    if not key or len(key) > MAX_KEY_LENGTH or not key.isprintable():
+        raise IdempotencyError(400, f"Idempotency-Key inválida (1 a {MAX_KEY_LENGTH} caracteres imprimíveis)")
+
+    settings = get_settings()
+    redis_key = _redis_key(user, key)
+    wait_until = time.monotonic() + settings.idempotency_wait_seconds
+    attached = False
+
+    while True:
+        local = _local.get(redis_key)
+        if local is not None:
+            attached = True
+            payload = await asyncio.shield(local)
+            if payload is not None:
+                metrics.incr("idempotency.attached")
+                return payload, "attached"
+            continue  # a execução original falhou: tenta reservar de novo
+
+        try:
+            record = _load(redis_key)
+            if record is None:
+                if _claim(redis_key, request_fingerprint, settings.idempotency_lock_seconds):
+                    break
+                continue
+        except Exception as e:
+            logger.warning(f"Idempotência indisponível (Redis): {e}; executando sem proteção")
+            metrics.incr("idempotency.errors")
+            payload, _ = await execute()
+            return payload, "executed"
+
+        if record.get("fingerprint") != request_fingerprint:
+            metrics.incr("idempotency.mismatch")
+            raise IdempotencyError(422, "Idempotency-Key já usada com outra requisição")
+        if record.get("status") == DONE:
+            metrics.incr("idempotency.attached" if attached else "idempotency.replayed")
+            return record["response"], "attached" if attached else "replayed"
+        if time.monotonic() >= wait_until:
+            metrics.incr("idempotency.timeouts")
+            raise IdempotencyError(409, "Requisição com esta Idempotency-Key ainda em andamento")
+        attached = True
+        await asyncio.sleep(POLL_INTERVAL)
+
+    # Execução reservada por esta requisição
+    future = asyncio.get_running_loop().create_future()
+    _local[redis_key] = future
+    payload, store = None, False
+    try:
+        payload, store = await execute()
+        metrics.incr("idempotency.executed")
+        return payload, "executed"
+    finally:
+        _local.pop(redis_key, None)
+        try:
+            if store:
+                record = {"status": DONE, "fingerprint": request_fingerprint, "response": payload}
+                redis_client.set(redis_key, json.dumps(record), ex=settings.idempotency_ttl_seconds)
+            else:
+                redis_client.delete(redis_key)  # falhou: a próxima repetição executa de novo
+        except Exception as e:
+            logger.warning(f"Falha ao gravar resposta idempotente: {e}")
+            metrics.incr("idempotency.errors")
+        future.set_result(payload if store else None)
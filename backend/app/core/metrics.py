@@ -0,0 +1,89 @@
+"""
+Métricas em memória do processo.
+
+Contadores, gauges e tempos simples, thread-safe e sem dependências
+externas. Cada worker mantém suas próprias métricas; o snapshot inclui o
+PID para identificar de qual worker os números vieram.
+"""
+import os
+import time
+import threading
+from collections import defaultdict
+from typing import Dict
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+_gauges: Dict[str, float] = {}
+_timings: Dict[str, Dict[str, float]] = {}
+_started_at = time.time()
+
+
+def incr(name: str, value: float = 1):
+    """Incrementa um contador."""
+    with _lock:
+        _counters[name] += value
+
+
+def set_gauge(name: str, value: float):
+    """Define o valor atual de um gauge."""
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name: str, seconds: float):
+    """Registra uma duração (em segundos) para a métrica `name`."""
+    with _lock:
+        stats = _timings.get(name)
+        if stats is None:
+            stats = _timings[name] = {"count": 0, "sum": 0.0, "max": 0.0}
+        stats["count"] += 1
+        stats["sum"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+
+def ratio(numerator: str, denominator: str) -> float:
+    """Razão entre dois contadores (0.0 se o denominador for zero)."""
+    with _lock:
+        total = _counters.get(denominator, 0)
+        return _counters.get(numerator, 0) / total if total else 0.0
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    Memória do processo atual (Linux): RSS total, PSS (RSS com páginas
+    compartilhadas divididas entre os processos) e a parte compartilhada.
+    """
+    memory: Dict[str, int] = {}
+    fields = {"VmRSS": "rss_bytes", "RssShmem": "shared_bytes", "RssFile": "file_bytes"}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    memory[fields[key]] = int(value.split()[0]) * 1024
+        with open("/proc/self/smaps_rollup") as rollup:
+            for line in rollup:
+                if line.startswith("Pss:"):
+                    memory["pss_bytes"] = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass  # /proc indisponível (ex.: macOS)
+    return memory
+
+
+def snapshot() -> dict:
+    """Retorna uma cópia das métricas deste processo."""
+    memory = process_memory()
+    with _lock:
+        timings = {
+            name: {**stats, "avg": stats["sum"] / stats["count"] if stats["count"] else 0.0}
+            for name, stats in _timings.items()
+        }
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": time.time() - _started_at,
+            "memory": memory,
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": timings,
+        }
@@ -0,0 +1,204 @@
+"""
+Perfilamento sob demanda do pipeline de chat.
+
+Uma requisição perfilada roda sob um profiler por amostragem (thread que lê a
+pilha da thread da requisição a cada N ms, só com a biblioteca padrão) ou
+determinístico (cProfile). O resultado vai para `profiling_dir`:
+
+- `<id>.folded`: pilhas no formato "folded" (flamegraph.pl, speedscope)
+- `<id>.prof`:   estatísticas do cProfile (modo determinístico; snakeviz)
+- `<id>.json`:   metadados e spans dos estágios (StageTimer)
+
+Sem perfilamento ativo o custo é uma leitura de ContextVar por estágio.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import cProfile
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sampling", "deterministic")
+
+
+class SamplingProfiler:
+    """
+    Amostra a pilha de uma thread em intervalos fixos e conta as pilhas
+    distintas (formato folded: "mod.func;mod.func2 N").
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class Profile:
+    """Uma requisição perfilada: spans dos estágios e metadados"""
+
+    def __init__(self, mode: str, meta: Dict[str, Any]):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.mode = mode
+        self.meta = meta
+        self.started_at = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add_span(self, name: str, start: float, duration: float):
+        self.spans.append({
+            "name": name,
+            "start_ms": round((start - self.started_at) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+        })
+
+
+_active: ContextVar[Optional[Profile]] = ContextVar("active_profile", default=None)
+
+
+def should_profile(config, requested: bool = False) -> Optional[str]:
+    """
+    Decide se a requisição será perfilada.
+
+    Returns:
+        "requested" (pedido explícito de um admin), "sampled" (amostragem
+        por `profiling_sample_rate`) ou None
+    """
+    if requested:
+        return "requested"
+    rate = config.profiling_sample_rate
+    if rate > 0 and random.random() < rate:
+        return "sampled"
+    return None
+
+
+def current() -> Optional[Profile]:
+    """Perfil da requisição em andamento (None quando não está sendo perfilada)."""
+    return _active.get()
+
+
+@contextmanager
+def profile(config, **meta):
+    """
+    Executa o bloco sob o profiler configurado e grava o resultado.
+
+    Args:
+        config: IFSCConfig (profiling_mode, profiling_dir, profiling_interval_ms, profiling_keep)
+        **meta: informações extras gravadas no JSON (ex.: usuário, motivo)
+    """
+    session = Profile(config.profiling_mode, meta)
+    token = _active.set(session)
+    sampler, deterministic = None, None
+    if session.mode == "deterministic":
+        deterministic = cProfile.Profile()
+        try:
+            deterministic.enable()
+        except ValueError:  # outro cProfile já ativo no processo (Python 3.12+)
+            deterministic, session.mode = None, "sampling"
+    if deterministic is None:
+        sampler = SamplingProfiler(threading.get_ident(), config.profiling_interval_ms / 1000)
+        sampler.start()
+    try:
+        yield session
+    finally:
+        duration = time.perf_counter() - session.started_at
+        if deterministic is not None:
+            deterministic.disable()
+        if sampler is not None:
+            sampler.stop()
+        _active.reset(token)
+        try:
+            _write(config, session, duration, sampler, deterministic)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar o perfil {session.id}: {e}")
+
+
+def _write(config, session: Profile, duration: float, sampler, deterministic):
+    directory = Path(config.profiling_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = []
+    if sampler is not None:
+        (directory / f"{session.id}.folded").write_text(sampler.folded(), encoding="utf-8")
+        files.append(f"{session.id}.folded")
+    if deterministic is not None:
+        deterministic.dump_stats(str(directory / f"{session.id}.prof"))
+        files.append(f"{session.id}.prof")
+
+    info = {
+        "id": session.id,
+        "mode": session.mode,
+        "created_at": time.time(),
+        "pid": os.getpid(),
+        "duration_ms": round(duration * 1000, 3),
+        "samples": sum(sampler.samples.values()) if sampler is not None else None,
+        "files": files,
+        "spans": session.spans,
+        **session.meta,
+    }
+    (directory / f"{session.id}.json").write_text(json.dumps(info, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info(f"🔬 Perfil {session.id} gravado ({info['duration_ms']:.0f}ms, modo {session.mode})")
+    _prune(directory, config.profiling_keep)
+
+
+def _prune(directory: Path, keep: int):
+    """Mantém apenas os `keep` perfis mais recentes"""
+    metas = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in metas[keep:]:
+        for path in directory.glob(f"{old.stem}.*"):
+            path.unlink(missing_ok=True)
+
+
+def list_profiles(config, limit: int = 50) -> List[Dict[str, Any]]:
+    """Metadados dos perfis mais recentes (sem os spans)."""
+    directory = Path(config.profiling_dir)
+    if not directory.exists():
+        return []
+    metas = sorted(directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)[:limit]
+    profiles = []
+    for path in metas:
+        try:
+            info = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        info["stages"] = len(info.pop("spans", []))
+        profiles.append(info)
+    return profiles
+
+
+def profile_path(config, profile_id: str, suffix: str) -> Optional[Path]:
+    """Arquivo de um perfil (None se não existir ou o id for inválido)."""
+    if not profile_id or "/" in profile_id or profile_id.startswith("."):
+        return None
+    path = Path(config.profiling_dir) / f"{profile_id}.{suffix}"
+    return path if path.is_file() else None
@@ -0,0 +1,111 @@
+"""
+Sinalização entre workers via Redis pub/sub.
+
+Cada processo registra handlers por canal e inicia uma única thread de escuta
+(depois do fork, no startup da aplicação). Mensagens são dicts JSON.
+
+Pub/sub não guarda mensagens: o que for publicado enquanto a conexão está
+caída se perde. Por isso, a cada (re)inscrição os handlers são chamados com
+`{"catch_up": true}` e releem o estado no Redis/disco (índice ativo,
+configuração gravada). Handlers devem ser idempotentes.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------
+# Canais conhecidos
+# -----------------------------
+INDEX_UPDATES_CHANNEL = "ifsc:index_updates"
+CONFIG_UPDATES_CHANNEL = "ifsc:config_updates"
+
+# -----------------------------
+# Estado do listener (por processo)
+# -----------------------------
+_handlers: Dict[str, List[Callable[[dict], None]]] = {}
+_listener_thread: Optional[threading.Thread] = None
+_listener_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def subscribe(channel: str, handler: Callable[[dict], None]):
+    """Registra um handler para mensagens do canal (antes de start_listener)."""
+    with _lock:
+        _handlers.setdefault(channel, [])
+        if handler not in _handlers[channel]:
+            _handlers[channel].append(handler)
+
+
+def publish(channel: str, payload: dict) -> int:
+    """
+    Publica uma mensagem no canal.
+
+    Returns:
+        int: número de processos que receberam a mensagem (0 em caso de erro)
+    """
+    try:
+        return redis_client.publish(channel, json.dumps(payload))
+    except Exception as e:
+        logger.error(f"Erro ao publicar em {channel}: {e}")
+        return 0
+
+
+def _dispatch(message: dict):
+    handlers = _handlers.get(message.get("channel"), [])
+    try:
+        payload = json.loads(message.get("data") or "{}")
+    except (TypeError, ValueError):
+        logger.warning(f"Mensagem inválida em {message.get('channel')}: {message.get('data')!r}")
+        return
+    for handler in handlers:
+        try:
+            handler(payload)
+        except Exception as e:
+            logger.exception(f"Erro no handler de {message.get('channel')}: {e}")
+
+
+def _catch_up():
+    """Chama os handlers de todos os canais para recuperar sinais perdidos"""
+    for channel in list(_handlers):
+        _dispatch({"channel": channel, "data": json.dumps({"catch_up": True})})
+
+
+def _listen_forever():
+    backoff = 1.0
+    while True:
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(*list(_handlers))
+            logger.info(f"📡 Escutando canais: {', '.join(_handlers)}")
+            backoff = 1.0
+            _catch_up()  # inscrito: o que for publicado daqui em diante chega pelo listen()
+            for message in pubsub.listen():
+                _dispatch(message)
+        except Exception as e:
+            logger.warning(f"Conexão pub/sub perdida ({e}); reconectando em {backoff:.0f}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+
+def start_listener():
+    """
+    Inicia a thread de escuta deste processo (idempotente).
+
+    Deve ser chamado depois do fork dos workers (ex.: no startup do FastAPI).
+    """
+    global _listener_thread, _listener_pid
+    with _lock:
+        if not _handlers:
+            return
+        if _listener_thread is not None and _listener_thread.is_alive() and _listener_pid == os.getpid():
+            return
+        _listener_thread = threading.Thread(target=_listen_forever, name="redis-pubsub", daemon=True)
+        _listener_pid = os.getpid()
+        _listener_thread.start()
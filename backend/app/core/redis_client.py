@@ -1,8 +1,10 @@
 import os
+import zlib
 import redis
 import json
 import logging
-from typing import List, Dict
+import msgpack
+from typing import Any, List, Dict, Optional
 
 # -----------------------------
 # Configuração do logger
@@ -13,17 +15,98 @@ logger = logging.getLogger(__name__)
 # Configuração do Redis
 # -----------------------------
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# O cliente só abre conexão no primeiro comando: importar este módulo não
+# depende do Redis estar no ar
 redis_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+# Cliente binário (sem decodificar respostas) para as mensagens codificadas
+redis_binary = redis.Redis.from_url(REDIS_URL)
+
+
+# -----------------------------
+# Testa a conexão com Redis (chamado no startup, não no import)
+# -----------------------------
+def check_connection() -> bool:
+    """
+    Testa se o Redis está ativo e loga o resultado.
+
+    Returns:
+        bool: True se o PING respondeu
+    """
+    try:
+        redis_client.ping()
+        logger.info("✅ Redis conectado com sucesso!")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Erro ao conectar com Redis: {e}")
+        return False
+
+
+# -----------------------------
+# Codificação das mensagens da conversa
+# -----------------------------
+# Cada elemento da lista do histórico começa com um byte de formato:
+#   "{"   → JSON legado (json.dumps da mensagem), lido e nunca mais gravado
+#   0x01  → msgpack de [papel, conteúdo] (+ {demais campos}, se houver)
+#   0x02  → o mesmo, comprimido com zlib (mensagens longas)
+FORMAT_MSGPACK = 0x01
+FORMAT_MSGPACK_ZLIB = 0x02
+COMPRESS_MIN_BYTES = 512                       # Abaixo disso o zlib não compensa
+ROLES = ("user", "assistant", "system")        # Papel gravado como índice nesta tupla
+
+
+def encode_message(msg: Dict[str, Any]) -> bytes:
+    """Mensagem → bytes compactos (msgpack, com zlib se for longa)"""
+    role = msg.get("role")
+    extra = {k: v for k, v in msg.items() if k not in ("role", "content")}
+    item = [ROLES.index(role) if role in ROLES else role, msg.get("content", "")]
+    if extra:
+        item.append(extra)
+    packed = msgpack.packb(item, use_bin_type=True)
+    if len(packed) >= COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(packed, 6)
+        if len(compressed) < len(packed):
+            return bytes([FORMAT_MSGPACK_ZLIB]) + compressed
+    return bytes([FORMAT_MSGPACK]) + packed
+
+
+def decode_message(data: bytes) -> Optional[Dict[str, Any]]:
+    """Bytes de qualquer versão do formato → mensagem (None se desconhecido)"""
+    if not data:
+        return None
+    kind = data[0]
+    if kind == ord("{"):
+        return json.loads(data)
+    if kind == FORMAT_MSGPACK_ZLIB:
+        data = bytes([FORMAT_MSGPACK]) + zlib.decompress(data[1:])
+        kind = FORMAT_MSGPACK
+    if kind != FORMAT_MSGPACK:
+        logger.warning(f"Mensagem com formato desconhecido ({kind:#x}) ignorada")
+        return None
+    item = msgpack.unpackb(data[1:], raw=False)
+    role = item[0]
+    msg = {"role": ROLES[role] if isinstance(role, int) else role, "content": item[1]}
+    if len(item) > 2:
+        msg.update(item[2])
+    return msg
+
 
 # -----------------------------
-# Testa a conexão com Redis
+# Chaves usadas no Redis
 # -----------------------------
-try:
-    redis_client.ping()  # Testa se o Redis está ativo
-    logger.info("✅ Redis conectado com sucesso!")
-except Exception as e:
-    logger.error(f"❌ Erro ao conectar com Redis: {e}")
-    # Se a conexão falhar, vai lançar uma exceção e você poderá tratar fora
+def _history_key(session_id: str) -> str:
+    return f"conversation:{session_id}"
+
+
+def _summary_key(session_id: str) -> str:
+    return f"conversation_summary:{session_id}"
+
+
+def _summary_lock_key(session_id: str) -> str:
+    return f"conversation_summary_lock:{session_id}"
+
+
+def _summary_dirty_key(session_id: str) -> str:
+    return f"conversation_summary_dirty:{session_id}"
 
 
 # -----------------------------
@@ -32,6 +115,10 @@ except Exception as e:
 def get_conversation_history(session_id: str) -> List[Dict]:
     """
     Recupera o histórico de conversa do Redis para uma determinada sessão.
+
+    O histórico é uma lista Redis (uma mensagem codificada por elemento, ver
+    encode_message). Elementos em JSON e chaves antigas, gravadas como uma
+    única string JSON, continuam sendo lidos.
     
     Args:
         session_id (str): identificador único da sessão
@@ -39,9 +126,14 @@ def get_conversation_history(session_id: str) -> List[Dict]:
     Returns:
         List[Dict]: lista de mensagens armazenadas (ou vazia)
     """
+    key = _history_key(session_id)
     try:
-        data = redis_client.get(f"conversation:{session_id}")  # Chave única por sessão
-        return json.loads(data) if data else []  # Retorna lista de mensagens, ou vazia
+        if redis_client.type(key) == "string":  # Formato legado (json.dumps da lista inteira)
+            data = redis_client.get(key)
+            history = json.loads(data) if data else []
+            return history if isinstance(history, list) else [history]
+        messages = (decode_message(item) for item in redis_binary.lrange(key, 0, -1))
+        return [msg for msg in messages if msg is not None]
     except Exception as e:
         logger.error(f"Erro ao recuperar histórico: {e}")
         return []
@@ -52,21 +144,144 @@ def get_conversation_history(session_id: str) -> List[Dict]:
 # -----------------------------
 def store_conversation_history(session_id: str, history: List[Dict], expire_seconds: int = 1800):
     """
-    Armazena o histórico de conversa no Redis.
+    Armazena (sobrescreve) o histórico de conversa no Redis.
     
     Args:
         session_id (str): identificador da sessão
         history (List[Dict]): lista de mensagens
         expire_seconds (int): tempo de expiração em segundos (default 30 min)
     """
+    key = _history_key(session_id)
     try:
-        redis_client.set(f"conversation:{session_id}", json.dumps(history), ex=expire_seconds)
+        pipe = redis_binary.pipeline()
+        pipe.delete(key)
+        if history:
+            pipe.rpush(key, *[encode_message(msg) for msg in history])
+            pipe.expire(key, expire_seconds)
+        pipe.execute()
     except Exception as e:
         logger.error(f"Erro ao armazenar histórico: {e}")
 
 
+def append_conversation_messages(session_id: str, messages: List[Dict], expire_seconds: int = 1800):
+    """
+    Acrescenta mensagens ao final do histórico da sessão (RPUSH atômico).
+
+    Args:
+        session_id (str): identificador da sessão
+        messages (List[Dict]): mensagens a acrescentar
+        expire_seconds (int): tempo de expiração renovado a cada escrita
+    """
+    if not messages:
+        return
+    key = _history_key(session_id)
+    try:
+        if redis_client.type(key) == "string":  # Migra chave legada para lista
+            store_conversation_history(session_id, get_conversation_history(session_id), expire_seconds)
+        pipe = redis_binary.pipeline()
+        pipe.rpush(key, *[encode_message(msg) for msg in messages])
+        pipe.expire(key, expire_seconds)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Erro ao acrescentar histórico: {e}")
+
+
+def trim_conversation_history(session_id: str, drop_count: int):
+    """
+    Remove as `drop_count` mensagens mais antigas do histórico.
+
+    Seguro contra escritas concorrentes: novas mensagens entram sempre no fim
+    da lista, e o LTRIM só descarta o início.
+    """
+    if drop_count <= 0:
+        return
+    try:
+        redis_client.ltrim(_history_key(session_id), drop_count, -1)
+    except Exception as e:
+        logger.error(f"Erro ao podar histórico: {e}")
+
+
+# -----------------------------
+# Resumo incremental da conversa
+# -----------------------------
+def get_conversation_summary(session_id: str) -> str:
+    """
+    Recupera o resumo acumulado da conversa (ou string vazia).
+    """
+    try:
+        return redis_client.get(_summary_key(session_id)) or ""
+    except Exception as e:
+        logger.error(f"Erro ao recuperar resumo: {e}")
+        return ""
+
+
+def store_conversation_summary(session_id: str, summary: str, expire_seconds: int = 1800):
+    """
+    Armazena o resumo acumulado da conversa com o mesmo TTL do histórico.
+    """
+    try:
+        redis_client.set(_summary_key(session_id), summary, ex=expire_seconds)
+    except Exception as e:
+        logger.error(f"Erro ao armazenar resumo: {e}")
+
+
+# Libera o lock só se ainda for de quem o pegou (pode ter expirado e sido
+# pego por outro processo)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+def acquire_summary_lock(session_id: str, token: str, lock_seconds: int) -> bool:
+    """
+    Reserva a atualização do resumo da sessão para um único processo
+    (SET NX com expiração, para não ficar preso se o processo morrer).
+    """
+    try:
+        return bool(redis_client.set(_summary_lock_key(session_id), token, nx=True, ex=lock_seconds))
+    except Exception as e:
+        logger.error(f"Erro ao reservar atualização do resumo: {e}")
+        return False
+
+
+def release_summary_lock(session_id: str, token: str):
+    """Libera a reserva feita com `acquire_summary_lock`."""
+    try:
+        redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, _summary_lock_key(session_id), token)
+    except Exception as e:
+        logger.error(f"Erro ao liberar atualização do resumo: {e}")
+
+
+def mark_summary_dirty(session_id: str, expire_seconds: int):
+    """Pede mais uma atualização do resumo a quem estiver com o lock."""
+    try:
+        redis_client.set(_summary_dirty_key(session_id), "1", ex=expire_seconds)
+    except Exception as e:
+        logger.error(f"Erro ao marcar atualização do resumo pendente: {e}")
+
+
+def take_summary_dirty(session_id: str) -> bool:
+    """Consome a marca de `mark_summary_dirty`; True se havia uma."""
+    try:
+        return redis_client.getdel(_summary_dirty_key(session_id)) is not None
+    except Exception as e:
+        logger.error(f"Erro ao consultar atualização do resumo pendente: {e}")
+        return False
+
+
 # -----------------------------
 # Adiciona métodos ao cliente Redis
 # -----------------------------
 redis_client.get_conversation_history = get_conversation_history
 redis_client.store_conversation_history = store_conversation_history
+redis_client.append_conversation_messages = append_conversation_messages
+redis_client.trim_conversation_history = trim_conversation_history
+redis_client.get_conversation_summary = get_conversation_summary
+redis_client.store_conversation_summary = store_conversation_summary
+redis_client.acquire_summary_lock = acquire_summary_lock
+redis_client.release_summary_lock = release_summary_lock
+redis_client.mark_summary_dirty = mark_summary_dirty
+redis_client.take_summary_dirty = take_summary_dirty
@@ -0,0 +1,57 @@
+"""
+Medição de tempo por estágio de uma requisição.
+"""
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """
+    Cronometra os estágios de uma requisição (ex.: busca, rerank, geração).
+
+    Cada estágio também é registrado nas métricas como `stage.<nome>` e, se a
+    requisição estiver sendo perfilada, como span do perfil.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            metrics.observe(f"stage.{name}", elapsed)
+            session = profiling.current()
+            if session is not None:
+                session.add_span(name, start, elapsed)
+
+    def decision(self, name: str, outcome: str, started_at: float, detail: Optional[str] = None):
+        """
+        Loga uma decisão do pipeline com o tempo gasto para tomá-la.
+
+        `outcome` vira nome de métrica e deve vir de um conjunto fixo
+        ("skipped", "expanded", ...); valores variáveis vão em `detail`, que
+        só aparece no log.
+        """
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        metrics.incr(f"decision.{name}.{outcome}")
+        logger.info(f"🎛️ {name}: {detail or outcome} ({elapsed_ms:.2f}ms)")
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def as_dict(self) -> Dict[str, float]:
+        """Tempos por estágio em milissegundos"""
+        return {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()}
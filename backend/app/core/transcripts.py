@@ -0,0 +1,133 @@
+"""
+Gravação assíncrona (write-behind) de transcrições em um Redis Stream.
+
+As interações respondidas entram numa fila em memória (put_nowait, nunca
+bloqueia a resposta) e uma thread do processo as envia em lotes para um
+stream limitado por XADD MAXLEN ~. Se a fila encher ou o Redis falhar, os
+eventos são descartados e contabilizados nas métricas; a resposta ao usuário
+nunca espera pela gravação.
+
+O consumo do stream fica a cargo de `scripts/export_transcripts.py`.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from . import metrics
+from .redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTS_STREAM = "ifsc:transcripts"
+
+
+class TranscriptWriter:
+    """
+    Fila limitada + thread que descarrega lotes no Redis Stream.
+
+    Args:
+        stream: nome do stream
+        maxlen: tamanho aproximado máximo do stream (XADD MAXLEN ~)
+        buffer_size: capacidade da fila em memória
+        batch_size: eventos enviados por pipeline
+    """
+
+    def __init__(self, stream: str = TRANSCRIPTS_STREAM, maxlen: int = 100_000,
+                 buffer_size: int = 1000, batch_size: int = 100):
+        self.stream = stream
+        self.maxlen = maxlen
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=buffer_size)
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def record(self, event: Dict[str, Any]) -> bool:
+        """
+        Enfileira um evento sem bloquear.
+
+        Returns:
+            bool: False se a fila estava cheia (evento descartado)
+        """
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(event)
+            metrics.incr("transcripts.queued")
+            return True
+        except queue.Full:
+            metrics.incr("transcripts.dropped")
+            return False
+
+    def _ensure_thread(self):
+        # Threads não sobrevivem a fork: cada worker inicia a sua
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)  # fila herdada do pai
+            self._thread = threading.Thread(target=self._run, name="transcripts-writer", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _next_batch(self, timeout: float) -> List[Dict[str, Any]]:
+        try:
+            batch = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for event in batch:
+                pipe.xadd(self.stream, {"data": json.dumps(event, ensure_ascii=False)},
+                          maxlen=self.maxlen, approximate=True)
+            pipe.execute()
+            metrics.incr("transcripts.written", len(batch))
+        except Exception as e:
+            metrics.incr("transcripts.errors", len(batch))
+            logger.warning(f"Falha ao gravar {len(batch)} transcrições em {self.stream}: {e}")
+            time.sleep(1.0)  # evita laço apertado com o Redis fora do ar
+
+    def _run(self):
+        while True:
+            batch = self._next_batch(timeout=1.0)
+            if batch:
+                self._write(batch)
+
+    def flush(self, timeout: float = 2.0):
+        """Envia o que estiver na fila (usado no encerramento do processo)."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            batch = self._next_batch(timeout=0)
+            if not batch:
+                return
+            self._write(batch)
+
+
+_writer: Optional[TranscriptWriter] = None
+
+
+def get_writer(config) -> TranscriptWriter:
+    """Writer do processo (criado na primeira chamada)."""
+    global _writer
+    if _writer is None:
+        _writer = TranscriptWriter(
+            maxlen=config.transcripts_stream_maxlen,
+            buffer_size=config.transcripts_buffer_size,
+            batch_size=config.transcripts_batch_size,
+        )
+        atexit.register(_writer.flush)
+    return _writer
@@ -11,8 +11,10 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse  # Para customizar respostas de erro
 
 # Importação das rotas da aplicação
-from app.routes import auth, chat
+from app.routes import auth, chat, chat_ws, admin
 from app.core.config import get_settings  # Configurações da aplicação (.env, etc)
+from app.core import pubsub               # Sinalização entre workers (Redis pub/sub)
+from app.core.redis_client import check_connection  # Teste de conexão com Redis
 
 # -----------------------------
 # Configuração do logging
@@ -60,6 +62,22 @@ app.add_middleware(
 # -----------------------------
 app.include_router(auth.router, prefix="/auth", tags=["Autenticação"])  # Endpoints de login
 app.include_router(chat.router, tags=["Chat"])  # Endpoints do chat
+app.include_router(chat_ws.router, tags=["Chat"])  # Chat via WebSocket (streaming)
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])  # Endpoints administrativos
+
+# -----------------------------
+# Listeners em segundo plano (iniciados em cada worker)
+# -----------------------------
+@app.on_event("startup")
+async def start_background_listeners():
+    check_connection()
+    from app.services.chat_system import config, handle_index_update, reload_if_stale
+    from app.services.runtime_config import handle_config_update, load_and_apply
+    load_and_apply(config)  # ajustes feitos pelo admin antes deste worker subir
+    reload_if_stale()       # índice herdado do pai pode ser de uma versão já substituída
+    pubsub.subscribe(pubsub.INDEX_UPDATES_CHANNEL, handle_index_update)
+    pubsub.subscribe(pubsub.CONFIG_UPDATES_CHANNEL, handle_config_update)
+    pubsub.start_listener()
 
 # -----------------------------
 # Endpoint raiz
@@ -95,15 +113,5 @@ if __name__ == "__main__":
         reload=True      # reload automático para desenvolvimento
     )
 
-# producao
-'''
-
-if __name__ == "__main__":
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=False,     # sem reload
-        workers=4         # múltiplos workers (se não usar Gunicorn)
-    )
-'''
\ No newline at end of file
+# producao: gunicorn -c gunicorn.conf.py app.main:app
+# (pre-fork: índices carregados uma vez no processo pai; ver gunicorn.conf.py)
\ No newline at end of file
@@ -1,7 +1,7 @@
 """
 Modelos Pydantic para o sistema de chat
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -30,9 +30,16 @@ class SystemStats(BaseModel):
     cost_per_request: float
 
 class ConfigUpdate(BaseModel):
-    temperature: Optional[float] = None
-    max_response_tokens: Optional[int] = None
-    retriever_k: Optional[int] = None
+    temperature: Optional[float] = Field(None, ge=0.0, le=2.0)
+    max_response_tokens: Optional[int] = Field(None, ge=16, le=4096)
+    retriever_k: Optional[int] = Field(None, ge=1, le=100)
+    reset: bool = False  # Descarta os ajustes anteriores antes de aplicar este
+
+    @model_validator(mode="after")
+    def require_change(self):
+        if not self.reset and not self.model_dump(exclude_none=True, exclude={"reset"}):
+            raise ValueError("Informe ao menos um parâmetro (ou reset=true).")
+        return self
 
 class HealthStatus(BaseModel):
     status: str
@@ -0,0 +1,190 @@
+# -----------------------------
+# Importações necessárias
+# -----------------------------
+import os
+import logging
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+
+from ..auth.auth import require_admin                        # Restringe acesso a role 'admin'
+from ..core.pubsub import publish, INDEX_UPDATES_CHANNEL, CONFIG_UPDATES_CHANNEL  # Sinalização entre workers
+from ..core import metrics                                   # Métricas em memória do worker
+from ..core import profiling                                 # Perfis de requisições do chat
+from ..schemas.admin import IndexRebuildRequest              # Corpo do pedido de reconstrução
+from ..services import index_jobs                            # Fila de jobs de índices (Redis)
+from ..services import runtime_config                        # Ajustes de configuração em tempo de execução
+from ..models.chat_models import ConfigUpdate                # Parâmetros ajustáveis (validados)
+
+router = APIRouter()                  # Roteador para endpoints administrativos
+logger = logging.getLogger(__name__)  # Logger do módulo
+
+
+# -----------------------------
+# Métricas
+# -----------------------------
+@router.get("/metrics")
+async def get_metrics(current_user: dict = Depends(require_admin)):
+    """
+    Retorna contadores, gauges e tempos deste worker (ex.: taxa de acerto da FAQ).
+    """
+    return metrics.snapshot()
+
+
+# -----------------------------
+# Perfis de requisições
+# -----------------------------
+@router.get("/profiles")
+async def list_profiles(limit: int = 50, current_user: dict = Depends(require_admin)):
+    """
+    Perfis mais recentes (pedidos com `X-Profile: 1` ou amostrados por
+    `profiling_sample_rate`).
+    """
+    from ..services.chat_system import config
+
+    return {"dir": config.profiling_dir, "profiles": profiling.list_profiles(config, limit=limit)}
+
+
+@router.get("/profiles/{profile_id}/{kind}")
+async def get_profile_file(profile_id: str, kind: str, current_user: dict = Depends(require_admin)):
+    """
+    Baixa um arquivo do perfil: `folded` (flamegraph), `prof` (cProfile) ou
+    `json` (metadados e spans dos estágios).
+    """
+    from ..services.chat_system import config
+
+    path = profiling.profile_path(config, profile_id, kind) if kind in ("folded", "prof", "json") else None
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Perfil não encontrado")
+    return FileResponse(path, filename=path.name)
+
+
+# -----------------------------
+# Índices vetoriais
+# -----------------------------
+@router.get("/index")
+async def index_status(current_user: dict = Depends(require_admin)):
+    """
+    Retorna as versões de índice carregadas neste worker.
+    """
+    from ..services.chat_system import RAGSystem
+
+    rag_system = RAGSystem._instance
+    if rag_system is None:
+        return {"loaded": False, "pid": os.getpid()}
+    store = rag_system.vectorstore
+    return {
+        "loaded": True,
+        "pid": os.getpid(),
+        "version": store.version,
+        "collections": store.versions,
+    }
+
+
+@router.post("/index/reload")
+async def reload_index(current_user: dict = Depends(require_admin)):
+    """
+    Pede a todos os workers que carreguem a versão ativa (CURRENT) dos índices.
+
+    Cada worker carrega a nova versão em segundo plano, valida e só então
+    troca o índice em uso; requisições em andamento terminam na versão antiga.
+    """
+    payload = {
+        "action": "reload",
+        "requested_by": current_user.get("username"),
+        "requested_at": datetime.utcnow().isoformat(),
+    }
+    receivers = publish(INDEX_UPDATES_CHANNEL, payload)
+    if receivers == 0:
+        # Redis indisponível ou sem ouvintes: recarrega ao menos este worker
+        from ..services.chat_system import handle_index_update
+        handle_index_update(payload)
+    logger.info(f"🔁 Recarga de índices solicitada por {current_user.get('username')} ({receivers} workers notificados)")
+    return {"status": "reload_requested", "workers_notified": receivers}
+
+
+# -----------------------------
+# Configuração em tempo de execução
+# -----------------------------
+@router.get("/config")
+async def get_config(current_user: dict = Depends(require_admin)):
+    """
+    Parâmetros ajustáveis em uso neste worker e a versão da configuração.
+    """
+    from ..services.chat_system import config
+
+    return {"pid": os.getpid(), "version": config.config_version, "values": runtime_config.effective(config)}
+
+
+@router.put("/config")
+async def update_config(update: ConfigUpdate, current_user: dict = Depends(require_admin)):
+    """
+    Altera parâmetros em todos os workers sem redeploy (ex.: reduzir
+    `max_response_tokens` ou `retriever_k` para aliviar carga).
+
+    A nova versão é gravada no Redis e anunciada por pub/sub; cada worker a
+    aplica ao receber o aviso (ou ao subir).
+    """
+    from ..services.chat_system import config
+
+    try:
+        state = runtime_config.save_update(
+            update.model_dump(exclude_none=True, exclude={"reset"}), current_user.get("username"), reset=update.reset
+        )
+    except Exception as e:
+        logger.error(f"Erro ao gravar configuração: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Redis indisponível")
+
+    receivers = publish(CONFIG_UPDATES_CHANNEL, {"version": state["version"]})
+    runtime_config.apply(config, state)  # este worker não espera o pub/sub
+    logger.info(f"⚙️ Configuração v{state['version']} publicada por {current_user.get('username')}: {state['overrides']}")
+    return {**state, "values": runtime_config.effective(config), "workers_notified": receivers}
+
+
+# -----------------------------
+# Jobs de reconstrução (executados por scripts/index_worker.py)
+# -----------------------------
+@router.post("/index/rebuild", status_code=status.HTTP_202_ACCEPTED)
+async def rebuild_index(
+    request: Optional[IndexRebuildRequest] = None,
+    current_user: dict = Depends(require_admin),
+):
+    """
+    Enfileira a reconstrução das coleções pedidas (ou de todas).
+
+    O trabalho roda no worker de índices, fora dos servidores da API; ao
+    terminar, o worker publica o sinal de recarga. Acompanhe por GET /admin/jobs/{id}.
+    """
+    collections = request.collections if request else None
+    try:
+        return index_jobs.enqueue_rebuild(collections, current_user.get("username"))
+    except Exception as e:
+        logger.error(f"Erro ao enfileirar reconstrução: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Fila de jobs indisponível")
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(require_admin)):
+    """
+    Estado e progresso do job (arquivos lidos, chunks com embeddings, ETA).
+    """
+    job = index_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, current_user: dict = Depends(require_admin)):
+    """
+    Cancela o job: na fila, imediatamente; em execução, no próximo ponto de
+    verificação (a versão incompleta é descartada e o índice ativo não muda).
+    """
+    job = index_jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    if job["status"] in index_jobs.FINAL_STATES:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job já terminou ({job['status']})")
+    logger.info(f"🛑 Cancelamento do job {job_id} solicitado por {current_user.get('username')}")
+    return index_jobs.request_cancel(job_id)
@@ -1,19 +1,24 @@
 # -----------------------------
 # Endpoint de chat comentado
 # -----------------------------
+import asyncio
 import logging
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.concurrency import run_in_threadpool
 import uuid
 
 from ..auth.auth import get_current_user          # Obtém usuário autenticado via token JWT
 from ..schemas.chat import ChatRequest, ChatResponse  # Schemas de request e response
-from ..services.chat_system import process_message   # Função que processa mensagem do usuário
+from ..core import idempotency                    # Idempotency-Key (repetições do cliente)
+from ..core.deadline import TIMEOUT_HEADER, Deadline, RequestCancelled, request_deadline
+# process_message (e o pipeline RAG) é importado no primeiro uso: ver get_process_message
 
 router = APIRouter()                              # Roteador para endpoints de chat
 logger = logging.getLogger(__name__)              # Logger do módulo
 
 _process_message_fn = None                        # Armazena função process_message carregada
+DISCONNECT_POLL_SECONDS = 0.5                     # Intervalo entre verificações de desconexão do cliente
 
 def get_process_message():
     """
@@ -34,22 +39,38 @@ def get_process_message():
         raise ImportError("Não foi possível importar process_message do chat_system.py")
     return _process_message_fn
 
+async def cancel_on_disconnect(request: Request, deadline: Deadline):
+    """Cancela a pergunta se o cliente desconectar antes da resposta"""
+    while not deadline.cancelled:
+        if await request.is_disconnected():
+            logger.info("🔌 Cliente desconectou; cancelando a pergunta")
+            deadline.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(
     request: ChatRequest,                          # Dados da mensagem do usuário
-    request_raw: Request,                          # Para acessar JSON cru enviado
+    request_raw: Request,                          # Headers e detecção de desconexão do cliente
+    response: Response,                            # Para headers extras (ex.: X-Profile-Id)
     current_user: dict = Depends(get_current_user) # Usuário autenticado
 ):
     """
     Recebe mensagem do usuário, processa com process_message e retorna resposta.
-    """
 
-    # Log do JSON cru recebido (debug)
-    try:
-        raw = await request_raw.json()
-        logger.info(f"RAW BODY: {raw}")
-    except Exception:
-        logger.info("RAW BODY: <não conseguiu ler json bruto>")
+    Admins podem enviar `X-Profile: 1` para perfilar a requisição; o id do
+    perfil volta no header `X-Profile-Id` (ver GET /admin/profiles).
+
+    Com o header `Idempotency-Key`, repetições da requisição (timeout do
+    cliente ou do proxy) esperam a execução em andamento ou recebem a
+    resposta gravada, com `Idempotent-Replayed: true` (ver core/idempotency.py).
+
+    O header `X-Request-Timeout` (segundos) define o prazo da pergunta
+    (padrão REQUEST_DEADLINE_SECONDS); perto do prazo a resposta é
+    degradada (campo `degraded`). Se o cliente desconectar, o processamento
+    é interrompido na etapa seguinte; com `Idempotency-Key` ele continua,
+    para que a repetição do cliente receba a resposta gravada.
+    """
 
     # Verifica autenticação
     if not current_user or not current_user.get("username"):
@@ -60,36 +81,94 @@ async def chat_endpoint(
 
     logger.info(f"🔎 Payload unificado -> message='{request.message}' (raw content='{request.content}')")
 
+    # O prazo começa a contar na chegada da requisição
     try:
-        logger.info(f"💬 Pergunta recebida de {current_user.get('username', 'usuário desconhecido')}: '{request.message[:80]}...'")
+        deadline = request_deadline(request_raw.headers.get(TIMEOUT_HEADER))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-        # Gera session_id se não fornecido
-        session_id = request.conversation_id or str(uuid.uuid4())
-        logger.info(f"📚 Histórico recebido ({len(request.history or [])}): {request.history}")
+    # Com Idempotency-Key, a desconexão costuma ser o timeout de um cliente
+    # ou proxy que vai repetir a requisição: a execução vai até o fim e a
+    # resposta fica gravada para a repetição (cancelar faria a repetição
+    # rodar o pipeline inteiro de novo)
+    idempotency_key = request_raw.headers.get("Idempotency-Key")
 
-        # Obtém função de processamento
-        process_message_fn = get_process_message()
+    async def execute():
+        """Roda o pipeline; retorna (resposta JSON, se pode ser gravada para repetições)"""
+        try:
+            logger.info(f"💬 Pergunta recebida de {current_user.get('username', 'usuário desconhecido')}: '{request.message[:80]}...'")
 
-        # Chama process_message com mensagem, usuário e histórico
-        response_obj = process_message_fn(
-            message=request.message,
-            conversation_id=request.conversation_id,
-            user=current_user.get("username"),
-            history=request.history
-        )
+            # Gera session_id se não fornecido
+            session_id = request.conversation_id or str(uuid.uuid4())
+            logger.info(f"📚 Histórico recebido: {len(request.history or [])} mensagens")
 
-        # Pega texto de resposta
-        response_text = response_obj.get("response") or "Não foi possível gerar uma resposta no momento."
-        logger.info(f"✅ Resposta gerada: '{response_text[:80]}...'")
+            # Obtém função de processamento
+            process_message_fn = get_process_message()
 
-        # Retorna resposta ao cliente
-        return ChatResponse(
-            response=response_text,
-            content=response_text,
-            conversation_id=session_id,
-            timestamp=datetime.utcnow()
-        )
+            # Chama process_message (em uma thread, sem bloquear o event loop)
+            # com mensagem, usuário e histórico; sem Idempotency-Key, a
+            # pergunta é cancelada se o cliente desconectar
+            watcher = None
+            if not idempotency_key:
+                watcher = asyncio.create_task(cancel_on_disconnect(request_raw, deadline))
+            try:
+                response_obj = await run_in_threadpool(
+                    process_message_fn,
+                    message=request.message,
+                    conversation_id=session_id,
+                    user=current_user.get("username"),
+                    history=request.history,
+                    collections=request.collections,
+                    filters=request.filters,
+                    profile=current_user.get("role") == "admin" and request_raw.headers.get("X-Profile") == "1",
+                    deadline=deadline
+                )
+            finally:
+                if watcher is not None:
+                    watcher.cancel()
+            if response_obj.get("profile_id"):
+                response.headers["X-Profile-Id"] = response_obj["profile_id"]
 
-    except Exception as e:
-        logger.exception("Erro ao processar mensagem")
-        raise HTTPException(status_code=500, detail=f"Erro ao gerar resposta: {e}")
\ No newline at end of file
+            # Pega texto de resposta
+            response_text = response_obj.get("response") or "Não foi possível gerar uma resposta no momento."
+            logger.info(f"✅ Resposta gerada: '{response_text[:80]}...'")
+
+            chat_response = ChatResponse(
+                response=response_text,
+                content=response_text,
+                conversation_id=session_id,
+                timestamp=datetime.utcnow(),
+                sources=response_obj.get("sources") or [],
+                response_type=response_obj.get("response_type"),
+                degraded=response_obj.get("degraded") or []
+            )
+            # Erros e trechos devolvidos por falta de tempo não são gravados:
+            # a repetição tenta de novo
+            storable = not response_obj.get("error") and response_obj.get("response_type") != "passages"
+            return chat_response.model_dump(mode="json"), storable
+
+        except RequestCancelled:
+            # 499 (convenção do nginx): ninguém vai ler a resposta
+            raise HTTPException(status_code=499, detail="Cliente desconectou antes da resposta")
+        except Exception as e:
+            logger.exception("Erro ao processar mensagem")
+            raise HTTPException(status_code=500, detail=f"Erro ao gerar resposta: {e}")
+
+    # Idempotency-Key: repetições da mesma requisição reaproveitam a execução
+    if not idempotency_key:
+        payload, _ = await execute()
+        return ChatResponse(**payload)
+
+    request_fingerprint = idempotency.fingerprint(
+        request.message, request.conversation_id, request.collections, request.filters
+    )
+    try:
+        payload, origin = await idempotency.run(
+            current_user["username"], idempotency_key, request_fingerprint, execute
+        )
+    except idempotency.IdempotencyError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if origin != "executed":
+        logger.info(f"♻️ Resposta reaproveitada pela Idempotency-Key ({origin})")
+        response.headers["Idempotent-Replayed"] = "true"
+    return ChatResponse(**payload)
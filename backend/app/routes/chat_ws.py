@@ -0,0 +1,250 @@
+# -----------------------------
+# Chat via WebSocket
+# -----------------------------
+"""
+Canal persistente de chat: `GET /chat/ws` (WebSocket).
+
+A conexão é autenticada uma única vez (token JWT na primeira mensagem) e a
+conversa fica no servidor enquanto o socket estiver aberto: o cliente envia
+só a pergunta, sem reenviar o histórico. O token não é aceito na URL, que
+aparece nos logs de acesso.
+
+Cliente → servidor:
+    {"type": "auth", "token": "...", "conversation_id": "..."}   (primeira mensagem)
+    {"type": "message", "id": "q1", "message": "...", "collections": [...], "filters": {...}, "timeout": 20}
+    {"type": "cancel", "id": "q1"}
+    {"type": "ping"}
+
+Servidor → cliente:
+    {"type": "ready", "conversation_id": "..."}
+    {"type": "start", "id": "q1"}
+    {"type": "token", "id": "q1", "text": "..."}                  (trechos da resposta)
+    {"type": "done", "id": "q1", "response": "...", "sources": [...], "response_type": "...", "degraded": [...], "processing_time": 1.2}
+    {"type": "cancelled", "id": "q1"}
+    {"type": "error", "id": "q1", "detail": "..."}
+    {"type": "pong"}
+
+Várias perguntas podem estar em andamento ao mesmo tempo (até
+WS_MAX_IN_FLIGHT por conexão); as mensagens de resposta trazem o `id` da
+pergunta. Cada pergunta tem seu prazo (`timeout` em segundos, padrão
+REQUEST_DEADLINE_SECONDS). Cancelar uma pergunta (ou fechar a conexão)
+interrompe o processamento na etapa seguinte ou no próximo trecho recebido
+do LLM.
+"""
+import json
+import time
+import uuid
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from ..auth.auth import decode_token
+from ..core import metrics
+from ..core.config import get_settings
+from ..core.deadline import Deadline, RequestCancelled, request_deadline
+from ..schemas.chat import ChatSocketMessage
+from .chat import get_process_message
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CLOSE_UNAUTHORIZED = 4401                         # Códigos 4000-4999 são da aplicação
+
+
+def _coalesce(batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Junta trechos seguidos da mesma pergunta em uma única mensagem"""
+    merged: List[Dict[str, Any]] = []
+    for item in batch:
+        previous = merged[-1] if merged else None
+        if previous and item["type"] == previous["type"] == "token" and item["id"] == previous["id"]:
+            previous["text"] += item["text"]
+        else:
+            merged.append(item)
+    return merged
+
+
+class ChatConnection:
+    """
+    Estado de uma conexão: usuário autenticado, conversa, perguntas em
+    andamento e fila de saída (um único escritor no socket).
+    """
+
+    def __init__(self, websocket: WebSocket, user: Dict[str, Any], conversation_id: str):
+        self.websocket = websocket
+        self.user = user
+        self.conversation_id = conversation_id
+        self.loop = asyncio.get_running_loop()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.deadlines: Dict[str, Deadline] = {}
+
+    # -----------------------------
+    # Saída
+    # -----------------------------
+    def send(self, payload: Dict[str, Any]):
+        self.outbox.put_nowait(payload)
+
+    def send_threadsafe(self, payload: Dict[str, Any]):
+        """Enfileira uma mensagem a partir da thread que processa a pergunta"""
+        self.loop.call_soon_threadsafe(self.outbox.put_nowait, payload)
+
+    async def sender(self):
+        """Envia a fila de saída; trechos acumulados enquanto o socket estava ocupado são agrupados"""
+        try:
+            while True:
+                batch = [await self.outbox.get()]
+                while not self.outbox.empty():
+                    batch.append(self.outbox.get_nowait())
+                for payload in _coalesce(batch):
+                    await self.websocket.send_json(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:  # socket fechado pelo cliente
+            logger.debug(f"Envio pelo WebSocket encerrado: {e}")
+
+    # -----------------------------
+    # Perguntas
+    # -----------------------------
+    @property
+    def token_expired(self) -> bool:
+        exp = self.user.get("exp")
+        return exp is not None and exp < time.time()
+
+    def submit(self, data: Dict[str, Any]):
+        """Valida a pergunta e a processa em segundo plano"""
+        try:
+            message = ChatSocketMessage(**{k: v for k, v in data.items() if k != "type"})
+        except ValidationError as e:
+            self.send({"type": "error", "id": data.get("id"), "detail": "; ".join(err["msg"] for err in e.errors())})
+            return
+        if message.id in self.in_flight:
+            self.send({"type": "error", "id": message.id, "detail": "Já existe uma pergunta em andamento com este id"})
+            return
+        if len(self.in_flight) >= settings.ws_max_in_flight:
+            self.send({"type": "error", "id": message.id,
+                       "detail": f"Limite de {settings.ws_max_in_flight} perguntas simultâneas por conexão"})
+            return
+        try:
+            deadline = request_deadline(message.timeout)
+        except ValueError as e:
+            self.send({"type": "error", "id": message.id, "detail": str(e)})
+            return
+        self.deadlines[message.id] = deadline
+        self.in_flight[message.id] = asyncio.create_task(self.ask(message, deadline))
+
+    def cancel(self, question_id: Optional[str]):
+        if question_id in self.deadlines:
+            self.deadlines[question_id].cancel()
+
+    async def ask(self, message: ChatSocketMessage, deadline: Deadline):
+        """Processa uma pergunta em uma thread, repassando os trechos da resposta"""
+        process_message = get_process_message()
+
+        def on_token(text: str):
+            self.send_threadsafe({"type": "token", "id": message.id, "text": text})
+
+        logger.info(f"💬 [ws] Pergunta {message.id} de {self.user['username']}: '{message.message[:80]}'")
+        self.send({"type": "start", "id": message.id})
+        metrics.incr("ws.messages")
+        try:
+            result = await run_in_threadpool(
+                process_message,
+                message=message.message,
+                conversation_id=self.conversation_id,
+                user=self.user["username"],
+                collections=message.collections,
+                filters=message.filters,
+                on_token=on_token,
+                deadline=deadline,
+            )
+        except RequestCancelled:
+            metrics.incr("ws.cancelled")
+            self.send({"type": "cancelled", "id": message.id})
+            return
+        except Exception as e:
+            logger.exception(f"Erro ao processar pergunta {message.id} pelo WebSocket")
+            self.send({"type": "error", "id": message.id, "detail": f"Erro ao gerar resposta: {e}"})
+            return
+        finally:
+            self.in_flight.pop(message.id, None)
+            self.deadlines.pop(message.id, None)
+
+        self.send({
+            "type": "done",
+            "id": message.id,
+            "response": result.get("response") or "Não foi possível gerar uma resposta no momento.",
+            "sources": result.get("sources") or [],
+            "response_type": result.get("response_type"),
+            "degraded": result.get("degraded") or [],
+            "processing_time": result.get("processing_time", 0),
+        })
+
+    def close(self):
+        """Marca a conexão como encerrada e cancela as perguntas em andamento"""
+        for deadline in self.deadlines.values():
+            deadline.cancel()
+
+
+async def _authenticate(websocket: WebSocket, conversation_id: Optional[str]):
+    """Token da primeira mensagem ({"type": "auth"}); retorna (usuário, conversa)"""
+    try:
+        first = json.loads(await asyncio.wait_for(websocket.receive_text(), settings.ws_auth_timeout_seconds))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=401, detail="Tempo esgotado para autenticação")
+    except ValueError:
+        raise HTTPException(status_code=401, detail="Mensagem de autenticação inválida")
+    if not isinstance(first, dict) or first.get("type") != "auth":
+        raise HTTPException(status_code=401, detail='Envie {"type": "auth", "token": "..."} primeiro')
+    conversation_id = first.get("conversation_id") or conversation_id
+    return decode_token(first.get("token")), conversation_id or str(uuid.uuid4())
+
+
+@router.websocket("/chat/ws")
+async def chat_socket(websocket: WebSocket, conversation_id: Optional[str] = None):
+    """Chat com streaming da resposta em uma conexão autenticada uma única vez"""
+    await websocket.accept()
+    try:
+        user, conversation_id = await _authenticate(websocket, conversation_id)
+    except HTTPException as e:
+        await websocket.close(code=CLOSE_UNAUTHORIZED, reason=str(e.detail))
+        return
+    except WebSocketDisconnect:
+        return
+
+    connection = ChatConnection(websocket, user, conversation_id)
+    sender = asyncio.create_task(connection.sender())
+    metrics.incr("ws.connections")
+    logger.info(f"🔌 WebSocket aberto por {user['username']} (conversa {conversation_id})")
+    connection.send({"type": "ready", "conversation_id": conversation_id})
+
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            if connection.token_expired:
+                await websocket.close(code=CLOSE_UNAUTHORIZED, reason="Token expirado")
+                break
+            try:
+                data = json.loads(raw)
+            except ValueError:
+                connection.send({"type": "error", "detail": "JSON inválido"})
+                continue
+            kind = data.get("type") if isinstance(data, dict) else None
+            if kind == "message":
+                connection.submit(data)
+            elif kind == "cancel":
+                connection.cancel(data.get("id"))
+            elif kind == "ping":
+                connection.send({"type": "pong"})
+            else:
+                connection.send({"type": "error", "detail": f"Tipo de mensagem desconhecido: {kind}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connection.close()
+        sender.cancel()
+        logger.info(f"🔌 WebSocket fechado ({user['username']}, {len(connection.in_flight)} perguntas interrompidas)")
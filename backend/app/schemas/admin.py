@@ -0,0 +1,11 @@
+from pydantic import BaseModel   # BaseModel para schemas
+from typing import Optional, List
+
+# -----------------------------
+# Schema de pedido de reconstrução de índices
+# -----------------------------
+class IndexRebuildRequest(BaseModel):
+    """
+    Coleções a reconstruir pelo worker de índices (vazio = todas).
+    """
+    collections: Optional[List[str]] = None
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, model_validator  # BaseModel para schemas, model_validator para validações pós-criação
-from typing import Optional, List, Dict         # Tipos opcionais e coleções
+from pydantic import BaseModel, Field, model_validator  # BaseModel para schemas, model_validator para validações pós-criação
+from typing import Optional, List, Dict, Union  # Tipos opcionais e coleções
 from datetime import datetime                   # Para timestamps
 
+from ..services.attributes import ATTRIBUTES    # Atributos aceitos em 'filters'
+
 # -----------------------------
 # Schema de requisição de chat
 # -----------------------------
@@ -13,6 +15,8 @@ class ChatRequest(BaseModel):
     content: Optional[str] = None               # Campo alternativo para mensagem
     conversation_id: Optional[str] = None       # Identificador da conversa (para histórico)
     history: Optional[List[Dict[str, str]]] = None  # Histórico de mensagens anteriores
+    collections: Optional[List[str]] = None     # Coleções (shards) onde buscar; padrão todas
+    filters: Optional[Dict[str, Union[str, int, List[Union[str, int]]]]] = None  # Ex.: {"year": 2025, "program": "mestrado"}
 
     @model_validator(mode="after")
     def unify_message(self):
@@ -27,6 +31,47 @@ class ChatRequest(BaseModel):
             raise ValueError("Campo 'message' é obrigatório (ou envie 'content').")
         return self
 
+    @model_validator(mode="after")
+    def check_filters(self):
+        self.filters = normalize_filters(self.filters)
+        return self
+
+
+def normalize_filters(filters: Optional[Dict]) -> Optional[Dict[str, List[str]]]:
+    """
+    Valida os filtros de atributos e normaliza os valores para listas
+    de texto ({"year": 2025} → {"year": ["2025"]}).
+    """
+    if not filters:
+        return filters
+    unknown = set(filters) - set(ATTRIBUTES)
+    if unknown:
+        raise ValueError(f"Filtros desconhecidos: {sorted(unknown)} (use {', '.join(ATTRIBUTES)})")
+    return {
+        name: [str(v) for v in (value if isinstance(value, list) else [value])]
+        for name, value in filters.items()
+    }
+
+# -----------------------------
+# Mensagens do chat via WebSocket
+# -----------------------------
+class ChatSocketMessage(BaseModel):
+    """
+    Pergunta enviada pelo WebSocket ({"type": "message", ...}).
+
+    O histórico não é enviado: a conversa fica no servidor durante a conexão.
+    """
+    id: str = Field(..., min_length=1, max_length=64)  # Identifica a pergunta nas mensagens de resposta
+    message: str = Field(..., min_length=1)
+    collections: Optional[List[str]] = None
+    filters: Optional[Dict[str, Union[str, int, List[Union[str, int]]]]] = None
+    timeout: Optional[float] = Field(None, gt=0, allow_inf_nan=False)  # Prazo da pergunta em segundos (padrão REQUEST_DEADLINE_SECONDS)
+
+    @model_validator(mode="after")
+    def check_filters(self):
+        self.filters = normalize_filters(self.filters)
+        return self
+
 # -----------------------------
 # Schema de resposta de chat
 # -----------------------------
@@ -38,6 +83,9 @@ class ChatResponse(BaseModel):
     content: Optional[str] = None             # Campo alternativo que espelha 'response' se não fornecido
     conversation_id: str                       # ID da conversa (para associar histórico)
     timestamp: datetime                        # Momento em que a resposta foi gerada
+    sources: List[str] = []                    # Documentos usados na resposta
+    response_type: Optional[str] = None        # "rag" (LLM), "faq" (resposta curada), "passages" ou "timeout" (prazo)
+    degraded: List[str] = []                   # Etapas reduzidas para cumprir o prazo (ex.: "rerank_skipped")
 
     @model_validator(mode="after")
     def fill_content(self):
@@ -0,0 +1,84 @@
+"""
+Decisões adaptativas do pipeline de recuperação.
+
+Regras locais e baratas (regex e scores já calculados, sem chamar modelos):
+
+- mensagens de conversa ("oi", "obrigado!") e pedidos sobre a resposta
+  anterior ("pode resumir?") não passam pela busca;
+- o rerank é pulado quando o melhor candidato se destaca claramente;
+- o número de candidatos só cresce quando os scores estão empatados.
+"""
+import re
+from typing import Any, List, Optional, Tuple
+
+from .faq import l2_to_similarity
+from .query_router import score_margin
+
+SMALL_TALK = "small_talk"
+FOLLOW_UP = "follow_up"
+
+# Cumprimentos, agradecimentos, despedidas e confirmações
+SMALL_TALK_PATTERN = re.compile(
+    r"^(oi+|ol[aá]|e a[ií]|hey|bom dia|boa tarde|boa noite|tudo bem|tudo bom|como vai( voc[eê])?|"
+    r"obrigad[oa]s?|muito obrigad[oa]|valeu|agrade[cç]o|grat[oa]|"
+    r"tchau|at[eé] mais|at[eé] logo|falou|"
+    r"ok|okay|certo|beleza|blz|entendi|perfeito|show|legal|[oó]timo|massa)"
+    r"([\s,]+(oi+|ol[aá]|bom dia|boa tarde|boa noite|tudo bem|obrigad[oa]|valeu|muito|tchau|ok|certo|entendi|"
+    r"perfeito|legal|[oó]timo|pela ajuda|mesmo|tamb[eé]m))*$",
+    re.IGNORECASE,
+)
+
+# Pedidos que operam sobre a resposta anterior, sem assunto novo
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(pode |poderia |consegue )?(repetir|repita|resum\w*|simplifi\w*|reformul\w*|traduz\w*|"
+    r"explique melhor|explica melhor|explicar melhor|em outras palavras|n[aã]o entendi|"
+    r"como assim|mais curto|mais simples|em t[oó]picos)([\s,]+(isso|a resposta|a [uú]ltima resposta|por favor))*$",
+    re.IGNORECASE,
+)
+
+MAX_CONVERSATIONAL_WORDS = 8
+
+
+def _normalize(query: str) -> str:
+    return re.sub(r"[!?.…,;:\s]+$", "", query.strip()).strip()
+
+
+def classify_message(query: str, has_history: bool) -> Optional[str]:
+    """
+    Identifica mensagens que não precisam de busca nos documentos.
+
+    Returns:
+        SMALL_TALK, FOLLOW_UP (só quando há histórico) ou None
+    """
+    text = _normalize(query)
+    if not text or len(text.split()) > MAX_CONVERSATIONAL_WORDS:
+        return None
+    if has_history and FOLLOW_UP_PATTERN.match(text):
+        return FOLLOW_UP
+    if SMALL_TALK_PATTERN.match(text):
+        return SMALL_TALK
+    return None
+
+
+def score_spread(candidates: List[Tuple[Any, float]]) -> Optional[float]:
+    """Diferença de similaridade entre o primeiro e o último candidatos."""
+    if len(candidates) < 2:
+        return None
+    return l2_to_similarity(float(candidates[0][1])) - l2_to_similarity(float(candidates[-1][1]))
+
+
+def should_skip_rerank(candidates: List[Tuple[Any, float]], config) -> bool:
+    """Pula o rerank quando o melhor candidato se destaca do segundo."""
+    gap = score_margin(candidates)
+    return gap is not None and gap >= config.adaptive_rerank_skip_gap
+
+
+def should_expand_k(candidates: List[Tuple[Any, float]], k: int, config) -> bool:
+    """
+    Busca mais candidatos só quando a primeira busca veio cheia e com scores
+    praticamente empatados (não há um grupo claro de trechos relevantes).
+    """
+    if k >= config.retriever_candidates_k or len(candidates) < k:
+        return False
+    spread = score_spread(candidates)
+    return spread is not None and spread < config.adaptive_flat_spread
@@ -0,0 +1,326 @@
+"""
+Atributos dos chunks e pré-filtragem da busca vetorial.
+
+Na ingestão cada documento recebe atributos extraídos do caminho do arquivo
+(e, na falta, do início da primeira página; programas vêm dos dois):
+
+- source:   nome do arquivo
+- doc_type: edital, regulamento, resolucao, calendario, faq
+- year:     anos citados (ex.: "2025")
+- program:  mestrado, doutorado, pos_graduacao, graduacao
+
+Os atributos são multivalorados e ficam em um índice de bitmaps ao lado do
+vectorstore (`attributes.npz`): um bitmap compactado (np.packbits) por par
+atributo=valor, com um bit por posição do índice FAISS. Na consulta os
+bitmaps dos valores pedidos são combinados (OU dentro do atributo, E entre
+atributos) e a busca vetorial fica restrita às posições selecionadas
+(faiss.IDSelectorBatch).
+
+Filtros vêm do campo `filters` do ChatRequest (estritos) ou da própria
+pergunta ("edital de mestrado 2025"); filtros deduzidos da pergunta não
+descartam chunks que não têm o atributo (ex.: documento sem ano).
+"""
+import re
+import logging
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+ATTRIBUTES = ("source", "doc_type", "year", "program")
+ATTRIBUTES_FILE = "attributes.npz"
+HEADER_CHARS = 400                             # Início da 1ª página usado quando o caminho não diz nada
+
+DOC_TYPES = {
+    "edital": re.compile(r"\bedita(?:l|is)\b"),
+    "regulamento": re.compile(r"\b(?:regulamento|regimento)\b"),
+    "resolucao": re.compile(r"\b(?:resolucao|portaria)\b"),
+    "calendario": re.compile(r"\bcalendario\b"),
+    "faq": re.compile(r"\b(?:faq|perguntas frequentes)\b"),
+}
+PROGRAMS = {
+    "mestrado": re.compile(r"\bmestrado\b"),
+    "doutorado": re.compile(r"\bdoutorado\b"),
+    "pos_graduacao": re.compile(r"\bpos ?graduacao\b"),
+    "graduacao": re.compile(r"(?<!pos )\bgraduacao\b"),
+}
+YEAR_PATTERN = re.compile(r"(?<!\d)(19[89]\d|20\d{2})(?!\d)")
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos e com separadores de nome de arquivo como espaço"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r"[_\-/\\.]+", " ", text)
+
+
+def normalize_value(attribute: str, value: Any) -> str:
+    """Forma canônica de um valor de filtro ("Pós-Graduação" → "pos_graduacao")"""
+    value = str(value).strip()
+    if attribute == "source":
+        return Path(value).name.lower()
+    return re.sub(r"\W+", "_", normalize_text(value)).strip("_")
+
+
+def _matches(table: Dict[str, re.Pattern], text: str) -> List[str]:
+    return [name for name, pattern in table.items() if pattern.search(text)]
+
+
+def parse_attributes(text: str) -> Dict[str, List[str]]:
+    """Tipo de documento, anos e programas citados em um texto"""
+    text = normalize_text(text)
+    return {
+        "doc_type": _matches(DOC_TYPES, text),
+        "year": list(dict.fromkeys(YEAR_PATTERN.findall(text))),
+        "program": _matches(PROGRAMS, text),
+    }
+
+
+class AttributeExtractor:
+    """
+    Atributos por documento, calculados na primeira página de cada arquivo
+    e copiados para os metadados de todos os seus chunks.
+    """
+
+    def __init__(self):
+        self._by_source: Dict[str, Dict[str, List[str]]] = {}
+
+    def observe_page(self, page: Any):
+        source = page.metadata.get("source", "")
+        if source in self._by_source:
+            return
+        from_path = parse_attributes(source)
+        from_header = parse_attributes(page.page_content[:HEADER_CHARS])
+        # O caminho prevalece; programas se somam (um regulamento de
+        # "mestrado/" pode valer também para o doutorado)
+        attributes = {name: from_path[name] or from_header[name] for name in from_path}
+        attributes["program"] = list(dict.fromkeys(from_path["program"] + from_header["program"]))
+        attributes["source"] = [normalize_value("source", source)] if source else []
+        self._by_source[source] = attributes
+
+    def annotate(self, doc: Any) -> Any:
+        """Copia os atributos do arquivo de origem para os metadados do chunk"""
+        attributes = self._by_source.get(doc.metadata.get("source", ""), {})
+        for name in ("doc_type", "year", "program"):
+            if attributes.get(name):
+                doc.metadata[name] = list(attributes[name])
+        return doc
+
+
+def merge_attributes(kept: Any, duplicate: Any):
+    """
+    Soma ao chunk mantido pela deduplicação os atributos da duplicata
+    removida: o conteúdo também está no documento dela, então filtros por
+    ano ou programa desse documento devem encontrá-lo (a fonte vem de
+    `duplicate_sources`).
+    """
+    for name in ("doc_type", "year", "program"):
+        values = list(dict.fromkeys((kept.metadata.get(name) or []) + (duplicate.metadata.get(name) or [])))
+        if values:
+            kept.metadata[name] = values
+
+
+def chunk_attributes(doc: Any) -> Dict[str, List[str]]:
+    """Valores de cada atributo de um chunk (a partir dos metadados)"""
+    # duplicate_sources guarda "arquivo#pN" (ver dedup._source_ref)
+    sources = [doc.metadata.get("source")] + [
+        re.sub(r"#p\d+$", "", ref) for ref in doc.metadata.get("duplicate_sources") or [] if ref != "N/A"
+    ]
+    return {
+        "source": list(dict.fromkeys(normalize_value("source", source) for source in sources if source)),
+        **{name: list(doc.metadata.get(name) or []) for name in ("doc_type", "year", "program")},
+    }
+
+
+# -----------------------------
+# Índice de bitmaps
+# -----------------------------
+class AttributeIndexBuilder:
+    """
+    Guarda os chunks na ordem de inserção no índice e calcula as posições de
+    cada atributo=valor ao salvar: a deduplicação de um lote posterior pode
+    somar atributos (`merge_attributes`) a um chunk já inserido.
+    """
+
+    def __init__(self):
+        self._docs: List[Any] = []
+
+    @property
+    def count(self) -> int:
+        return len(self._docs)
+
+    def add(self, docs: Iterable[Any]):
+        self._docs.extend(docs)
+
+    def _positions(self) -> Dict[Tuple[str, str], List[int]]:
+        positions: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for position, doc in enumerate(self._docs):
+            for name, values in chunk_attributes(doc).items():
+                for value in values:
+                    positions[(name, value)].append(position)
+        return positions
+
+    def save(self, index_path: Path):
+        import numpy as np
+
+        positions_by_value = self._positions()
+        arrays = {"count": np.array([self.count], dtype="int64")}
+        for (name, value), positions in positions_by_value.items():
+            mask = np.zeros(self.count, dtype=bool)
+            mask[positions] = True
+            arrays[f"{name}={value}"] = np.packbits(mask)
+        np.savez_compressed(str(index_path / ATTRIBUTES_FILE), **arrays)
+        logger.info(f"🏷️ Índice de atributos: {len(positions_by_value)} valores, {self.count} chunks")
+
+
+@dataclass
+class MetadataFilter:
+    """
+    Filtro de atributos de uma consulta.
+
+    `strict=False` (filtros deduzidos da pergunta) mantém os chunks que não
+    têm valor para o atributo filtrado.
+    """
+    values: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+    strict: bool = True
+
+    def __bool__(self) -> bool:
+        return bool(self.values)
+
+    def describe(self) -> str:
+        kind = "explícito" if self.strict else "da pergunta"
+        parts = [f"{name}={'|'.join(values)}" for name, values in self.values.items()]
+        return f"{', '.join(parts)} ({kind})"
+
+
+class AttributeIndex:
+    """Bitmaps carregados de `attributes.npz` (um por atributo=valor)"""
+
+    def __init__(self, count: int, bitmaps: Dict[str, Dict[str, Any]]):
+        import numpy as np
+
+        self.count = count
+        self.bitmaps = bitmaps
+        # Chunks com algum valor para o atributo (para filtros não estritos)
+        self._known = {}
+        for name, values in bitmaps.items():
+            known = np.zeros_like(next(iter(values.values())))
+            for bitmap in values.values():
+                known |= bitmap
+            self._known[name] = known
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bitmap.nbytes for values in self.bitmaps.values() for bitmap in values.values())
+
+    def select(self, metadata_filter: MetadataFilter):
+        """
+        Posições do índice que atendem ao filtro.
+
+        Returns:
+            np.ndarray de int64 (pode ser vazio) ou None quando todas atendem
+        """
+        import numpy as np
+
+        selected = None
+        for name, values in metadata_filter.values.items():
+            bitmaps = self.bitmaps.get(name, {})
+            mask = np.zeros((self.count + 7) // 8, dtype="uint8")
+            for value in values:
+                if value in bitmaps:
+                    mask |= bitmaps[value]
+            if not metadata_filter.strict and name in self._known:
+                mask |= ~self._known[name]
+            elif not metadata_filter.strict:
+                continue  # nenhum chunk tem o atributo: o filtro não restringe nada
+            selected = mask if selected is None else selected & mask
+        if selected is None:
+            return None
+        ids = np.flatnonzero(np.unpackbits(selected, count=self.count))
+        return None if ids.size == self.count else ids.astype("int64")
+
+
+def load_attribute_index(index_path: Path) -> Optional[AttributeIndex]:
+    """Índice de atributos da versão (None em índices antigos, sem o arquivo)"""
+    path = index_path / ATTRIBUTES_FILE
+    if not path.exists():
+        return None
+    try:
+        import numpy as np
+
+        bitmaps: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        with np.load(str(path)) as data:
+            count = int(data["count"][0])
+            for key in data.files:
+                if key != "count":
+                    name, _, value = key.partition("=")
+                    bitmaps[name][value] = data[key]
+        return AttributeIndex(count, dict(bitmaps))
+    except Exception as e:
+        logger.warning(f"Falha ao carregar atributos em {index_path}: {e}")
+        return None
+
+
+# -----------------------------
+# Filtros da requisição / da pergunta
+# -----------------------------
+FilterValues = Dict[str, Union[str, List[str]]]
+
+
+def resolve_filters(explicit: Optional[FilterValues], query: str, config) -> Optional[MetadataFilter]:
+    """
+    Filtro da consulta: os `filters` da requisição (estritos) ou, com
+    `metadata_filters_from_query`, os atributos citados na pergunta.
+    """
+    if explicit:
+        values = {}
+        for name, raw in explicit.items():
+            raw = [raw] if isinstance(raw, str) else raw
+            normalized = tuple(dict.fromkeys(normalize_value(name, value) for value in raw if str(value).strip()))
+            if normalized:
+                values[name] = normalized
+        return MetadataFilter(values, strict=True) if values else None
+    if config.metadata_filters_from_query:
+        parsed = {name: tuple(values) for name, values in parse_attributes(query).items() if values}
+        return MetadataFilter(parsed, strict=False) if parsed else None
+    return None
+
+
+# -----------------------------
+# Busca restrita
+# -----------------------------
+def search_selected(store, rescorer, query_vector: List[float], k: int, ids, oversample: int = 2
+                    ) -> List[Tuple[Any, float]]:
+    """
+    Busca os k vizinhos mais próximos apenas entre as posições `ids`.
+
+    Índices com IDSelector (planos e scalar quantizer) filtram durante a
+    busca; quantizados re-ranqueiam em float32. IndexPQ não aceita seletor:
+    as distâncias exatas das posições selecionadas vêm direto do rescorer.
+    """
+    import faiss
+    import numpy as np
+
+    index = store.index
+    if rescorer is not None and (isinstance(index, faiss.IndexPQ) or ids.size <= k * oversample):
+        distances = rescorer.rescore(query_vector, ids)
+        order = np.argsort(distances)[:k]
+        positions, scores = ids[order], distances[order]
+    else:
+        fetch = min(k * oversample if rescorer is not None else k, ids.size)
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+        scores, positions = index.search(np.asarray([query_vector], dtype="float32"), fetch, params=params)
+        keep = positions[0] >= 0
+        positions, scores = positions[0][keep], scores[0][keep]
+        if rescorer is not None and positions.size:
+            scores = rescorer.rescore(query_vector, positions)
+            order = np.argsort(scores)[:k]
+            positions, scores = positions[order], scores[order]
+
+    return [
+        (store.docstore.search(store.index_to_docstore_id[int(pos)]), float(score))
+        for pos, score in zip(positions, scores)
+    ]
@@ -1,22 +1,28 @@
 import os
+import gc
 import time
 import logging
-from pathlib import Path
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
-import numpy as np
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, List, Dict, Any, Optional, Tuple
+from dataclasses import dataclass, field
 import uuid
 
-# Cliente Redis personalizado para armazenar histórico de conversa
-from ..core.redis_client import redis_client
-
-# Bibliotecas do LangChain para RAG (Retrieval-Augmented Generation)
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import PromptTemplate
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+from ..core import metrics, profiling
+from ..core.deadline import Deadline, RequestCancelled
+from ..core.timing import StageTimer
+from ..core.transcripts import get_writer
+from .conversation_memory import ConversationMemory, estimate_tokens
+from .query_router import QueryRouter
+from .adaptive_retrieval import classify_message, should_expand_k, should_skip_rerank
+from .attributes import MetadataFilter, resolve_filters
+from .retrieval_cache import RetrievalCache
+
+# Módulos pesados (LangChain, OpenAI, FAISS, NumPy) são importados só na
+# inicialização do RAGSystem (primeiro uso ou warm_up), não no import deste
+# módulo: rotas leves como / e /auth/login sobem sem esperar por eles.
+if TYPE_CHECKING:
+    from .outbound import ResilientChatModel
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO)
@@ -30,19 +36,88 @@ class IFSCConfig:
     """Configurações gerais do sistema RAG do IFSC"""
     chunk_size: int = 1000                     # Tamanho máximo de cada chunk de texto
     chunk_overlap: int = 200                   # Sobreposição entre chunks
+    chunker: str = "structured"                # Divisor de chunks: "structured" (pares P:/R:, seções, páginas) ou "recursive"
+    qa_max_chars: int = 3000                   # Pares P:/R: maiores que isso são divididos (pergunta repetida em cada parte)
     retriever_candidates_k: int = 20           # Número de candidatos retornados pelo retriever
     final_docs_k: int = 5                      # Número final de documentos enviados ao LLM
     temperature: float = 0.1                   # Temperatura do LLM para controlar aleatoriedade
     model: str = 'sabia-3.1'                   # Modelo LLM Maritaca
     max_response_tokens: int = 800             # Máximo de tokens na resposta
+    route_enabled: bool = True                 # Envia perguntas simples para o modelo rápido
+    fast_model: str = 'sabiazinho-3'           # Modelo menor/mais rápido para consultas simples
+    fast_max_response_tokens: int = 300        # Máximo de tokens na resposta do modelo rápido
+    route_simple_max_words: int = 12           # Perguntas mais longas vão para o modelo principal
+    route_min_score_margin: float = 0.05       # Margem de similaridade top1-top2 que indica consulta pontual
+    model_prices: Dict[str, Tuple[float, float]] = field(default_factory=lambda: {
+        'sabia-3.1': (5.0, 10.0),              # R$ por 1M tokens (entrada, saída)
+        'sabiazinho-3': (1.0, 3.0),
+    })
     embeddings_model: str = "text-embedding-3-small"  # Modelo para embeddings
+    llm_base_url: str = "https://chat.maritaca.ai/api"  # Endpoint do provedor do LLM
+    llm_timeout_seconds: float = 30.0          # Prazo máximo de cada chamada ao LLM
+    embeddings_timeout_seconds: float = 10.0   # Prazo máximo de cada chamada de embeddings
+    outbound_max_retries: int = 2              # Novas tentativas em erros transitórios
+    retry_base_delay_seconds: float = 0.3      # Base do backoff exponencial (com jitter)
+    retry_max_delay_seconds: float = 3.0       # Teto do backoff entre tentativas
+    hedge_after_seconds: Optional[float] = None  # Dispara 2ª chamada ao LLM após N s (None = desligado)
+    breaker_failure_threshold: int = 5         # Falhas seguidas para abrir o circuit breaker
+    breaker_reset_seconds: float = 30.0        # Tempo aberto antes de testar o provedor de novo
+    fallback_model: Optional[str] = None       # Modelo usado quando o primário falha/está aberto
+    fallback_base_url: Optional[str] = None    # Endpoint do fallback (padrão: llm_base_url)
+    fallback_api_key_env: str = "MARITACA_API_KEY"  # Variável com a chave do fallback
+    http_max_connections: int = 20             # Conexões simultâneas no pool HTTP
+    http_max_keepalive: int = 10               # Conexões ociosas mantidas abertas
+    http_keepalive_expiry: float = 30.0        # Tempo de vida de conexões ociosas
+    http_connect_timeout_seconds: float = 3.0  # Prazo para abrir conexão
+    embedding_dimensions: Optional[int] = None # Dimensão reduzida dos embeddings (ex.: 512); None = nativa
+    index_quantization: str = "none"           # "none", "float16", "int8" ou "pq" (exige reconstrução)
+    pq_subquantizers: int = 64                 # Subquantizadores do PQ (divisor da dimensão)
+    pq_bits: int = 8                           # Bits por código do PQ
+    rescore_oversample: int = 2                # Candidatos extras buscados no índice quantizado
+    metadata_filters_from_query: bool = True   # Restringe a busca por ano/programa/tipo citados na pergunta
+    retrieval_cache_enabled: bool = True       # Reaproveita o resultado da busca (ids e scores) por versão do índice
+    retrieval_cache_size: int = 2048           # Entradas no LRU em memória de cada worker
+    retrieval_cache_ttl_seconds: int = 86400   # Validade das entradas no Redis (segundo nível)
     debug_mode: bool = True                    # Ativa modo debug
+    index_versions_keep: int = 3               # Versões de índice mantidas em disco por coleção
+    history_recent_messages: int = 4           # Mensagens recentes mantidas na íntegra
+    history_token_budget: int = 600            # Orçamento de tokens do histórico no prompt
+    history_message_max_tokens: int = 200      # Limite por mensagem do histórico no prompt
+    summary_max_tokens: int = 250              # Tamanho máximo do resumo da conversa
+    conversation_ttl_seconds: int = 1800       # Expiração do histórico/resumo no Redis
+    faq_enabled: bool = True                   # Responde pares "P:/R:" direto, sem LLM
+    faq_min_similarity: float = 0.92           # Similaridade mínima (cosseno) para usar a FAQ
+    dedup_enabled: bool = True                 # Remove chunks duplicados na ingestão
+    dedup_threshold: float = 0.9               # Similaridade (Jaccard/MinHash) para quase duplicatas
+    dedup_num_perm: int = 64                   # Permutações do MinHash
+    dedup_bands: int = 16                      # Bandas do LSH (num_perm deve ser múltiplo)
+    embed_batch_size: int = 256                # Chunks por chamada de embeddings na ingestão
+    adaptive_retrieval: bool = True            # Pula busca/rerank quando não são necessários
+    adaptive_initial_k: int = 8                # Candidatos da primeira busca (cresce até retriever_candidates_k)
+    adaptive_flat_spread: float = 0.03         # Spread de similaridade abaixo do qual os scores são "empatados"
+    adaptive_rerank_skip_gap: float = 0.08     # Margem top1-top2 a partir da qual o rerank é pulado
+    retrieval_budget_fraction: float = 0.4     # Fração do prazo da pergunta para embeddings, busca e rerank
+    rerank_min_seconds: float = 1.5            # Tempo mínimo restante nessa fração para fazer o rerank
+    generation_min_seconds: float = 6.0        # Com menos tempo que isso para gerar, o contexto é reduzido
+    degraded_final_docs_k: int = 3             # Documentos no contexto quando o tempo de geração é curto
+    llm_first_token_seconds: float = 1.5       # Latência estimada até o 1º token (limita max_tokens ao prazo)
+    llm_tokens_per_second: float = 40.0        # Vazão estimada do LLM (limita max_tokens ao prazo)
+    min_generation_tokens: int = 80            # Abaixo disso não chama o LLM: devolve os trechos encontrados
+    degraded_passages: int = 3                 # Trechos devolvidos quando o LLM não responde no prazo
+    degraded_passage_chars: int = 500          # Tamanho máximo de cada trecho devolvido
+    config_version: int = 0                    # Versão dos ajustes feitos via /admin/config (chave de caches)
+    profiling_sample_rate: float = 0.0         # Fração das requisições perfiladas (0 = só sob pedido)
+    profiling_mode: str = "sampling"           # "sampling" (pilhas folded) ou "deterministic" (cProfile)
+    profiling_interval_ms: float = 5.0         # Intervalo de amostragem do profiler
+    profiling_dir: str = os.getenv("PROFILING_DIR", "profiles")  # Onde os perfis são gravados
+    profiling_keep: int = 200                  # Perfis mantidos em disco
+    transcripts_enabled: bool = True           # Envia interações para o stream de análise (Redis Streams)
+    transcripts_stream_maxlen: int = 100_000   # Tamanho aproximado máximo do stream
+    transcripts_buffer_size: int = 1000        # Fila em memória antes do stream (cheia = descarta)
+    transcripts_batch_size: int = 100          # Eventos por pipeline XADD
 
 config = IFSCConfig()
 
-PDF_PATH = Path("pdfs/")                       # Pasta onde os PDFs e TXTs estão
-VECTOR_DB_PATH = Path("vectorstore/ifsc_geral")# Pasta para armazenar vectorstore
-
 # -----------------------------
 # Prompt padrão para LLM
 # -----------------------------
@@ -57,7 +132,31 @@ PERGUNTA: {question}
 RESPOSTA:
 """
 
-PROMPT_TEMPLATE = PromptTemplate.from_template(SYSTEM_PROMPT)
+@lru_cache(maxsize=None)
+def prompt_templates():
+    """
+    Templates compilados uma única vez (no primeiro uso): sem histórico e
+    com histórico. O histórico entra como variável, então chaves no texto do
+    usuário não quebram o template.
+    """
+    from langchain_core.prompts import PromptTemplate
+
+    return (
+        PromptTemplate.from_template(SYSTEM_PROMPT),
+        PromptTemplate.from_template("HISTÓRICO DA CONVERSA:\n{history}\n\n" + SYSTEM_PROMPT),
+    )
+
+TIMEOUT_MESSAGE = "Desculpe, não consegui consultar os documentos dentro do prazo. Tente novamente."
+PASSAGES_NOTICE = (
+    "⏱️ Não consegui gerar a resposta dentro do prazo. "
+    "Estes são os trechos dos documentos mais relevantes para a sua pergunta:"
+)
+
+
+def _timed_out(error: Exception, deadline: Deadline, until: Optional[float] = None) -> bool:
+    """Falha causada pelo prazo (tempo esgotado ou sem tempo para nova tentativa)"""
+    return isinstance(error, TimeoutError) or deadline.remaining(until) <= 0.5
+
 
 # -----------------------------
 # Sistema RAG (Singleton)
@@ -87,79 +186,66 @@ class RAGSystem:
         if not os.getenv("MARITACA_API_KEY"):
             raise RuntimeError("MARITACA_API_KEY não configurada")
 
-        # Configura embeddings
-        self.embeddings = OpenAIEmbeddings(
-            model=config.embeddings_model,
-            openai_api_key=os.getenv("OPENAI_API_KEY")
-        )
+        from .outbound import ResilientChatModel, ResilientEmbeddings
+        from .vector_shards import ShardedVectorStore
+
+        # Configura embeddings (pool HTTP compartilhado, retry e circuit breaker)
+        self.embeddings = ResilientEmbeddings(config)
 
-        # Cria ou carrega vectorstore
-        self.vectorstore = self._create_or_load_vectorstore(self.embeddings)
-        if not self.vectorstore:
+        # Cria ou carrega os índices de cada coleção
+        self.vectorstore = ShardedVectorStore(self.embeddings, config).load_or_build()
+        if not self.vectorstore.shards:
             raise RuntimeError("⚠️ Não foi possível criar/carregar vectorstore.")
+        self._reload_lock = threading.Lock()
 
         # Inicializa LLM
-        self.llm = ChatOpenAI(
-            model=config.model,
-            temperature=config.temperature,
-            api_key=os.getenv("MARITACA_API_KEY"),
-            base_url="https://chat.maritaca.ai/api",
-            max_tokens=config.max_response_tokens,
-        )
+        self.llm = ResilientChatModel(config)
+        self._llms: Dict[str, "ResilientChatModel"] = {config.model: self.llm}
+        self.router = QueryRouter(config)
+        self.retrieval_cache = RetrievalCache(config)
+
+        # Memória de conversa (resumo incremental + mensagens recentes)
+        self.memory = ConversationMemory(config, summarize_fn=self._summarize)
 
         # Cache interno para QA
       #  self._qa_cache: Dict[str, Dict[str, Any]] = {}
         logger.info("✅ RAGSystem inicializado.")
 
     # -----------------------------
-    # Carregamento ou criação de vectorstore
+    # Troca a quente dos índices
     # -----------------------------
-    def _create_or_load_vectorstore(self, embeddings_model) -> Optional[FAISS]:
-        """Carrega um vectorstore existente ou cria um novo a partir dos documentos"""
-        if VECTOR_DB_PATH.exists() and any(VECTOR_DB_PATH.iterdir()):
-            logger.info("🔁 Carregando vectorstore existente...")
-            try:
-                return FAISS.load_local(str(VECTOR_DB_PATH), embeddings_model, allow_dangerous_deserialization=True)
-            except Exception as e:
-                logger.warning(f"Falha ao carregar vectorstore: {e}. Recriando...")
-
-        # Criando novo vectorstore
-        logger.info("🔧 Criando novo vectorstore a partir de documentos...")
-        all_pages = []
-
-        # Carrega arquivos TXT
-        for txt_file in PDF_PATH.glob("*.txt"):
-            logger.info(f"  📝 Processando TXT: {txt_file.name}")
-            loader = TextLoader(str(txt_file), encoding='utf-8')
-            all_pages.extend(loader.load())
-
-        # Carrega arquivos PDF
-        for pdf_file in PDF_PATH.glob("*.pdf"):
-            logger.info(f"  📖 Processando PDF: {pdf_file.name}")
-            loader = PyPDFLoader(str(pdf_file))
-            all_pages.extend(loader.load())
-
-        if not all_pages:
-            logger.warning("Nenhum documento encontrado para processar.")
-            return None
-
-        # Divide documentos em chunks para embeddings
-        separators = ["\nP: ", "P: ", "\n\n", "\n", ". ", " ", ""]
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.chunk_size,
-            chunk_overlap=config.chunk_overlap,
-            separators=separators,
-            keep_separator=True
-        )
-        documents = text_splitter.split_documents(all_pages)
-        logger.info(f"  → Documentos divididos em {len(documents)} chunks")
-
-        # Cria vectorstore FAISS
-        db = FAISS.from_documents(documents, embeddings_model)
-        VECTOR_DB_PATH.mkdir(parents=True, exist_ok=True)
-        db.save_local(str(VECTOR_DB_PATH))
-        logger.info("💾 Vectorstore salvo com sucesso.")
-        return db
+    def reload_index(self, background: bool = True) -> bool:
+        """
+        Carrega a versão ativa (CURRENT) dos índices e, depois de validada,
+        troca atomicamente o vectorstore em uso.
+
+        Requisições em andamento mantêm a referência à versão anterior e
+        terminam nela; a versão antiga é liberada quando a última delas acaba.
+        """
+        if background:
+            threading.Thread(
+                target=self.reload_index, kwargs={"background": False}, name="index-reload", daemon=True
+            ).start()
+            return True
+
+        from .vector_shards import ShardedVectorStore
+
+        with self._reload_lock:
+            old_store = self.vectorstore
+            new_store = ShardedVectorStore(self.embeddings, config).load_or_build(build_missing=False, reuse=old_store)
+            if new_store.versions == old_store.versions:
+                logger.info("🔁 Índices já estão na versão ativa; nada a trocar.")
+                return False
+            if not new_store.validate():
+                logger.error("❌ Nova versão dos índices falhou na validação; mantendo a atual.")
+                return False
+
+            self.vectorstore = new_store  # atribuição atômica
+            logger.info(f"✅ Índices trocados: {old_store.version} → {new_store.version} ({new_store.versions})")
+
+        del old_store
+        gc.collect()
+        return True
 
     # -----------------------------
     # Expansão de query para melhorar resultados
@@ -185,14 +271,19 @@ class RAGSystem:
     # -----------------------------
     # Reranking simplificado
     # -----------------------------
-    def _rerank_docs(self, query: str, documents: List[Any], top_n: int) -> List[Any]:
-        """Reordena documentos com base na similaridade com a query"""
+    def _rerank_docs(self, query: str, documents: List[Any], top_n: int,
+                     query_embedding: Optional[List[float]] = None,
+                     deadline: Optional[float] = None) -> List[Any]:
+        """Reordena documentos com base na similaridade com a query (até `deadline`, time.monotonic)"""
         if not documents:
             return []
 
+        import numpy as np
+
         try:
-            query_embedding = self.embeddings.embed_query(query)
-            doc_embeddings = self.embeddings.embed_documents([doc.page_content for doc in documents])
+            if query_embedding is None:
+                query_embedding = self.embeddings.embed_query(query, deadline=deadline)
+            doc_embeddings = self.embeddings.embed_documents([doc.page_content for doc in documents], deadline=deadline)
             
             similarities = [np.dot(query_embedding, doc_emb) / (np.linalg.norm(query_embedding) * np.linalg.norm(doc_emb)) for doc_emb in doc_embeddings]
             scored_docs = list(zip(documents, similarities))
@@ -210,73 +301,537 @@ class RAGSystem:
         """Concatena conteúdo dos documentos para formar o contexto do prompt"""
         if not docs:
             return "Nenhum documento relevante foi encontrado."
-        parts = [f"[{doc.metadata.get('source', 'N/A')}]\n{doc.page_content.strip()}" for doc in docs]
+        parts = [f"[{self._context_header(doc)}]\n{doc.page_content.strip()}" for doc in docs]
         return "\n\n---\n\n".join(parts)
 
+    def _context_header(self, doc: Any) -> str:
+        """Fontes do chunk, com página e seção quando o divisor as registrou"""
+        header = "; ".join(self._sources([doc]))
+        if doc.metadata.get("page_number"):
+            header += f", p. {doc.metadata['page_number']}"
+        if doc.metadata.get("section"):
+            header += f" — {doc.metadata['section']}"
+        return header
+
+    def _llm_for(self, model: str) -> "ResilientChatModel":
+        """Cliente do modelo pedido (um por modelo, criado sob demanda)"""
+        llm = self._llms.get(model)
+        if llm is None:
+            from .outbound import ResilientChatModel
+            llm = self._llms.setdefault(model, ResilientChatModel(config, model=model))
+        return llm
+
+    # -----------------------------
+    # Resumo de histórico (executado em segundo plano)
+    # -----------------------------
+    def _summarize(self, prompt: str) -> str:
+        """Gera o resumo da conversa com o LLM, limitado a summary_max_tokens"""
+        response = self.llm.invoke(prompt, max_tokens=config.summary_max_tokens)
+        return response.content
+
     # -----------------------------
     # Resposta principal
     # -----------------------------
-    def answer_query(self, query: str, session_id: Optional[str] = None, history: Optional[List[Dict]] = None) -> Dict[str, Any]:
-        """Processa a query e retorna resposta, contexto, histórico e tempo de processamento"""
+    def answer_query(
+        self,
+        query: str,
+        session_id: Optional[str] = None,
+        history: Optional[List[Dict]] = None,
+        collections: Optional[List[str]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        on_token: Optional[Callable[[str], None]] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> Dict[str, Any]:
+        """
+        Processa a query e retorna resposta, contexto, histórico e tempo de processamento.
+
+        `collections` restringe a busca a um subconjunto de coleções (shards);
+        `filters` a chunks com os atributos pedidos (ver services/attributes.py).
+        Com `on_token`, a resposta do LLM é gerada em streaming e cada trecho
+        é repassado ao callback, que pode lançar RequestCancelled.
+
+        `deadline` limita o tempo da pergunta: embeddings, busca e rerank usam
+        `retrieval_budget_fraction` do prazo e a geração o restante. Quando o
+        tempo não basta, o pipeline degrada (pula o rerank, reduz o contexto,
+        limita max_tokens ou devolve os trechos encontrados sem gerar
+        resposta) e registra o que foi feito em `degraded`. Se o cliente
+        desistir (`deadline.cancel()`), lança RequestCancelled na etapa seguinte.
+        """
         start = time.time()
+        deadline = deadline or Deadline()
+        vectorstore = self.vectorstore  # fixa a versão do índice durante toda a requisição
         if not session_id:
             session_id = str(uuid.uuid4())
 
-        # Recupera histórico do Redis se não fornecido
-        if history is None:
-            history = redis_client.get_conversation_history(session_id) if session_id else []
-
-        # Prepara contexto com histórico
-        history_context = ""
-        if history:
-            for msg in history[-5:]:  # últimas 5 mensagens
-                role = "Usuário" if msg.get("role") == "user" else "Assistente"
-                history_context += f"{role}: {msg.get('content', '')}\n"
+        # Recupera resumo e mensagens recentes do Redis; o histórico enviado
+        # pelo cliente só é usado quando o servidor ainda não tem memória
+        memory = self.memory.load(session_id)
+        recent_messages = memory["messages"] or history or []
+        history_context = self.memory.build_history_context(memory["summary"], recent_messages)
+        deadline.check()
+
+        timer = StageTimer()
+        degraded: List[str] = []
+
+        # Mensagens de conversa ("oi", "obrigado!") e pedidos sobre a resposta
+        # anterior não precisam de busca nos documentos
+        conversational = None
+        if config.adaptive_retrieval:
+            decided_at = time.perf_counter()
+            conversational = classify_message(query, has_history=bool(recent_messages))
+            timer.decision(
+                "busca", "skipped" if conversational else "executed", decided_at,
+                detail=f"pular ({conversational})" if conversational else "executar",
+            )
+
+        query_vector = None
+        if conversational:
+            candidates, final_docs = [], []
+            context = "Nenhum documento consultado: mensagem de conversa, responda com base no histórico."
+        else:
+            metadata_filter = resolve_filters(filters, query, config)
+            if metadata_filter:
+                logger.info(f"🏷️ Filtro de atributos: {metadata_filter.describe()}")
 
-        # Busca e reranking
-        expanded_query = self._expand_query(query)
-        if expanded_query != query:
-            logger.info(f"Query expandida para: '{expanded_query}'")
+            retrieval_until = deadline.budget(config.retrieval_budget_fraction)
+            try:
+                # Atalho de FAQ: pergunta muito próxima de um par "P:/R:" curado
+                # (a FAQ não tem atributos, então não vale com filtro explícito)
+                explicit_filter = metadata_filter is not None and metadata_filter.strict
+                if config.faq_enabled and vectorstore.has_faq and not explicit_filter:
+                    with timer.stage("faq"):
+                        query_vector = vectorstore.embeddings.embed_query(query, deadline=retrieval_until)
+                        faq_result = self._answer_from_faq(vectorstore, query, query_vector, session_id, collections, start)
+                    if faq_result is not None:
+                        return faq_result
+
+                deadline.check()
+                candidates, final_docs = self._retrieve(
+                    vectorstore, query, query_vector, collections, timer, metadata_filter, deadline, degraded
+                )
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                if not _timed_out(e, deadline, retrieval_until):
+                    raise
+                logger.warning(f"⏱️ Busca não terminou no prazo ({type(e).__name__}: {e})")
+                return self._timeout_result(vectorstore, query, session_id, start, timer, degraded)
 
-        candidate_docs = self.vectorstore.similarity_search(expanded_query, k=config.retriever_candidates_k)
-        final_docs = self._rerank_docs(query, candidate_docs, top_n=config.final_docs_k)
+            # Pouco tempo para gerar: menos documentos no contexto (prompt menor, resposta mais rápida)
+            if len(final_docs) > config.degraded_final_docs_k and deadline.remaining() < config.generation_min_seconds:
+                decided_at = time.perf_counter()
+                final_docs = final_docs[:config.degraded_final_docs_k]
+                timer.decision("contexto", "reduced", decided_at, detail=f"reduzir para {len(final_docs)} documentos (prazo)")
+                degraded.append("context_reduced")
+            context = self._optimize_context(final_docs)
 
-        context = self._optimize_context(final_docs)
+        deadline.check()
 
         # Cria prompt final incluindo histórico
+        prompt_template, history_prompt_template = prompt_templates()
         if history_context:
-            prompt_with_history = f"HISTÓRICO DA CONVERSA:\n{history_context}\n\n{SYSTEM_PROMPT}"
-            prompt_template = PromptTemplate.from_template(prompt_with_history)
+            prompt = history_prompt_template.format(history=history_context, context=context, question=query)
         else:
-            prompt_template = PROMPT_TEMPLATE
-            
-        prompt = prompt_template.format(context=context, question=query)
+            prompt = prompt_template.format(context=context, question=query)
+
+        # Escolhe modelo e limite de tokens pela complexidade da pergunta
+        decision = self.router.route(query, candidates, conversational=bool(conversational))
+        logger.info(f"🧭 Rota '{decision.route}' → {decision.model} ({', '.join(decision.reasons)})")
+
+        # Limita a resposta ao que o LLM consegue gerar no tempo restante
+        max_tokens = decision.max_tokens
+        token_budget = (deadline.remaining() - config.llm_first_token_seconds) * config.llm_tokens_per_second
+        if token_budget < max_tokens:
+            decided_at = time.perf_counter()
+            if token_budget < config.min_generation_tokens:
+                timer.decision("geracao", "skipped_deadline", decided_at, detail="pular (prazo)")
+                if final_docs:
+                    return self._passages_result(vectorstore, query, session_id, start, timer, final_docs, degraded)
+                return self._timeout_result(vectorstore, query, session_id, start, timer, degraded)
+            max_tokens = int(token_budget)
+            timer.decision("max_tokens", "capped", decided_at, detail=f"limitar {decision.max_tokens}→{max_tokens} (prazo)")
+            degraded.append("max_tokens_capped")
 
         # Chama LLM para gerar resposta
+        generation_start = time.time()
+        llm_failed = False
         try:
-            response = self.llm.invoke(prompt)
+            with timer.stage("generation"):
+                llm = self._llm_for(decision.model)
+                if on_token is None:
+                    response = llm.invoke(
+                        prompt, deadline=deadline.at, max_tokens=max_tokens, temperature=config.temperature
+                    )
+                else:
+                    def checked_on_token(text: str):
+                        deadline.check()
+                        on_token(text)
+
+                    response = llm.stream(
+                        prompt, checked_on_token, deadline=deadline.at,
+                        max_tokens=max_tokens, temperature=config.temperature
+                    )
             answer_text = response.content
+            self._record_route(decision, prompt, response, time.time() - generation_start)
+        except RequestCancelled:
+            metrics.incr(f"route.{decision.route}.cancelled")
+            raise
         except Exception as e:
+            metrics.incr(f"route.{decision.route}.errors")
+            if final_docs and _timed_out(e, deadline):
+                logger.warning(f"⏱️ LLM não respondeu no prazo ({type(e).__name__}); devolvendo os trechos")
+                return self._passages_result(vectorstore, query, session_id, start, timer, final_docs, degraded)
             logger.error(f"Erro ao chamar LLM:) {e}")
             answer_text = "Desculpe, não consegui processar sua solicitação no momento."
+            llm_failed = True
 
-        # Armazena nova interação no histórico
-        new_history = {"role": "user", "content": query}
-        if session_id:
-            redis_client.store_conversation_history(session_id, new_history, expire_seconds=1800)
+        # Armazena nova interação no histórico; o resumo é atualizado em segundo plano
+        self.memory.append_turn(session_id, query, answer_text)
 
-        return {
+        result = {
             "response": answer_text,
             "context": context,
             "session_id": session_id,
             "processing_time": time.time() - start,
-            "confidence": 0.8  # placeholder
+            "confidence": 0.8,  # placeholder
+            "sources": self._sources(final_docs),
+            "response_type": "rag",
+            "route": decision.route,
+            "model": decision.model,
+            "timings": timer.as_dict(),
+            "degraded": degraded,
+            "error": llm_failed
+        }
+        self._record_transcript(vectorstore, query, result, final_docs)
+        return result
+
+    def _retrieve(self, vectorstore, query: str, query_vector: Optional[List[float]],
+                  collections: Optional[List[str]], timer: StageTimer,
+                  metadata_filter: Optional[MetadataFilter] = None,
+                  deadline: Optional[Deadline] = None,
+                  degraded: Optional[List[str]] = None) -> Tuple[List[Tuple[Any, float]], List[Any]]:
+        """
+        Candidatos e documentos finais, do cache de busca (ver
+        services/retrieval_cache.py) ou de `_search_and_rank`.
+
+        Resultados degradados pelo prazo (rerank pulado) não são guardados.
+        """
+        degraded = degraded if degraded is not None else []
+        if not config.retrieval_cache_enabled:
+            return self._search_and_rank(
+                vectorstore, query, query_vector, collections, timer, metadata_filter, deadline, degraded
+            )
+
+        with timer.stage("retrieval_cache"):
+            cache_key = self.retrieval_cache.key(vectorstore, self._expand_query(query), collections, metadata_filter)
+            cached = self.retrieval_cache.get(vectorstore, cache_key)
+        if cached is not None:
+            candidates, final_docs, tier = cached
+            logger.info(f"📦 Busca reaproveitada do cache ({tier}): {len(final_docs)} documentos")
+            return candidates, final_docs
+
+        degraded_before = len(degraded)
+        candidates, final_docs = self._search_and_rank(
+            vectorstore, query, query_vector, collections, timer, metadata_filter, deadline, degraded
+        )
+        if len(degraded) == degraded_before:
+            self.retrieval_cache.put(vectorstore, cache_key, candidates, final_docs)
+        return candidates, final_docs
+
+    def _search_and_rank(self, vectorstore, query: str, query_vector: Optional[List[float]],
+                         collections: Optional[List[str]], timer: StageTimer,
+                         metadata_filter: Optional[MetadataFilter] = None,
+                         deadline: Optional[Deadline] = None,
+                         degraded: Optional[List[str]] = None) -> Tuple[List[Tuple[Any, float]], List[Any]]:
+        """
+        Busca candidatos e escolhe os documentos finais.
+
+        Com `adaptive_retrieval`, a primeira busca traz `adaptive_initial_k`
+        candidatos e só cresce até `retriever_candidates_k` se os scores
+        estiverem empatados; o rerank é pulado quando o 1º candidato se destaca.
+
+        `query_vector` é o embedding da query original (se já calculado);
+        `metadata_filter` restringe a busca vetorial antes do cálculo dos scores.
+        Com `deadline`, as chamadas de embeddings terminam dentro da fração
+        do prazo reservada à busca e o rerank é pulado (registrado em
+        `degraded`) se restar menos que `rerank_min_seconds` dela.
+        """
+        deadline = deadline or Deadline()
+        degraded = degraded if degraded is not None else []
+        retrieval_until = deadline.budget(config.retrieval_budget_fraction)
+
+        raw_vector = query_vector
+        expanded_query = self._expand_query(query)
+        if expanded_query != query:
+            logger.info(f"Query expandida para: '{expanded_query}'")
+            query_vector = None  # a busca usa a query expandida
+
+        with timer.stage("embedding"):
+            if query_vector is None:
+                query_vector = vectorstore.embeddings.embed_query(expanded_query, deadline=retrieval_until)
+            if expanded_query == query:
+                raw_vector = query_vector
+        deadline.check()
+
+        k = config.retriever_candidates_k
+        if config.adaptive_retrieval:
+            k = min(config.adaptive_initial_k, k)
+        with timer.stage("search"):
+            candidates = vectorstore.similarity_search_with_score(
+                expanded_query, k=k, collections=collections, query_vector=query_vector,
+                metadata_filter=metadata_filter
+            )
+
+        if config.adaptive_retrieval:
+            decided_at = time.perf_counter()
+            expand = should_expand_k(candidates, k, config)
+            timer.decision(
+                "k", "expanded" if expand else "kept", decided_at,
+                detail=f"ampliar {k}→{config.retriever_candidates_k}" if expand else f"manter {k}",
+            )
+            if expand:
+                with timer.stage("search_expanded"):
+                    candidates = vectorstore.similarity_search_with_score(
+                        expanded_query, k=config.retriever_candidates_k, collections=collections,
+                        query_vector=query_vector, metadata_filter=metadata_filter
+                    )
+
+            decided_at = time.perf_counter()
+            skip_rerank = should_skip_rerank(candidates, config)
+            timer.decision(
+                "rerank", "skipped_gap" if skip_rerank else "executed", decided_at,
+                detail="pular (1º candidato destacado)" if skip_rerank else "executar",
+            )
+            if skip_rerank:
+                return candidates, [doc for doc, _ in candidates[:config.final_docs_k]]
+
+        # O rerank embeda todos os candidatos: só roda se couber no prazo da busca
+        if deadline.remaining(retrieval_until) < config.rerank_min_seconds:
+            timer.decision("rerank", "skipped_deadline", time.perf_counter(), detail="pular (prazo)")
+            degraded.append("rerank_skipped")
+            return candidates, [doc for doc, _ in candidates[:config.final_docs_k]]
+
+        deadline.check()
+        with timer.stage("rerank"):
+            final_docs = self._rerank_docs(
+                query, [doc for doc, _ in candidates], top_n=config.final_docs_k,
+                query_embedding=raw_vector, deadline=retrieval_until
+            )
+        return candidates, final_docs
+
+    def _record_route(self, decision, prompt: str, response: Any, elapsed: float):
+        """Registra latência, tokens e custo estimado da rota escolhida"""
+        usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        tokens_in = usage.get("prompt_tokens") or estimate_tokens(prompt)
+        tokens_out = usage.get("completion_tokens") or estimate_tokens(response.content)
+        cost = self.router.estimate_cost(decision.model, tokens_in, tokens_out)
+
+        name = f"route.{decision.route}"
+        metrics.incr(f"{name}.count")
+        metrics.incr(f"{name}.tokens_in", tokens_in)
+        metrics.incr(f"{name}.tokens_out", tokens_out)
+        metrics.incr(f"{name}.cost", cost)
+        metrics.observe(f"{name}.latency", elapsed)
+
+    # -----------------------------
+    # Atalho de FAQ
+    # -----------------------------
+    def _answer_from_faq(self, vectorstore, query, query_vector, session_id, collections, start) -> Optional[Dict[str, Any]]:
+        """Responde com a resposta curada da FAQ se a similaridade passar do limiar"""
+        match = vectorstore.faq_lookup(query_vector, collections)
+        metrics.incr("faq.lookups")
+        if match is None or match[1] < config.faq_min_similarity:
+            metrics.incr("faq.misses")
+            metrics.set_gauge("faq.hit_rate", metrics.ratio("faq.hits", "faq.lookups"))
+            return None
+
+        doc, similarity = match
+        metrics.incr("faq.hits")
+        metrics.set_gauge("faq.hit_rate", metrics.ratio("faq.hits", "faq.lookups"))
+        logger.info(f"❓ FAQ respondeu (similaridade {similarity:.3f}): '{doc.page_content[:80]}'")
+
+        answer_text = doc.metadata["answer"]
+        self.memory.append_turn(session_id, query, answer_text)
+        result = {
+            "response": answer_text,
+            "context": f"P: {doc.page_content}\nR: {answer_text}",
+            "session_id": session_id,
+            "processing_time": time.time() - start,
+            "confidence": similarity,
+            "sources": self._sources([doc]),
+            "response_type": "faq"
         }
+        self._record_transcript(vectorstore, query, result, [doc])
+        return result
+
+    # -----------------------------
+    # Respostas degradadas (prazo esgotado)
+    # -----------------------------
+    def _passages_result(self, vectorstore, query: str, session_id: str, start: float, timer: StageTimer,
+                         docs: List[Any], degraded: List[str]) -> Dict[str, Any]:
+        """Sem tempo para o LLM: devolve os trechos mais relevantes, com aviso"""
+        metrics.incr("deadline.passages")
+        docs = docs[:config.degraded_passages]
+        parts = [PASSAGES_NOTICE]
+        for doc in docs:
+            text = doc.page_content.strip()
+            if len(text) > config.degraded_passage_chars:
+                text = text[:config.degraded_passage_chars].rsplit(" ", 1)[0] + "…"
+            parts.append(f"[{self._context_header(doc)}]\n{text}")
+        answer_text = "\n\n".join(parts)
+
+        self.memory.append_turn(session_id, query, answer_text)
+        result = {
+            "response": answer_text,
+            "context": self._optimize_context(docs),
+            "session_id": session_id,
+            "processing_time": time.time() - start,
+            "confidence": 0.5,
+            "sources": self._sources(docs),
+            "response_type": "passages",
+            "timings": timer.as_dict(),
+            "degraded": degraded + ["passages"],
+            "error": False
+        }
+        self._record_transcript(vectorstore, query, result, docs)
+        return result
+
+    def _timeout_result(self, vectorstore, query: str, session_id: str, start: float, timer: StageTimer,
+                        degraded: List[str]) -> Dict[str, Any]:
+        """Prazo esgotado antes de haver documentos para mostrar (não entra no histórico)"""
+        metrics.incr("deadline.timeouts")
+        result = {
+            "response": TIMEOUT_MESSAGE,
+            "context": "",
+            "session_id": session_id,
+            "processing_time": time.time() - start,
+            "confidence": 0,
+            "sources": [],
+            "response_type": "timeout",
+            "timings": timer.as_dict(),
+            "degraded": degraded + ["timeout"],
+            "error": True
+        }
+        self._record_transcript(vectorstore, query, result, [])
+        return result
+
+    # -----------------------------
+    # Transcrições para análise
+    # -----------------------------
+    def _record_transcript(self, vectorstore, query: str, result: Dict[str, Any], docs: List[Any]):
+        """Enfileira a interação para o stream de análise (não bloqueia)"""
+        if not config.transcripts_enabled:
+            return
+        get_writer(config).record({
+            "ts": time.time(),
+            "session_id": result["session_id"],
+            "query": query,
+            "response": result["response"],
+            "response_type": result.get("response_type"),
+            "route": result.get("route"),
+            "model": result.get("model"),
+            "processing_time": result.get("processing_time"),
+            "timings": result.get("timings", {}),
+            "index_version": vectorstore.version,
+            "config_version": config.config_version,
+            "sources": [
+                {
+                    "source": doc.metadata.get("source"),
+                    "collection": doc.metadata.get("collection"),
+                    "page": doc.metadata.get("page"),
+                }
+                for doc in docs
+            ],
+        })
+
+    @staticmethod
+    def _sources(docs: List[Any]) -> List[str]:
+        """
+        Fontes únicas dos documentos, na ordem em que aparecem, incluindo as
+        fontes de chunks idênticos removidos pela deduplicação
+        """
+        refs = []
+        for doc in docs:
+            refs.append(doc.metadata.get("source", "N/A"))
+            refs.extend(doc.metadata.get("duplicate_sources", []))
+        return list(dict.fromkeys(refs))
+
+# -----------------------------
+# Aquecimento (antes do fork dos workers)
+# -----------------------------
+def warm_up() -> float:
+    """
+    Carrega o RAGSystem (índices, FAQ, clientes) no processo atual.
+
+    No modo de produção é chamado no processo pai antes do fork, para que os
+    workers compartilhem os índices por copy-on-write em vez de carregá-los
+    um a um.
+
+    Returns:
+        float: tempo de carregamento em segundos
+    """
+    start = time.time()
+    RAGSystem.get_instance()
+    elapsed = time.time() - start
+    logger.info(f"🔥 RAGSystem aquecido em {elapsed:.2f}s")
+    return elapsed
+
+# -----------------------------
+# Sinal de nova versão de índice (Redis pub/sub)
+# -----------------------------
+def handle_index_update(payload: Dict[str, Any]):
+    """
+    Handler do canal de atualização de índices: recarrega a versão ativa em
+    segundo plano se o RAGSystem já estiver inicializado neste processo.
+
+    Na reinscrição do pub/sub (`catch_up`) só recarrega se a versão em uso
+    não for mais a ativa.
+    """
+    if RAGSystem._instance is None:
+        return  # será carregado na versão ativa quando inicializar
+    if payload.get("catch_up"):
+        reload_if_stale()
+        return
+    logger.info(f"📡 Sinal de atualização de índice recebido: {payload}")
+    RAGSystem._instance.reload_index(background=True)
+
+
+def reload_if_stale() -> bool:
+    """
+    Recarrega os índices se a versão herdada do processo pai não for mais a
+    ativa (CURRENT).
+
+    Chamado na inicialização de cada worker: workers recriados depois do
+    boot (timeout, crash, max_requests, HUP) nascem com os índices que o pai
+    carregou no warm-up e não receberam os sinais publicados desde então.
+    """
+    if RAGSystem._instance is None:
+        return False  # será carregado na versão ativa quando inicializar
+
+    from .ingestion import current_version
+
+    loaded = RAGSystem._instance.vectorstore.versions
+    stale = {name: version for name, version in loaded.items() if current_version(name) != version}
+    if not stale:
+        return False
+    logger.info(f"🔁 Índices herdados desatualizados ({stale}); recarregando a versão ativa")
+    RAGSystem._instance.reload_index(background=True)
+    return True
 
 # -----------------------------
 # Função principal para processar mensagens (interface pública)
 # -----------------------------
-def process_message(message: str, conversation_id: Optional[str] = None, user: Optional[str] = None, history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+def process_message(
+    message: str,
+    conversation_id: Optional[str] = None,
+    user: Optional[str] = None,
+    history: Optional[List[Dict]] = None,
+    collections: Optional[List[str]] = None,
+    profile: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+    on_token: Optional[Callable[[str], None]] = None,
+    deadline: Optional[Deadline] = None,
+) -> Dict[str, Any]:
     """
     Função principal que processa uma mensagem do usuário usando o RAGSystem.
     
@@ -285,6 +840,11 @@ def process_message(message: str, conversation_id: Optional[str] = None, user: O
         conversation_id: ID da conversa (opcional)
         user: Nome do usuário (opcional, para logs)
         history: Histórico de mensagens (opcional)
+        collections: Coleções onde buscar (opcional, padrão todas)
+        filters: Atributos exigidos dos documentos, ex. {"year": "2025"} (opcional)
+        profile: Perfila esta requisição (além da amostragem configurada)
+        on_token: Recebe os trechos da resposta em streaming (opcional)
+        deadline: Prazo da pergunta e sinal de cancelamento (opcional, padrão sem prazo)
     
     Returns:
         Dict com response, session_id, context, etc.
@@ -296,16 +856,32 @@ def process_message(message: str, conversation_id: Optional[str] = None, user: O
         # Log de início do processamento
         logger.info(f"🔄 Processando mensagem de {user or 'usuário anônimo'}: '{message[:50]}...'")
         
-        # Chama o método answer_query do RAGSystem
-        result = rag_system.answer_query(
-            query=message,
-            session_id=conversation_id,
-            history=history
-        )
+        # Chama o método answer_query do RAGSystem (perfilado se pedido ou amostrado)
+        reason = profiling.should_profile(config, requested=profile)
+        if reason:
+            with profiling.profile(config, reason=reason, user=user, conversation_id=conversation_id) as session:
+                result = rag_system.answer_query(
+                    query=message, session_id=conversation_id, history=history, collections=collections,
+                    filters=filters, on_token=on_token, deadline=deadline
+                )
+            result["profile_id"] = session.id
+        else:
+            result = rag_system.answer_query(
+                query=message,
+                session_id=conversation_id,
+                history=history,
+                collections=collections,
+                filters=filters,
+                on_token=on_token,
+                deadline=deadline
+            )
         
         logger.info(f"✅ Mensagem processada com sucesso em {result.get('processing_time', 0):.2f}s")
         return result
         
+    except RequestCancelled:
+        logger.info(f"⏹️ Pergunta interrompida: o cliente desistiu (conversa {conversation_id})")
+        raise
     except Exception as e:
         logger.exception(f"❌ Erro ao processar mensagem: {e}")
         return {
@@ -313,5 +889,6 @@ def process_message(message: str, conversation_id: Optional[str] = None, user: O
             "session_id": conversation_id or str(uuid.uuid4()),
             "context": "",
             "processing_time": 0,
-            "confidence": 0
+            "confidence": 0,
+            "error": True
         }
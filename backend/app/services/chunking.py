@@ -0,0 +1,198 @@
+"""
+Divisão de páginas em chunks para o índice.
+
+Dois divisores, escolhidos por `config.chunker`:
+
+- "recursive": RecursiveCharacterTextSplitter com tamanho fixo e sobreposição
+  (comportamento original);
+- "structured": respeita a estrutura dos documentos. Cada par "P:/R:" vira um
+  chunk inteiro, títulos de seção (ANEXO I, 2.1 Das inscrições, linhas em
+  caixa alta) abrem um chunk novo e nenhum chunk cruza páginas. O título da
+  seção corrente (que continua valendo nas páginas seguintes do mesmo
+  arquivo) e o número da página ficam nos metadados.
+
+Os divisores processam uma página por vez, para uso no pipeline em streaming
+da ingestão.
+"""
+import re
+from typing import Any, List, Optional
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+CHUNKERS = ("recursive", "structured")
+
+QA_START = re.compile(r"^\s*P:\s*\S")
+ANSWER_START = re.compile(r"^\s*R:\s*")
+
+# Títulos nomeados (CAPÍTULO II, SEÇÃO 3, ANEXO I...) e numerados (2.1 Das inscrições)
+NAMED_HEADING = re.compile(
+    r"^(cap[ií]tulo|se[cç][aã]o|t[ií]tulo|anexo|ap[eê]ndice|parte)\s+[\dIVXLC]+\b", re.IGNORECASE
+)
+NUMBERED_HEADING = re.compile(r"^\d{1,2}(\.\d{1,2})*\.?\s+[A-ZÁÉÍÓÚÂÊÔÃÕÇ]")
+HEADING_MAX_CHARS = 100
+HEADING_MAX_WORDS = 12
+
+
+def is_heading(line: str) -> bool:
+    """Linha curta com cara de título de seção."""
+    line = line.strip()
+    if not line or len(line) > HEADING_MAX_CHARS or line[-1] in ".,;:" or QA_START.match(line):
+        return False
+    if NAMED_HEADING.match(line):
+        return True
+    if NUMBERED_HEADING.match(line) and len(line.split()) <= HEADING_MAX_WORDS:
+        return True
+    letters = [ch for ch in line if ch.isalpha()]
+    return len(letters) >= 4 and sum(ch.isupper() for ch in letters) / len(letters) >= 0.8
+
+
+def make_recursive_splitter(config, chunk_size: Optional[int] = None) -> RecursiveCharacterTextSplitter:
+    """Divisor de texto por tamanho fixo (separadores favorecem pares P:/R:)"""
+    separators = ["\nP: ", "P: ", "\n\n", "\n", ". ", " ", ""]
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size or config.chunk_size,
+        chunk_overlap=config.chunk_overlap,
+        separators=separators,
+        keep_separator=True
+    )
+
+
+class RecursiveChunker:
+    """Divisão por tamanho fixo com sobreposição (divisor original)"""
+
+    def __init__(self, config):
+        self.splitter = make_recursive_splitter(config)
+
+    def split_page(self, page: Any) -> List[Document]:
+        return self.splitter.split_documents([page])
+
+
+class StructuredChunker:
+    """
+    Divisão pela estrutura do documento: pares P:/R:, títulos e parágrafos.
+
+    Parágrafos de uma mesma seção são agrupados até `chunk_size`; parágrafos
+    maiores que isso (e pares P:/R: maiores que `qa_max_chars`) são divididos
+    pelo divisor recursivo, repetindo a pergunta em cada parte.
+    """
+
+    def __init__(self, config):
+        self.chunk_size = config.chunk_size
+        self.qa_max_chars = config.qa_max_chars
+        self.config = config
+        self.fallback = make_recursive_splitter(config)
+        self._source: Optional[str] = None
+        self._section: Optional[str] = None
+
+    # -----------------------------
+    # Blocos de uma página
+    # -----------------------------
+    @staticmethod
+    def _blocks(text: str):
+        """Segmenta o texto em blocos ("heading" | "qa" | "text", conteúdo)"""
+        blocks, paragraph, qa = [], [], []
+
+        def flush_paragraph():
+            if paragraph:
+                blocks.append(("text", "\n".join(paragraph).strip()))
+                paragraph.clear()
+
+        def flush_qa():
+            if qa:
+                blocks.append(("qa", "\n".join(qa).strip()))
+                qa.clear()
+
+        for line in text.splitlines():
+            stripped = line.strip()
+            if QA_START.match(stripped):
+                flush_paragraph()
+                flush_qa()
+                qa.append(stripped)
+            elif qa:
+                # O par vai até a próxima pergunta ou o próximo título
+                if is_heading(stripped) and any(ANSWER_START.match(item) for item in qa):
+                    flush_qa()
+                    blocks.append(("heading", stripped))
+                else:
+                    qa.append(line.rstrip())
+            elif is_heading(stripped):
+                flush_paragraph()
+                blocks.append(("heading", stripped))
+            elif not stripped:
+                flush_paragraph()
+            else:
+                paragraph.append(line.rstrip())
+        flush_paragraph()
+        flush_qa()
+        return blocks
+
+    # -----------------------------
+    # Montagem dos chunks
+    # -----------------------------
+    def _metadata(self, page: Any, chunk_type: str) -> dict:
+        metadata = {**page.metadata, "chunk_type": chunk_type}
+        if self._section:
+            metadata["section"] = self._section
+        if isinstance(page.metadata.get("page"), int):
+            metadata["page_number"] = page.metadata["page"] + 1  # PyPDFLoader numera a partir de 0
+        return metadata
+
+    def _qa_chunks(self, text: str, page: Any) -> List[Document]:
+        metadata = self._metadata(page, "qa")
+        if len(text) <= self.qa_max_chars:
+            return [Document(page_content=text, metadata=metadata)]
+        question, _, answer = text.partition("\n")
+        # Cada parte leva a pergunta, então sobra menos espaço para a resposta
+        splitter = make_recursive_splitter(self.config, max(self.chunk_size - len(question) - 1, self.chunk_size // 2))
+        return [
+            Document(page_content=f"{question}\n{part.lstrip('. ')}", metadata=dict(metadata))
+            for part in splitter.split_text(answer)
+        ]
+
+    def split_page(self, page: Any) -> List[Document]:
+        source = page.metadata.get("source")
+        if source != self._source:  # novo arquivo: a seção não continua
+            self._source, self._section = source, None
+
+        chunks: List[Document] = []
+        current: List[str] = []
+        only_headings = False
+
+        def flush():
+            nonlocal only_headings
+            if current:
+                chunks.append(Document(page_content="\n\n".join(current), metadata=self._metadata(page, "text")))
+                current.clear()
+            only_headings = False
+
+        for kind, text in self._blocks(page.page_content):
+            if kind == "heading":
+                if not only_headings:
+                    flush()  # título abre um chunk novo (títulos seguidos ficam juntos)
+                self._section = text
+                current.append(text)
+                only_headings = True
+            elif kind == "qa":
+                flush()
+                chunks.extend(self._qa_chunks(text, page))
+            elif len(text) > self.chunk_size:
+                flush()
+                for part in self.fallback.split_text(text):
+                    chunks.append(Document(page_content=part, metadata=self._metadata(page, "text")))
+            else:
+                if current and not only_headings and sum(map(len, current)) + len(text) > self.chunk_size:
+                    flush()
+                current.append(text)
+                only_headings = False
+        flush()
+        return chunks
+
+
+def make_chunker(config):
+    """Divisor configurado em `config.chunker`"""
+    if config.chunker == "structured":
+        return StructuredChunker(config)
+    if config.chunker == "recursive":
+        return RecursiveChunker(config)
+    raise ValueError(f"Divisor desconhecido: {config.chunker} (use {', '.join(CHUNKERS)})")
@@ -0,0 +1,204 @@
+"""
+Memória de conversa com resumo incremental.
+
+Mantém por sessão, no Redis, um resumo compacto das mensagens antigas e as
+últimas mensagens na íntegra. O resumo é atualizado em segundo plano depois
+que a resposta é devolvida, então não adiciona latência ao chat, e o histórico
+injetado no prompt respeita um orçamento fixo de tokens.
+
+Cada processo tem sua fila de atualizações, mas os workers compartilham a
+conversa no Redis: um lock por sessão garante que só um deles condensa e
+poda o histórico de cada vez, e quem não consegue o lock deixa a sessão
+marcada para o dono do lock fazer mais uma passada.
+"""
+import os
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable
+
+from ..core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_LOCK_SECONDS = 120                     # Validade do lock (libera se o processo morrer)
+
+# -----------------------------
+# Prompt usado para condensar o histórico
+# -----------------------------
+SUMMARY_PROMPT = """
+Atualize o resumo de uma conversa entre um usuário e o assistente do IFSC-USP.
+Mantenha apenas fatos, pedidos e respostas relevantes para perguntas futuras.
+Seja breve e escreva em português brasileiro.
+
+RESUMO ATUAL:
+{summary}
+
+NOVAS MENSAGENS:
+{messages}
+
+NOVO RESUMO:
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa barata de tokens (~4 caracteres por token em português)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber em `max_tokens` (mantém o início)."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + "…"
+
+
+def _format_messages(messages: List[Dict], max_tokens_per_message: Optional[int] = None) -> str:
+    lines = []
+    for msg in messages:
+        role = "Usuário" if msg.get("role") == "user" else "Assistente"
+        content = msg.get("content", "")
+        if max_tokens_per_message:
+            content = _truncate_to_tokens(content, max_tokens_per_message)
+        lines.append(f"{role}: {content}")
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """
+    Resumo incremental + últimas mensagens de cada sessão.
+
+    Args:
+        config: IFSCConfig com os limites de histórico (lido a cada chamada)
+        summarize_fn: função que recebe o prompt de resumo e devolve o texto
+    """
+
+    def __init__(self, config, summarize_fn: Callable[[str], str]):
+        self.config = config
+        self._summarize_fn = summarize_fn
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_pid: Optional[int] = None
+        self._pending: set = set()
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Leitura
+    # -----------------------------
+    def load(self, session_id: str) -> Dict:
+        """Retorna {'summary': str, 'messages': List[Dict]} da sessão."""
+        return {
+            "summary": redis_client.get_conversation_summary(session_id),
+            "messages": redis_client.get_conversation_history(session_id),
+        }
+
+    def build_history_context(self, summary: str, messages: List[Dict]) -> str:
+        """
+        Monta o bloco de histórico do prompt dentro do orçamento de tokens.
+
+        O resumo entra primeiro; as mensagens recentes são adicionadas da mais
+        nova para a mais antiga até o orçamento acabar.
+        """
+        budget = self.config.history_token_budget
+        parts: List[str] = []
+
+        if summary:
+            summary = _truncate_to_tokens(summary, self.config.summary_max_tokens)
+            parts.append(f"Resumo: {summary}")
+            budget -= estimate_tokens(parts[0])
+
+        recent: List[str] = []
+        for msg in reversed(messages[-self.config.history_recent_messages:]):
+            line = _format_messages([msg], self.config.history_message_max_tokens)
+            cost = estimate_tokens(line)
+            if cost > budget:
+                break
+            recent.insert(0, line)
+            budget -= cost
+
+        return "\n".join(parts + recent)
+
+    # -----------------------------
+    # Escrita
+    # -----------------------------
+    def append_turn(self, session_id: str, question: str, answer: str):
+        """Grava pergunta e resposta e agenda a atualização do resumo."""
+        redis_client.append_conversation_messages(
+            session_id,
+            [{"role": "user", "content": question}, {"role": "assistant", "content": answer}],
+            expire_seconds=self.config.conversation_ttl_seconds,
+        )
+        self.schedule_summary_update(session_id)
+
+    def schedule_summary_update(self, session_id: str):
+        """Enfileira a atualização do resumo sem bloquear quem chamou."""
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._get_executor().submit(self._update_summary, session_id)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads não sobrevivem a fork: recria o executor no processo filho
+        if self._executor is None or self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-summary")
+            self._executor_pid = os.getpid()
+            self._pending = set()
+        return self._executor
+
+    def _update_summary(self, session_id: str):
+        """
+        Condensa as mensagens que saíram da janela recente no resumo e
+        remove-as da lista no Redis.
+
+        Se outro processo estiver com o lock da sessão, marca a sessão como
+        pendente: quem tem o lock confere a marca ao liberá-lo e faz mais uma
+        passada, então a atualização não se perde.
+        """
+        token = uuid.uuid4().hex
+        try:
+            while True:
+                if not redis_client.acquire_summary_lock(session_id, token, SUMMARY_LOCK_SECONDS):
+                    redis_client.mark_summary_dirty(session_id, SUMMARY_LOCK_SECONDS)
+                    # O lock pode ter sido liberado antes da marca ser vista
+                    if not redis_client.acquire_summary_lock(session_id, token, SUMMARY_LOCK_SECONDS):
+                        return
+                    redis_client.take_summary_dirty(session_id)  # esta passada atende à própria marca
+                try:
+                    self._condense(session_id)
+                finally:
+                    redis_client.release_summary_lock(session_id, token)
+                if not redis_client.take_summary_dirty(session_id):
+                    return
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def _condense(self, session_id: str):
+        """Uma passada da atualização do resumo (com o lock da sessão)."""
+        try:
+            messages = redis_client.get_conversation_history(session_id)
+            overflow = len(messages) - self.config.history_recent_messages
+            if overflow <= 0:
+                return
+
+            old_messages = messages[:overflow]
+            summary = redis_client.get_conversation_summary(session_id)
+            prompt = SUMMARY_PROMPT.format(
+                summary=summary or "(vazio)",
+                messages=_format_messages(old_messages, self.config.history_message_max_tokens),
+            )
+            new_summary = self._summarize_fn(prompt).strip()
+            if not new_summary:
+                return
+
+            redis_client.store_conversation_summary(
+                session_id,
+                _truncate_to_tokens(new_summary, self.config.summary_max_tokens),
+                expire_seconds=self.config.conversation_ttl_seconds,
+            )
+            redis_client.trim_conversation_history(session_id, overflow)
+            logger.info(f"📝 Resumo da sessão {session_id} atualizado ({overflow} mensagens condensadas)")
+        except Exception as e:
+            logger.warning(f"Falha ao atualizar resumo da sessão {session_id}: {e}")
@@ -0,0 +1,166 @@
+"""
+Remoção de chunks duplicados e quase duplicados antes dos embeddings.
+
+Cabeçalhos, rodapés e trechos de regulamento repetidos em vários editais
+geram chunks praticamente idênticos. Este estágio colapsa:
+
+- duplicatas exatas, por hash do texto normalizado;
+- quase duplicatas, por MinHash + LSH (bandas) sobre shingles de palavras.
+
+O chunk mantido recebe em `metadata["duplicate_sources"]` as fontes dos
+chunks removidos, para que todas continuem podendo ser citadas, e os
+atributos deles (ano, programa...), para que os filtros também as encontrem.
+"""
+import re
+import hashlib
+import logging
+import unicodedata
+from dataclasses import dataclass
+from typing import List, Dict, Tuple, Any
+
+import numpy as np
+
+from .attributes import merge_attributes
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+@dataclass
+class DedupStats:
+    """Resumo do que foi removido pelo estágio de deduplicação"""
+    input_chunks: int = 0
+    kept_chunks: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    removed_bytes: int = 0
+
+    @property
+    def removed_chunks(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sem acentos, sem pontuação e com espaços colapsados."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def _source_ref(doc: Any) -> str:
+    source = doc.metadata.get("source", "N/A")
+    page = doc.metadata.get("page")
+    return f"{source}#p{page}" if page is not None else source
+
+
+class MinHashDeduplicator:
+    """
+    Deduplicador incremental (processa lotes sem guardar os textos).
+
+    Args:
+        threshold: similaridade de Jaccard aproximada para considerar duplicata
+        num_perm: número de permutações do MinHash
+        bands: número de bandas do LSH (num_perm deve ser múltiplo)
+        shingle_size: tamanho dos shingles em palavras
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16, shingle_size: int = 5):
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        self._exact: Dict[str, Any] = {}                          # hash → chunk mantido
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}   # (banda, assinatura) → ids
+        self._signatures: List[np.ndarray] = []                  # assinaturas dos mantidos
+        self._kept: List[Any] = []
+        self.stats = DedupStats()
+
+    def _signature(self, normalized: str) -> np.ndarray:
+        words = normalized.split()
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+            dtype=np.uint64,
+        )
+        # (a·h + b) mod p, truncado para 32 bits, mínimo por permutação
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def _record_duplicate(self, kept: Any, duplicate: Any):
+        refs = kept.metadata.setdefault("duplicate_sources", [])
+        ref = _source_ref(duplicate)
+        if ref != _source_ref(kept) and ref not in refs:
+            refs.append(ref)
+        merge_attributes(kept, duplicate)
+        self.stats.removed_bytes += len(duplicate.page_content.encode("utf-8"))
+
+    def add(self, doc: Any) -> bool:
+        """
+        Processa um chunk. Retorna True se ele deve ser mantido (é novo) ou
+        False se for duplicata de um chunk já visto.
+        """
+        self.stats.input_chunks += 1
+        normalized = normalize_text(doc.page_content)
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+        kept = self._exact.get(digest)
+        if kept is not None:
+            self.stats.exact_duplicates += 1
+            self._record_duplicate(kept, doc)
+            return False
+
+        signature = self._signature(normalized)
+        band_keys = [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)
+        ]
+        candidates = {idx for key in band_keys for idx in self._buckets.get(key, [])}
+        for idx in candidates:
+            if np.mean(self._signatures[idx] == signature) >= self.threshold:
+                self.stats.near_duplicates += 1
+                self._record_duplicate(self._kept[idx], doc)
+                return False
+
+        idx = len(self._kept)
+        self._kept.append(doc)
+        self._signatures.append(signature)
+        for key in band_keys:
+            self._buckets.setdefault(key, []).append(idx)
+        self._exact[digest] = doc
+        self.stats.kept_chunks += 1
+        return True
+
+    def filter(self, documents: List[Any]) -> List[Any]:
+        """Mantém apenas os chunks novos de um lote."""
+        return [doc for doc in documents if self.add(doc)]
+
+    def log_stats(self):
+        stats = self.stats
+        logger.info(
+            f"🧹 Deduplicação: {stats.removed_chunks}/{stats.input_chunks} chunks removidos "
+            f"({stats.exact_duplicates} exatos, {stats.near_duplicates} quase duplicados, "
+            f"{stats.removed_bytes / 1024:.1f} KiB)"
+        )
+
+
+def deduplicate_documents(documents: List[Any], config) -> Tuple[List[Any], DedupStats]:
+    """Remove duplicatas exatas e quase duplicatas de uma lista de chunks."""
+    dedup = MinHashDeduplicator(
+        threshold=config.dedup_threshold,
+        num_perm=config.dedup_num_perm,
+        bands=config.dedup_bands,
+    )
+    kept = dedup.filter(documents)
+    dedup.log_stats()
+    return kept, dedup.stats
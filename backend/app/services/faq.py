@@ -0,0 +1,91 @@
+"""
+Atalho de FAQ: responde perguntas frequentes sem chamar o LLM.
+
+Os TXTs de origem seguem o formato "P: pergunta / R: resposta". Na ingestão
+cada par vira um documento cuja busca é feita pela pergunta, com a resposta
+curada nos metadados. Quando a pergunta do usuário é suficientemente próxima
+de uma pergunta da FAQ, a resposta curada é devolvida diretamente.
+"""
+import re
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple, Any
+
+if TYPE_CHECKING:  # LangChain/FAISS só são importados quando usados
+    from langchain_core.documents import Document
+    from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+FAQ_DIRNAME = "faq"                            # Subpasta do índice de FAQ dentro da versão
+
+# "P: ..." seguido de "R: ..." até o próximo "P:" ou fim do texto
+QA_PATTERN = re.compile(r"(?:^|\n)[ \t]*P:[ \t]*(.+?)\s*\n[ \t]*R:[ \t]*(.+?)(?=\n[ \t]*P:|\Z)", re.S)
+
+
+def extract_qa_pairs(pages: List[Any]) -> List["Document"]:
+    """
+    Extrai pares pergunta/resposta dos documentos.
+
+    Returns:
+        List[Document]: page_content = pergunta; metadata = answer, source e
+        demais metadados da página de origem
+    """
+    from langchain_core.documents import Document
+
+    pairs = []
+    for page in pages:
+        for question, answer in QA_PATTERN.findall(page.page_content):
+            question, answer = " ".join(question.split()), answer.strip()
+            if question and answer:
+                pairs.append(Document(page_content=question, metadata={**page.metadata, "answer": answer}))
+    return pairs
+
+
+def build_faq_index(pairs: List["Document"], embeddings, index_path: Path) -> Optional["FAISS"]:
+    """Cria e salva o índice de perguntas da FAQ (em `index_path/faq`)."""
+    from langchain_community.vectorstores import FAISS
+
+    if not pairs:
+        return None
+    db = FAISS.from_documents(pairs, embeddings)
+    db.save_local(str(index_path / FAQ_DIRNAME))
+    logger.info(f"❓ Índice de FAQ salvo com {len(pairs)} perguntas.")
+    return db
+
+
+def load_faq_index(index_path: Path, embeddings) -> Optional["FAISS"]:
+    """Carrega o índice de FAQ de uma versão (None se não houver)."""
+    from langchain_community.vectorstores import FAISS
+
+    faq_path = index_path / FAQ_DIRNAME
+    if not faq_path.exists():
+        return None
+    try:
+        return FAISS.load_local(str(faq_path), embeddings, allow_dangerous_deserialization=True)
+    except Exception as e:
+        logger.warning(f"Falha ao carregar índice de FAQ {faq_path}: {e}")
+        return None
+
+
+def l2_to_similarity(distance: float) -> float:
+    """
+    Converte a distância L2 ao quadrado do FAISS em similaridade de cosseno.
+
+    Válido para embeddings normalizados (caso dos modelos da OpenAI):
+    ||a - b||² = 2 - 2·cos(a, b).
+    """
+    return 1.0 - distance / 2.0
+
+
+def best_faq_match(faq_stores, query_vector: List[float]) -> Optional[Tuple["Document", float]]:
+    """Melhor pergunta da FAQ entre os índices informados e sua similaridade."""
+    best = None
+    for store in faq_stores:
+        hits = store.similarity_search_with_score_by_vector(query_vector, k=1)
+        if hits:
+            doc, distance = hits[0]
+            similarity = l2_to_similarity(float(distance))
+            if best is None or similarity > best[1]:
+                best = (doc, similarity)
+    return best
@@ -0,0 +1,266 @@
+"""
+Fila de jobs de reconstrução de índices (Redis).
+
+A API só enfileira o job e consulta seu estado; a reconstrução roda em um
+processo separado (`scripts/index_worker.py`), que atualiza o progresso no
+hash do job e, ao terminar, publica o sinal de recarga para os servidores.
+
+Estados: queued → running → succeeded | failed | cancelled.
+
+Ao pegar um job o worker o move (BLMOVE) da fila para a lista de jobs em
+processamento e mantém um lease com TTL renovado enquanto o executa. Se o
+worker morrer, o lease expira e o próximo worker a subir recupera o job
+(`recover_stale_jobs`): volta para a fila se ainda não tinha começado ou é
+marcado como falho se estava em execução.
+"""
+import json
+import time
+import uuid
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+JOBS_QUEUE = "ifsc:jobs:queue"
+JOBS_PROCESSING = "ifsc:jobs:processing"
+JOB_LEASE_SECONDS = 30                         # Sem renovação por este tempo, o worker é considerado morto
+JOB_TTL_SECONDS = 7 * 24 * 3600                # Jobs terminados ficam consultáveis por 7 dias
+PROGRESS_MIN_INTERVAL = 1.0                    # Intervalo mínimo entre gravações de progresso
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINAL_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """O job recebeu um pedido de cancelamento"""
+
+
+def _job_key(job_id: str) -> str:
+    return f"ifsc:job:{job_id}"
+
+
+def _lease_key(job_id: str) -> str:
+    return f"ifsc:job:{job_id}:lease"
+
+
+def enqueue_rebuild(collections: Optional[List[str]], requested_by: Optional[str]) -> Dict[str, Any]:
+    """
+    Cria um job de reconstrução e o coloca na fila.
+
+    Args:
+        collections: coleções a reconstruir (None = todas)
+        requested_by: usuário que pediu
+
+    Returns:
+        Dict: estado inicial do job
+    """
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id,
+        "type": "index_rebuild",
+        "status": QUEUED,
+        "collections": json.dumps(collections or []),
+        "requested_by": requested_by or "",
+        "created_at": time.time(),
+    }
+    pipe = redis_client.pipeline()
+    pipe.hset(_job_key(job_id), mapping=job)
+    pipe.expire(_job_key(job_id), JOB_TTL_SECONDS)
+    pipe.lpush(JOBS_QUEUE, job_id)
+    pipe.execute()
+    logger.info(f"🗂️ Job {job_id} enfileirado por {requested_by} ({collections or 'todas as coleções'})")
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Estado atual do job (None se não existir ou já expirou)."""
+    raw = redis_client.hgetall(_job_key(job_id))
+    if not raw:
+        return None
+    job: Dict[str, Any] = dict(raw)
+    for field in ("collections", "progress", "rebuilt"):
+        if field in job:
+            job[field] = json.loads(job[field])
+    if "workers_notified" in job:
+        job["workers_notified"] = int(job["workers_notified"])
+    for field in ("created_at", "started_at", "finished_at"):
+        if field in job:
+            job[field] = float(job[field])
+    job["cancel_requested"] = job.get("cancel_requested") == "1"
+    return job
+
+
+def request_cancel(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Pede o cancelamento do job. Jobs na fila são cancelados na hora; jobs em
+    execução param no próximo ponto de verificação do worker.
+    """
+    key = _job_key(job_id)
+    if not redis_client.exists(key):
+        return None
+    redis_client.hset(key, "cancel_requested", "1")
+    if redis_client.lrem(JOBS_QUEUE, 0, job_id):
+        redis_client.hset(key, mapping={"status": CANCELLED, "finished_at": time.time()})
+    return get_job(job_id)
+
+
+def update_job(job_id: str, **fields):
+    """Atualiza campos do job (dicts/listas são gravados como JSON)."""
+    mapping = {k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in fields.items()}
+    redis_client.hset(_job_key(job_id), mapping=mapping)
+
+
+def next_job(timeout: int = 5) -> Optional[str]:
+    """
+    Bloqueia até `timeout` s esperando o próximo job da fila. O job passa
+    para a lista de processamento com um lease; `finish_job` o remove.
+    """
+    job_id = redis_client.blmove(JOBS_QUEUE, JOBS_PROCESSING, timeout, "RIGHT", "LEFT")
+    if job_id:
+        redis_client.set(_lease_key(job_id), "1", ex=JOB_LEASE_SECONDS)
+    return job_id
+
+
+def finish_job(job_id: str):
+    """Tira o job da lista de processamento (executado, falho ou cancelado)."""
+    pipe = redis_client.pipeline()
+    pipe.lrem(JOBS_PROCESSING, 0, job_id)
+    pipe.delete(_lease_key(job_id))
+    pipe.execute()
+
+
+class JobLease:
+    """
+    Renova o lease do job em uma thread enquanto ele é executado.
+
+    Uso:
+        with JobLease(job_id):
+            ...
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._renew, name=f"job-lease-{job_id}", daemon=True)
+
+    def _renew(self):
+        while not self._stop.wait(JOB_LEASE_SECONDS / 3):
+            try:
+                redis_client.set(_lease_key(self.job_id), "1", ex=JOB_LEASE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Falha ao renovar o lease do job {self.job_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def recover_stale_jobs() -> Dict[str, List[str]]:
+    """
+    Recupera jobs da lista de processamento cujo lease expirou (worker morto).
+
+    Jobs que ainda não tinham começado voltam para a fila (e serão os
+    próximos); jobs em execução são marcados como falhos, pois a
+    reconstrução pode ter publicado parte das coleções.
+
+    Returns:
+        Dict: ids recuperados em "requeued" e "failed"
+    """
+    def stale_ids() -> List[str]:
+        ids = redis_client.lrange(JOBS_PROCESSING, 0, -1)
+        pipe = redis_client.pipeline()
+        for job_id in ids:
+            pipe.exists(_lease_key(job_id))
+        return [job_id for job_id, alive in zip(ids, pipe.execute()) if not alive]
+
+    # Um job recém-movido por outro worker pode estar sem lease por um instante
+    candidates = stale_ids()
+    if candidates:
+        time.sleep(1)
+        candidates = [job_id for job_id in stale_ids() if job_id in candidates]
+
+    recovered: Dict[str, List[str]] = {"requeued": [], "failed": []}
+    for job_id in candidates:
+        if not redis_client.lrem(JOBS_PROCESSING, 0, job_id):
+            continue  # outro worker já recuperou
+        job = get_job(job_id)
+        if job is None or job["status"] in FINAL_STATES:
+            continue
+        if job["status"] == QUEUED and not job["cancel_requested"]:
+            redis_client.rpush(JOBS_QUEUE, job_id)
+            recovered["requeued"].append(job_id)
+        else:
+            update_job(job_id, status=FAILED, finished_at=time.time(),
+                       error="Worker interrompido durante a execução")
+            recovered["failed"].append(job_id)
+    if candidates:
+        logger.warning(
+            f"♻️ Jobs sem worker: {len(recovered['requeued'])} de volta à fila, "
+            f"{len(recovered['failed'])} marcados como falhos"
+        )
+    return recovered
+
+
+class JobProgress:
+    """
+    Acompanha o progresso de um job de reconstrução.
+
+    É usado como callback de `ingestion.build_vectorstore`: conta arquivos
+    lidos e chunks com embeddings, estima o tempo restante pelo ritmo de
+    leitura dos arquivos (a construção é em streaming, então o total de
+    chunks só é conhecido no fim) e lança JobCancelled se o cancelamento foi
+    pedido.
+    """
+
+    def __init__(self, job_id: str, files_total: int):
+        self.job_id = job_id
+        self.state = {
+            "collection": None,
+            "files_total": files_total,
+            "files_parsed": 0,
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "eta_seconds": None,
+        }
+        self._chunks_done_before = 0          # chunks de coleções já concluídas
+        self._started_at = time.monotonic()
+        self._last_write = 0.0
+
+    def start_collection(self, name: str):
+        self.state["collection"] = name
+        self._chunks_done_before = self.state["chunks_embedded"]
+        self._flush(force=True)
+
+    def __call__(self, event: str, **fields):
+        if event == "file_parsed":
+            self.state["files_parsed"] += 1
+            self.state["eta_seconds"] = self._eta()
+        elif event == "embedded":
+            self.state["chunks_embedded"] = self._chunks_done_before + fields["count"]
+        elif event == "chunks":
+            self.state["chunks_total"] += fields["total"]
+        self._flush()
+
+    def _eta(self) -> Optional[float]:
+        done, total = self.state["files_parsed"], self.state["files_total"]
+        if not done:
+            return None
+        per_file = (time.monotonic() - self._started_at) / done
+        return round(max(total - done, 0) * per_file, 1)
+
+    def _flush(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_write = now
+        update_job(self.job_id, progress=self.state)
+        if redis_client.hget(_job_key(self.job_id), "cancel_requested") == "1":
+            raise JobCancelled(self.job_id)
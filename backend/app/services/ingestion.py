@@ -0,0 +1,316 @@
+"""
+Ingestão de documentos e construção dos índices vetoriais.
+
+Cada coleção (shard) é formada por uma subpasta de `pdfs/` ou por um grupo de
+padrões declarado em `pdfs/collections.json`; os arquivos soltos na raiz de
+`pdfs/` formam a coleção padrão "geral". Cada coleção tem seu próprio índice
+FAISS em `vectorstore/ifsc_<nome>` e pode ser reconstruída isoladamente.
+
+Os índices são versionados: cada reconstrução grava um novo diretório
+`vectorstore/ifsc_<nome>/<versão>/` e só então o arquivo `CURRENT` passa a
+apontar para ele. Índices antigos sem versão (salvos direto na pasta da
+coleção) continuam sendo lidos como a versão "legacy".
+"""
+import os
+import json
+import shutil
+import logging
+import uuid
+from datetime import datetime
+from pathlib import Path
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from .faq import extract_qa_pairs, build_faq_index
+from .chunking import make_chunker
+from .attributes import AttributeExtractor, AttributeIndexBuilder
+from .dedup import MinHashDeduplicator
+from .quantization import VECTORS_FILE, quantize_from_file
+
+logger = logging.getLogger(__name__)
+
+PDF_PATH = Path("pdfs/")                       # Pasta onde os PDFs e TXTs estão
+VECTORSTORE_ROOT = Path("vectorstore/")        # Pasta raiz dos índices
+DEFAULT_COLLECTION = "geral"                   # Coleção dos arquivos na raiz de pdfs/
+COLLECTIONS_MANIFEST = "collections.json"      # {"coleção": ["padrão/glob*.pdf", ...]}
+SUPPORTED_SUFFIXES = (".txt", ".pdf")
+CURRENT_POINTER = "CURRENT"                    # Arquivo com a versão ativa da coleção
+LEGACY_VERSION = "legacy"                      # Índice salvo direto na pasta da coleção
+
+
+# -----------------------------
+# Descoberta de coleções
+# -----------------------------
+def _supported_files(paths) -> List[Path]:
+    return sorted(p for p in paths if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES)
+
+
+def discover_collections(docs_path: Path = PDF_PATH) -> Dict[str, List[Path]]:
+    """
+    Mapeia nome da coleção → arquivos que a compõem.
+
+    - Arquivos na raiz de `docs_path` → coleção "geral"
+    - Cada subpasta → coleção com o nome da subpasta
+    - `collections.json` (opcional) → coleções por padrão glob (tags)
+    """
+    collections: Dict[str, List[Path]] = {}
+    if not docs_path.exists():
+        return collections
+
+    root_files = _supported_files(docs_path.iterdir())
+    if root_files:
+        collections[DEFAULT_COLLECTION] = root_files
+
+    for subdir in sorted(p for p in docs_path.iterdir() if p.is_dir()):
+        files = _supported_files(subdir.rglob("*"))
+        if files:
+            collections[subdir.name] = files
+
+    manifest = docs_path / COLLECTIONS_MANIFEST
+    if manifest.exists():
+        try:
+            for name, patterns in json.loads(manifest.read_text(encoding="utf-8")).items():
+                files = {f for pattern in patterns for f in docs_path.glob(pattern)}
+                if files:
+                    collections[name] = _supported_files(files)
+        except Exception as e:
+            logger.warning(f"Falha ao ler {manifest}: {e}")
+
+    return collections
+
+
+def collection_index_path(name: str) -> Path:
+    """Diretório raiz (todas as versões) do índice de uma coleção."""
+    return VECTORSTORE_ROOT / f"ifsc_{name}"
+
+
+def list_index_collections() -> List[str]:
+    """Coleções que já possuem índice salvo em disco."""
+    if not VECTORSTORE_ROOT.exists():
+        return []
+    return sorted(p.name[len("ifsc_"):] for p in VECTORSTORE_ROOT.glob("ifsc_*") if p.is_dir())
+
+
+# -----------------------------
+# Versionamento de índices
+# -----------------------------
+def current_version(name: str) -> Optional[str]:
+    """Versão ativa da coleção (conteúdo de CURRENT), 'legacy' ou None."""
+    root = collection_index_path(name)
+    pointer = root / CURRENT_POINTER
+    if pointer.exists():
+        version = pointer.read_text(encoding="utf-8").strip()
+        if version and (root / version).is_dir():
+            return version
+    if (root / "index.faiss").exists():
+        return LEGACY_VERSION
+    return None
+
+
+def version_path(name: str, version: str) -> Path:
+    """Diretório de uma versão específica do índice."""
+    root = collection_index_path(name)
+    return root if version == LEGACY_VERSION else root / version
+
+
+def new_version(name: str) -> Tuple[str, Path]:
+    """Gera um identificador de versão novo e o diretório correspondente."""
+    version = f"v{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    return version, collection_index_path(name) / version
+
+
+def publish_version(name: str, version: str, keep: int = 3):
+    """
+    Aponta CURRENT para `version` de forma atômica (write + rename) e remove
+    versões antigas, mantendo as `keep` mais recentes.
+    """
+    root = collection_index_path(name)
+    tmp = root / f".{CURRENT_POINTER}.{os.getpid()}"
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, root / CURRENT_POINTER)
+    logger.info(f"📌 Coleção '{name}' agora aponta para a versão {version}")
+
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and p.name.startswith("v"))
+    for old in versions[:-keep] if keep > 0 else []:
+        if old.name != version:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+# Callback de progresso da construção: progress(evento, **campos). Eventos:
+# "file_parsed" (file), "embedded" (count: chunks com embeddings até agora) e
+# "chunks" (total, ao final). Pode lançar exceção para interromper a
+# construção (ex.: job cancelado).
+ProgressFn = Callable[..., None]
+
+
+def _no_progress(event: str, **fields):
+    pass
+
+
+# -----------------------------
+# Carregamento e divisão de documentos (geradores)
+# -----------------------------
+def iter_pages(files: List[Path], progress: ProgressFn = _no_progress) -> Iterator:
+    """Lê TXTs e PDFs página a página, sem manter o corpus inteiro em memória."""
+    for file in files:
+        if file.suffix.lower() == ".txt":
+            logger.info(f"  📝 Processando TXT: {file.name}")
+            loader = TextLoader(str(file), encoding='utf-8')
+        else:
+            logger.info(f"  📖 Processando PDF: {file.name}")
+            loader = PyPDFLoader(str(file))
+        yield from loader.lazy_load()
+        progress("file_parsed", file=file.name)
+
+
+def load_documents(files: List[Path], progress: ProgressFn = _no_progress) -> List:
+    """Carrega TXTs e PDFs como documentos LangChain (uma entrada por página)."""
+    return list(iter_pages(files, progress))
+
+
+def iter_chunks(pages: Iterable, config) -> Iterator:
+    """Divide as páginas em chunks à medida que chegam (chunks nunca cruzam páginas)"""
+    chunker = make_chunker(config)
+    for page in pages:
+        yield from chunker.split_page(page)
+
+
+def split_documents(pages: List, config) -> List:
+    """Divide documentos em chunks para embeddings"""
+    return list(iter_chunks(pages, config))
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Agrupa um iterável em listas de até `size` itens"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# -----------------------------
+# Construção e carregamento de índices
+# -----------------------------
+class _StreamingIndexWriter:
+    """
+    Monta o índice FAISS lote a lote.
+
+    Índices planos recebem cada lote direto (float32). Para índices
+    quantizados os vetores vão para `vectors.f32` no disco à medida que chegam;
+    o treino e a inserção no índice quantizado são feitos no final, a partir
+    do arquivo (memmap), sem reter os vetores em RAM.
+    """
+
+    def __init__(self, embeddings, config, index_path: Path):
+        self.embeddings = embeddings
+        self.config = config
+        self.index_path = index_path
+        self.quantized = config.index_quantization != "none"
+        self.db: Optional[FAISS] = None
+        self.dim = 0
+        self.count = 0
+        self._vectors_file = None
+
+    def add(self, docs: List, vectors: List[List[float]]):
+        import faiss
+        import numpy as np
+
+        array = np.asarray(vectors, dtype="float32")
+        if self.db is None:
+            self.dim = array.shape[1]
+            self.db = FAISS(
+                embedding_function=self.embeddings,
+                index=faiss.IndexFlatL2(self.dim),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+            )
+            if self.quantized:
+                self._vectors_file = open(self.index_path / VECTORS_FILE, "wb")
+
+        if self.quantized:
+            array.tofile(self._vectors_file)
+        else:
+            self.db.index.add(array)
+        ids = [str(uuid.uuid4()) for _ in docs]
+        self.db.docstore.add(dict(zip(ids, docs)))
+        self.db.index_to_docstore_id.update({self.count + i: doc_id for i, doc_id in enumerate(ids)})
+        self.count += len(docs)
+
+    def finish(self) -> Optional[FAISS]:
+        if self._vectors_file is not None:
+            self._vectors_file.close()
+            self.db.index = quantize_from_file(self.index_path, self.dim, self.count, self.config)
+        return self.db
+
+
+def build_vectorstore(files: List[Path], embeddings, config, index_path: Path,
+                      progress: Optional[ProgressFn] = None) -> Optional[FAISS]:
+    """
+    Cria o índice FAISS de um conjunto de arquivos e salva em `index_path`.
+
+    Pipeline em streaming: páginas → chunks → deduplicação → embeddings e
+    inserção no índice em lotes de `embed_batch_size`. O pico de memória
+    depende do tamanho do lote, não do corpus (além do próprio índice e do
+    texto dos chunks, que fazem parte do resultado).
+    """
+    progress = progress or _no_progress
+    index_path.mkdir(parents=True, exist_ok=True)
+
+    # Pares "P:/R:" são coletados durante a leitura para o índice de FAQ
+    qa_pairs: List = []
+    extractor = AttributeExtractor()
+
+    def pages():
+        for page in iter_pages(files, progress):
+            if config.faq_enabled:
+                qa_pairs.extend(extract_qa_pairs([page]))
+            extractor.observe_page(page)
+            yield page
+
+    chunks = (extractor.annotate(chunk) for chunk in iter_chunks(pages(), config))
+
+    # Remove duplicatas antes de pagar pelos embeddings
+    dedup = None
+    if config.dedup_enabled:
+        dedup = MinHashDeduplicator(
+            threshold=config.dedup_threshold, num_perm=config.dedup_num_perm, bands=config.dedup_bands
+        )
+        chunks = (chunk for chunk in chunks if dedup.add(chunk))
+
+    writer = _StreamingIndexWriter(embeddings, config, index_path)
+    attributes = AttributeIndexBuilder()  # mesma ordem das posições no índice FAISS
+    for batch in batched(chunks, config.embed_batch_size):
+        writer.add(batch, embeddings.embed_documents([doc.page_content for doc in batch]))
+        attributes.add(batch)
+        progress("embedded", count=writer.count)
+
+    if writer.count == 0:
+        logger.warning("Nenhum documento encontrado para processar.")
+        return None
+    if dedup is not None:
+        dedup.log_stats()
+    logger.info(f"  → {writer.count} chunks indexados")
+    progress("chunks", total=writer.count)
+
+    db = writer.finish()
+    db.save_local(str(index_path))
+    attributes.save(index_path)
+
+    if config.faq_enabled:
+        build_faq_index(qa_pairs, embeddings, index_path)
+    logger.info(f"💾 Vectorstore salvo em {index_path}.")
+    return db
+
+
+def load_vectorstore(index_path: Path, embeddings) -> Optional[FAISS]:
+    """Carrega um índice FAISS salvo (ou None se não existir/falhar)"""
+    if not (index_path.exists() and any(index_path.iterdir())):
+        return None
+    try:
+        return FAISS.load_local(str(index_path), embeddings, allow_dangerous_deserialization=True)
+    except Exception as e:
+        logger.warning(f"Falha ao carregar vectorstore {index_path}: {e}")
+        return None
@@ -0,0 +1,435 @@
+"""
+Camada de clientes externos (LLM e embeddings) resiliente.
+
+- Pool HTTP keep-alive compartilhado (httpx), recriado após fork
+- Prazo por chamada (timeout limitado pelo deadline da requisição)
+- Retry com backoff exponencial e jitter apenas para erros transitórios
+- Hedging opcional: dispara uma segunda chamada se a primeira demorar
+- Circuit breaker por provedor, com falha rápida enquanto aberto
+- Modelo/provedor de fallback configurável
+- Métricas de latência, erros e estado do breaker
+"""
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import openai
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessageChunk
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from ..core import metrics
+from ..core.deadline import RequestCancelled
+
+logger = logging.getLogger(__name__)
+
+# Erros em que vale a pena tentar de novo (e que contam para o breaker)
+TRANSIENT_ERRORS = (
+    openai.APIConnectionError,   # inclui APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+    httpx.TransportError,
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Chamada recusada porque o circuit breaker do provedor está aberto."""
+
+
+class DeadlineExceededError(TimeoutError):
+    """Não há tempo restante para uma nova tentativa."""
+
+
+# -----------------------------
+# Circuit breaker
+# -----------------------------
+class CircuitBreaker:
+    """
+    Breaker clássico: fechado → aberto após `failure_threshold` falhas
+    consecutivas; depois de `reset_seconds` deixa passar uma chamada de
+    teste (meio aberto) e fecha se ela tiver sucesso.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0.0, HALF_OPEN: 0.5, OPEN: 1.0}
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._export()
+
+    def _export(self):
+        metrics.set_gauge(f"outbound.{self.name}.breaker_state", self._GAUGE[self.state])
+
+    def allow(self) -> bool:
+        """True se a chamada pode seguir; False para falha rápida."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+                self._export()
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+                return True
+            return self.state == self.CLOSED
+
+    def release_probe(self):
+        """Libera a sonda do meio-aberto sem contar sucesso nem falha."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                logger.info(f"🟢 Circuit breaker '{self.name}' fechado")
+            self.state = self.CLOSED
+            self._export()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"🔴 Circuit breaker '{self.name}' aberto após {self._failures} falhas")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._export()
+
+
+# -----------------------------
+# Pool HTTP compartilhado
+# -----------------------------
+_http_client: Optional[httpx.Client] = None
+_http_client_pid: Optional[int] = None
+_http_lock = threading.Lock()
+
+
+def shared_http_client(config) -> httpx.Client:
+    """
+    Cliente httpx com pool keep-alive compartilhado por todos os modelos do
+    processo. Conexões não são herdadas entre processos: após um fork o
+    cliente é recriado.
+    """
+    global _http_client, _http_client_pid
+    with _http_lock:
+        if _http_client is None or _http_client_pid != os.getpid():
+            _http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=config.http_max_connections,
+                    max_keepalive_connections=config.http_max_keepalive,
+                    keepalive_expiry=config.http_keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(config.llm_timeout_seconds, connect=config.http_connect_timeout_seconds),
+            )
+            _http_client_pid = os.getpid()
+        return _http_client
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_pid: Optional[int] = None
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    # Threads não sobrevivem a fork: recria o executor no processo filho
+    global _hedge_executor, _hedge_executor_pid
+    if _hedge_executor is None or _hedge_executor_pid != os.getpid():
+        _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="outbound-hedge")
+        _hedge_executor_pid = os.getpid()
+    return _hedge_executor
+
+
+# -----------------------------
+# Execução resiliente
+# -----------------------------
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_with_retry(fn: Callable[[float], Any], config, breaker: CircuitBreaker, name: str,
+                    deadline: Optional[float] = None, timeout: Optional[float] = None) -> Any:
+    """
+    Executa `fn(timeout)` com breaker, retry com jitter e deadline.
+
+    Args:
+        fn: função que recebe o timeout (s) da tentativa
+        deadline: instante (time.monotonic) limite para concluir a chamada
+        timeout: timeout padrão de cada tentativa
+    """
+    timeout = timeout or config.llm_timeout_seconds
+    attempts = config.outbound_max_retries + 1
+    for attempt in range(attempts):
+        # O prazo é verificado antes de allow(): no meio-aberto, allow() reserva a sonda
+        remaining = _remaining(deadline)
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceededError(f"Sem tempo para chamar {name}")
+
+        if not breaker.allow():
+            metrics.incr(f"outbound.{name}.fast_fail")
+            raise CircuitOpenError(f"Circuit breaker '{breaker.name}' aberto")
+        call_timeout = timeout if remaining is None else min(timeout, remaining)
+
+        start = time.monotonic()
+        try:
+            result = fn(call_timeout)
+        except TRANSIENT_ERRORS as e:
+            metrics.incr(f"outbound.{name}.errors")
+            breaker.record_failure()
+            if attempt == attempts - 1:
+                raise
+            # backoff exponencial com "full jitter"
+            delay = random.uniform(0, min(config.retry_max_delay_seconds, config.retry_base_delay_seconds * 2 ** attempt))
+            remaining = _remaining(deadline)
+            if remaining is not None and delay >= remaining:
+                raise
+            logger.warning(f"⚠️ {name} falhou ({type(e).__name__}); nova tentativa em {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        except RequestCancelled:
+            # Interrompida sem resposta do provedor: não conta, só libera a sonda
+            breaker.release_probe()
+            raise
+        except Exception:
+            # Erro não transitório (ex.: 4xx): o provedor respondeu, não conta para o breaker
+            breaker.record_success()
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        finally:
+            metrics.observe(f"outbound.{name}.latency", time.monotonic() - start)
+
+        breaker.record_success()
+        return result
+
+
+def hedged(fn: Callable[[], Any], hedge_after: Optional[float], name: str) -> Any:
+    """
+    Executa `fn`; se não terminar em `hedge_after` segundos, dispara uma
+    segunda cópia e devolve o primeiro resultado bem-sucedido.
+    """
+    if not hedge_after:
+        return fn()
+
+    executor = _get_hedge_executor()
+    futures = [executor.submit(fn)]
+    done, _ = wait(futures, timeout=hedge_after)
+    if not done:
+        metrics.incr(f"outbound.{name}.hedged")
+        futures.append(executor.submit(fn))
+
+    error = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+# -----------------------------
+# Modelo de chat
+# -----------------------------
+class ResilientChatModel:
+    """
+    Modelo de chat com a mesma interface `invoke(prompt, **kwargs)` do
+    ChatOpenAI, protegido por breaker/retry/hedging e com fallback.
+
+    Args:
+        config: IFSCConfig
+        model: nome do modelo primário (padrão config.model)
+    """
+
+    def __init__(self, config, model: Optional[str] = None):
+        self.config = config
+        self.model = model or config.model
+        self.breaker = CircuitBreaker(
+            f"llm.{self.model}", config.breaker_failure_threshold, config.breaker_reset_seconds
+        )
+        self._clients: Dict[str, ChatOpenAI] = {}
+        self._clients_pid: Optional[int] = None
+
+    def _client(self, kind: str) -> ChatOpenAI:
+        """Cliente LangChain primário ou de fallback (recriado após fork)."""
+        if self._clients_pid != os.getpid():
+            self._clients, self._clients_pid = {}, os.getpid()
+        if kind not in self._clients:
+            if kind == "primary":
+                model, base_url, api_key = self.model, self.config.llm_base_url, os.getenv("MARITACA_API_KEY")
+            else:
+                model = self.config.fallback_model
+                base_url = self.config.fallback_base_url or self.config.llm_base_url
+                api_key = os.getenv(self.config.fallback_api_key_env)
+            self._clients[kind] = ChatOpenAI(
+                model=model,
+                temperature=self.config.temperature,
+                api_key=api_key,
+                base_url=base_url,
+                max_tokens=self.config.max_response_tokens,
+                max_retries=0,                       # retry feito aqui, com jitter e deadline
+                timeout=self.config.llm_timeout_seconds,
+                http_client=shared_http_client(self.config),
+            )
+        return self._clients[kind]
+
+    def invoke(self, prompt: str, deadline: Optional[float] = None, **kwargs) -> Any:
+        """
+        Gera a resposta para `prompt`.
+
+        Args:
+            deadline: instante (time.monotonic) limite para a resposta
+            **kwargs: parâmetros repassados ao provedor (ex.: max_tokens)
+        """
+        def attempt(timeout: float):
+            return hedged(
+                lambda: self._client("primary").invoke(prompt, timeout=timeout, **kwargs),
+                self.config.hedge_after_seconds,
+                "llm",
+            )
+
+        try:
+            return call_with_retry(attempt, self.config, self.breaker, "llm", deadline=deadline)
+        except (CircuitOpenError, *TRANSIENT_ERRORS) as e:
+            if not self.config.fallback_model:
+                raise
+            logger.warning(f"↪️ Usando modelo de fallback '{self.config.fallback_model}' ({type(e).__name__})")
+            metrics.incr("outbound.llm_fallback.calls")
+            start = time.monotonic()
+            remaining = _remaining(deadline)
+            timeout = self.config.llm_timeout_seconds if remaining is None else max(0.1, remaining)
+            try:
+                return self._client("fallback").invoke(prompt, timeout=timeout, **kwargs)
+            finally:
+                metrics.observe("outbound.llm_fallback.latency", time.monotonic() - start)
+
+    def stream(self, prompt: str, on_token: Callable[[str], None], deadline: Optional[float] = None,
+               **kwargs) -> Any:
+        """
+        Gera a resposta em streaming, chamando `on_token(texto)` a cada trecho.
+
+        Breaker, retry e fallback valem até o primeiro trecho chegar (não há
+        hedging); depois disso o texto já foi entregue e uma falha é
+        repassada ao chamador. Se `on_token` lançar exceção, a geração é
+        interrompida e a exceção propagada.
+
+        Returns:
+            mensagem completa (mesmo formato de `invoke`)
+        """
+        def first_chunk(kind: str, timeout: float):
+            iterator = iter(self._client(kind).stream(prompt, timeout=timeout, **kwargs))
+            return iterator, next(iterator, None)
+
+        start = time.monotonic()
+        try:
+            iterator, chunk = call_with_retry(
+                lambda timeout: first_chunk("primary", timeout), self.config, self.breaker, "llm", deadline=deadline
+            )
+        except (CircuitOpenError, *TRANSIENT_ERRORS) as e:
+            if not self.config.fallback_model:
+                raise
+            logger.warning(f"↪️ Usando modelo de fallback '{self.config.fallback_model}' ({type(e).__name__})")
+            metrics.incr("outbound.llm_fallback.calls")
+            remaining = _remaining(deadline)
+            iterator, chunk = first_chunk(
+                "fallback", self.config.llm_timeout_seconds if remaining is None else max(0.1, remaining)
+            )
+        metrics.observe("outbound.llm.first_token_latency", time.monotonic() - start)
+
+        message = None
+        try:
+            while chunk is not None:
+                message = chunk if message is None else message + chunk
+                if chunk.content:
+                    on_token(chunk.content)
+                chunk = next(iterator, None)
+        except TRANSIENT_ERRORS:
+            metrics.incr("outbound.llm.stream_interrupted")
+            self.breaker.record_failure()
+            raise
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()  # encerra a resposta HTTP se a geração foi interrompida
+            metrics.observe("outbound.llm.stream_latency", time.monotonic() - start)
+        return message if message is not None else AIMessageChunk(content="")
+
+
+# -----------------------------
+# Embeddings
+# -----------------------------
+class ResilientEmbeddings(Embeddings):
+    """
+    Embeddings da OpenAI com pool compartilhado, breaker e retry com jitter.
+
+    Não há fallback de provedor: vetores de outro modelo não seriam
+    comparáveis com os do índice.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.breaker = CircuitBreaker(
+            "embeddings", config.breaker_failure_threshold, config.breaker_reset_seconds
+        )
+        self._client: Optional[OpenAIEmbeddings] = None
+        self._client_pid: Optional[int] = None
+
+    def _get_client(self) -> OpenAIEmbeddings:
+        if self._client is None or self._client_pid != os.getpid():
+            self._client = OpenAIEmbeddings(
+                model=self.config.embeddings_model,
+                dimensions=self.config.embedding_dimensions,
+                openai_api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,
+                timeout=self.config.embeddings_timeout_seconds,
+                http_client=shared_http_client(self.config),
+            )
+            self._client_pid = os.getpid()
+        return self._client
+
+    def _embed_query_once(self, text: str, timeout: float) -> List[float]:
+        # Chamada direta ao SDK para respeitar o timeout desta tentativa
+        client = self._get_client()
+        params = {"model": client.model, "input": [text], "timeout": timeout}
+        if client.dimensions:
+            params["dimensions"] = client.dimensions
+        return client.client.create(**params).data[0].embedding
+
+    def embed_query(self, text: str, deadline: Optional[float] = None) -> List[float]:
+        return call_with_retry(
+            lambda timeout: self._embed_query_once(text, timeout),
+            self.config, self.breaker, "embeddings",
+            deadline=deadline, timeout=self.config.embeddings_timeout_seconds,
+        )
+
+    def _embed_documents_once(self, texts: List[str], timeout: float) -> List[List[float]]:
+        # Como em _embed_query_once, em lotes de `chunk_size` textos por requisição
+        client = self._get_client()
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), client.chunk_size):
+            params = {"model": client.model, "input": texts[start:start + client.chunk_size], "timeout": timeout}
+            if client.dimensions:
+                params["dimensions"] = client.dimensions
+            vectors.extend(item.embedding for item in client.client.create(**params).data)
+        return vectors
+
+    def embed_documents(self, texts: List[str], deadline: Optional[float] = None) -> List[List[float]]:
+        return call_with_retry(
+            lambda timeout: self._embed_documents_once(texts, timeout),
+            self.config, self.breaker, "embeddings",
+            deadline=deadline, timeout=self.config.embeddings_timeout_seconds,
+        )
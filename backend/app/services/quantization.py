@@ -0,0 +1,130 @@
+"""
+Índices quantizados com re-ranqueamento em precisão total.
+
+O índice FAISS em memória pode guardar os vetores em float16, int8 (scalar
+quantization) ou product quantization (PQ), reduzindo a RAM de cada worker.
+Os vetores float32 originais ficam em disco (`vectors.f32`) e são lidos via
+memmap apenas para as linhas candidatas, que recebem a distância L2 exata.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_KINDS = ("none", "float16", "int8", "pq")
+VECTORS_FILE = "vectors.f32"                   # Vetores float32 originais (linha = posição no índice)
+META_FILE = "quantization.json"                # Tipo de quantização, dimensão e número de vetores
+TRAIN_SAMPLE = 100_000                         # Vetores usados no treino do quantizador
+
+
+def make_index(dim: int, kind: str, config, train_size: int):
+    """
+    Cria um índice FAISS (ainda vazio) do tipo pedido.
+
+    PQ precisa de pontos suficientes para treinar os centróides; com poucos
+    vetores usa-se int8 no lugar.
+    """
+    import faiss
+
+    if kind not in QUANTIZATION_KINDS:
+        raise ValueError(f"Quantização desconhecida: {kind} (use {', '.join(QUANTIZATION_KINDS)})")
+    if kind == "pq":
+        if dim % config.pq_subquantizers:
+            raise ValueError(f"Dimensão {dim} não é múltipla de pq_subquantizers={config.pq_subquantizers}")
+        if train_size < 4 * (1 << config.pq_bits):
+            logger.warning(f"Poucos vetores ({train_size}) para treinar PQ; usando int8.")
+            kind = "int8"
+        else:
+            return faiss.IndexPQ(dim, config.pq_subquantizers, config.pq_bits), kind
+    if kind == "float16":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2), kind
+    if kind == "int8":
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2), kind
+    return faiss.IndexFlatL2(dim), kind
+
+
+def quantize_from_file(index_path: Path, dim: int, count: int, config, batch_size: int = 65536):
+    """
+    Cria o índice quantizado a partir dos vetores float32 gravados em
+    `index_path/vectors.f32`, que continuam no disco para o re-ranqueamento.
+
+    O arquivo é lido por memmap: o treino usa uma amostra de no máximo
+    TRAIN_SAMPLE vetores e a inserção é feita em lotes.
+
+    Returns:
+        índice FAISS quantizado
+    """
+    vectors = np.memmap(str(index_path / VECTORS_FILE), dtype="float32", mode="r", shape=(count, dim))
+    index, kind = make_index(dim, config.index_quantization, config, count)
+    if not index.is_trained:
+        sample = np.sort(np.random.default_rng(0).choice(count, min(count, TRAIN_SAMPLE), replace=False))
+        index.train(np.ascontiguousarray(vectors[sample]))
+    for start in range(0, count, batch_size):
+        index.add(np.ascontiguousarray(vectors[start:start + batch_size]))
+
+    (index_path / META_FILE).write_text(
+        json.dumps({"kind": kind, "dim": int(dim), "count": int(count)}), encoding="utf-8"
+    )
+    logger.info(f"🗜️ Índice quantizado ({kind}): {count} vetores de dimensão {dim}")
+    return index
+
+
+class FullPrecisionRescorer:
+    """
+    Recalcula distâncias L2 exatas lendo os vetores float32 do disco.
+
+    O arquivo é mapeado em memória (memmap): só as páginas das linhas
+    candidatas são lidas, e o page cache é compartilhado entre workers.
+    """
+
+    def __init__(self, path: Path, dim: int, count: int, kind: str):
+        self.kind = kind
+        self.vectors = np.memmap(str(path), dtype="float32", mode="r", shape=(count, dim))
+
+    def rescore(self, query_vector: List[float], ids: np.ndarray) -> np.ndarray:
+        """Distâncias L2 ao quadrado entre a query e as linhas `ids`."""
+        query = np.asarray(query_vector, dtype="float32")
+        diff = np.asarray(self.vectors[ids]) - query
+        return np.einsum("ij,ij->i", diff, diff)
+
+
+def load_rescorer(index_path: Path) -> Optional[FullPrecisionRescorer]:
+    """Rescorer da versão (None para índices não quantizados)."""
+    meta_path = index_path / META_FILE
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        return FullPrecisionRescorer(index_path / VECTORS_FILE, meta["dim"], meta["count"], meta["kind"])
+    except Exception as e:
+        logger.warning(f"Falha ao carregar vetores de precisão total em {index_path}: {e}")
+        return None
+
+
+def search_with_rescoring(store, rescorer: FullPrecisionRescorer, query_vector: List[float], k: int,
+                          oversample: int = 2) -> List[Tuple[object, float]]:
+    """
+    Busca `k * oversample` candidatos no índice quantizado e reordena os
+    melhores pela distância exata.
+
+    Returns:
+        List[Tuple[Document, float]]: mesmos formatos de similarity_search_with_score
+    """
+    query = np.asarray([query_vector], dtype="float32")
+    _, ids = store.index.search(query, min(k * oversample, store.index.ntotal))
+    ids = ids[0][ids[0] >= 0]
+    if ids.size == 0:
+        return []
+
+    distances = rescorer.rescore(query_vector, ids)
+    order = np.argsort(distances)[:k]
+
+    hits = []
+    for pos in order:
+        doc = store.docstore.search(store.index_to_docstore_id[int(ids[pos])])
+        hits.append((doc, float(distances[pos])))
+    return hits
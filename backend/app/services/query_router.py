@@ -0,0 +1,98 @@
+"""
+Roteamento de modelo pela complexidade da pergunta.
+
+Classificação local e barata (sem chamar nenhum modelo): tamanho da
+pergunta, palavras-chave e margem de score entre os melhores trechos
+recuperados. Consultas simples ("qual o horário da secretaria?") vão para um
+modelo menor e mais rápido, com limite de tokens menor; o resto continua no
+modelo principal.
+"""
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from .faq import l2_to_similarity
+
+logger = logging.getLogger(__name__)
+
+SIMPLE_ROUTE = "simple"
+COMPLEX_ROUTE = "complex"
+
+# Pedidos que costumam exigir explicação, comparação ou várias etapas
+COMPLEX_PATTERNS = re.compile(
+    r"\b(por ?que|porqu[eê]|como funciona|explique|explica|compar\w*|diferen[cç]a\w*|passo a passo|"
+    r"regulamento\w*|regimento|resolu[cç][aãõ]\w*|norma\w*|crit[eé]rios?|requisitos?|"
+    r"vantage\w*|desvantage\w*|detalh\w*|quais s[aã]o todos)\b",
+    re.IGNORECASE,
+)
+
+# Consultas pontuais: horário, local, contato, data, link
+SIMPLE_PATTERNS = re.compile(
+    r"\b(hor[aá]rios?|endere[cç]o|onde fica|telefone|e-?mail|contato|site|link|sala|pr[eé]dio|"
+    r"quando|que dia|data|prazo|quem [eé]|qual o nome)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class RouteDecision:
+    """Resultado do roteamento de uma pergunta"""
+    route: str
+    model: str
+    max_tokens: int
+    reasons: List[str] = field(default_factory=list)
+
+
+def score_margin(candidates: List[Tuple[Any, float]]) -> Optional[float]:
+    """Diferença de similaridade entre o 1º e o 2º candidatos (None se < 2)."""
+    if len(candidates) < 2:
+        return None
+    return l2_to_similarity(float(candidates[0][1])) - l2_to_similarity(float(candidates[1][1]))
+
+
+class QueryRouter:
+    """
+    Decide o modelo e o limite de tokens de cada pergunta.
+
+    Args:
+        config: IFSCConfig (limiares, modelos e limites de tokens)
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+    def route(self, query: str, candidates: List[Tuple[Any, float]], conversational: bool = False) -> RouteDecision:
+        """`conversational` marca mensagens sem busca ("oi", "obrigado!"), que vão para o modelo rápido."""
+        config = self.config
+        # O limite geral (ajustável em tempo de execução) também vale para o modelo rápido
+        fast_max_tokens = min(config.fast_max_response_tokens, config.max_response_tokens)
+        if conversational and config.route_enabled and config.fast_model:
+            return RouteDecision(SIMPLE_ROUTE, config.fast_model, fast_max_tokens, ["conversa"])
+        complex_reasons, simple_reasons = [], []
+
+        words = len(query.split())
+        if words > config.route_simple_max_words:
+            complex_reasons.append(f"{words} palavras")
+        if query.count("?") > 1:
+            complex_reasons.append("várias perguntas")
+        if COMPLEX_PATTERNS.search(query):
+            complex_reasons.append("termo complexo")
+
+        if SIMPLE_PATTERNS.search(query):
+            simple_reasons.append("consulta pontual")
+        margin = score_margin(candidates)
+        if margin is not None:
+            if margin >= config.route_min_score_margin:
+                simple_reasons.append(f"margem {margin:.3f}")
+            else:
+                complex_reasons.append(f"scores próximos ({margin:.3f})")
+
+        if config.route_enabled and config.fast_model and simple_reasons and not complex_reasons:
+            return RouteDecision(SIMPLE_ROUTE, config.fast_model, fast_max_tokens, simple_reasons)
+        return RouteDecision(COMPLEX_ROUTE, config.model, config.max_response_tokens, complex_reasons or ["padrão"])
+
+    def estimate_cost(self, model: str, tokens_in: int, tokens_out: int) -> float:
+        """Custo estimado da chamada (na moeda de `model_prices`)."""
+        price_in, price_out = self.config.model_prices.get(model, (0.0, 0.0))
+        return (tokens_in * price_in + tokens_out * price_out) / 1_000_000
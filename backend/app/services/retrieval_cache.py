@@ -0,0 +1,155 @@
+"""
+Cache do resultado da busca (query expandida → ids e scores dos chunks).
+
+A resposta depende do histórico da conversa e raramente pode ser
+reaproveitada, mas a busca não: para a mesma versão dos índices, a mesma
+query expandida, as mesmas coleções e o mesmo filtro produzem sempre os
+mesmos candidatos e documentos finais. O cache guarda só referências
+(coleção, id no docstore) e scores; no acerto, o texto dos chunks vem do
+docstore local e embeddings, busca e rerank são pulados.
+
+Dois níveis:
+
+- LRU em memória de cada worker (`retrieval_cache_size` entradas);
+- Redis, compartilhado entre os workers, com expiração
+  (`retrieval_cache_ttl_seconds`).
+
+A chave inclui a versão dos índices carregados, `config.config_version` e
+os parâmetros da busca: uma reindexação ou um ajuste via /admin/config faz
+as entradas antigas deixarem de ser consultadas, e elas saem pelo LRU/TTL.
+"""
+import re
+import json
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core import metrics
+from ..core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_PREFIX = "ifsc:retrieval:"
+
+# Parâmetros de IFSCConfig que mudam o resultado da busca
+KEY_FIELDS = (
+    "config_version",
+    "embeddings_model",
+    "embedding_dimensions",
+    "retriever_candidates_k",
+    "final_docs_k",
+    "rescore_oversample",
+    "adaptive_retrieval",
+    "adaptive_initial_k",
+    "adaptive_flat_spread",
+    "adaptive_rerank_skip_gap",
+)
+
+
+def normalize_query(query: str) -> str:
+    """Forma canônica da query para a chave (sem diferença de caixa, espaços e pontuação)"""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+class RetrievalCache:
+    """
+    Resultados de busca por chave (ver `key`), em LRU local e no Redis.
+
+    Args:
+        config: IFSCConfig
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._local: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, vectorstore, expanded_query: str, collections: Optional[List[str]], metadata_filter) -> str:
+        parts = {
+            "query": normalize_query(expanded_query),
+            "index": vectorstore.version,
+            "collections": sorted(vectorstore.select(collections)),
+            "filter": (
+                {name: sorted(values) for name, values in metadata_filter.values.items()}
+                if metadata_filter else None
+            ),
+            "strict": bool(metadata_filter and metadata_filter.strict),
+            "config": [getattr(self.config, name) for name in KEY_FIELDS],
+        }
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+        return f"{RETRIEVAL_PREFIX}{digest}"
+
+    # -----------------------------
+    # Níveis do cache
+    # -----------------------------
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._local[key] = entry
+            self._local.move_to_end(key)
+            while len(self._local) > self.config.retrieval_cache_size:
+                self._local.popitem(last=False)
+                metrics.incr("retrieval_cache.evictions")
+
+    def _lookup(self, key: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                self._local.move_to_end(key)
+                return entry, "local"
+        try:
+            raw = redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Cache de busca indisponível (Redis): {e}")
+            metrics.incr("retrieval_cache.errors")
+            return None, "miss"
+        if not raw:
+            return None, "miss"
+        entry = json.loads(raw)
+        self._remember(key, entry)
+        return entry, "redis"
+
+    # -----------------------------
+    # Interface
+    # -----------------------------
+    def get(self, vectorstore, key: str) -> Optional[Tuple[List[Tuple[Any, float]], List[Any], str]]:
+        """
+        Resultado guardado para a chave, com os documentos do docstore local.
+
+        Returns:
+            (candidatos com score, documentos finais, nível "local" ou "redis"),
+            ou None se não houver entrada válida
+        """
+        entry, tier = self._lookup(key)
+        docs = vectorstore.hydrate([tuple(ref) for ref in entry["refs"]]) if entry is not None else None
+        metrics.incr("retrieval_cache.lookups")
+        metrics.incr("retrieval_cache.misses" if docs is None else f"retrieval_cache.hits_{tier}")
+        if docs is not None:
+            metrics.incr("retrieval_cache.hits")
+        metrics.set_gauge("retrieval_cache.hit_rate", metrics.ratio("retrieval_cache.hits", "retrieval_cache.lookups"))
+        if docs is None:
+            return None
+
+        candidates = list(zip(docs, entry["scores"]))
+        return candidates, [docs[i] for i in entry["final"]], tier
+
+    def put(self, vectorstore, key: str, candidates: List[Tuple[Any, float]], final_docs: List[Any]):
+        """Guarda referências e scores de um resultado (ignora documentos sem id)"""
+        refs = [vectorstore.chunk_ref(doc) for doc, _ in candidates]
+        positions = {id(doc): i for i, (doc, _) in enumerate(candidates)}
+        if any(ref is None for ref in refs) or any(id(doc) not in positions for doc in final_docs):
+            return
+        entry = {
+            "refs": [list(ref) for ref in refs],
+            "scores": [float(score) for _, score in candidates],
+            "final": [positions[id(doc)] for doc in final_docs],
+        }
+        self._remember(key, entry)
+        try:
+            redis_client.set(key, json.dumps(entry), ex=self.config.retrieval_cache_ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar no cache de busca (Redis): {e}")
+            metrics.incr("retrieval_cache.errors")
@@ -0,0 +1,119 @@
+"""
+Ajustes de configuração em tempo de execução.
+
+Um admin altera parâmetros de `IFSCConfig` (ex.: baixar `max_response_tokens`
+ou o k da busca durante um incidente) sem redeploy. A alteração é gravada no
+Redis com um número de versão e anunciada por pub/sub; cada worker relê o
+Redis e aplica os valores no objeto `config` compartilhado. Workers que sobem
+depois aplicam a versão gravada na inicialização.
+
+`config.config_version` entra na chave de caches que dependem desses
+parâmetros, para que respostas geradas com a configuração antiga não sejam
+reaproveitadas.
+"""
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from redis.exceptions import WatchError
+
+from ..core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+CONFIG_KEY = "ifsc:config:overrides"
+CONFIG_VERSION_KEY = "ifsc:config:version"
+
+# Campo do ConfigUpdate → atributo de IFSCConfig
+FIELD_MAP = {
+    "temperature": "temperature",
+    "max_response_tokens": "max_response_tokens",
+    "retriever_k": "retriever_candidates_k",
+}
+
+_defaults: Dict[str, Any] = {}                 # Valores de IFSCConfig antes do primeiro ajuste
+_apply_lock = threading.Lock()                 # Listener pub/sub e requisições aplicam versões em paralelo
+
+
+def effective(config) -> Dict[str, Any]:
+    """Valores atuais dos parâmetros ajustáveis (nomes do ConfigUpdate)."""
+    return {name: getattr(config, attr) for name, attr in FIELD_MAP.items()}
+
+
+def _read() -> Dict[str, Any]:
+    data = redis_client.get(CONFIG_KEY)
+    return json.loads(data) if data else {"version": 0, "overrides": {}}
+
+
+def save_update(changes: Dict[str, Any], updated_by: Optional[str], reset: bool = False) -> Dict[str, Any]:
+    """
+    Grava uma nova versão da configuração (somando `changes` às alterações
+    anteriores, ou descartando-as se `reset`).
+
+    Leitura, soma e gravação ficam em uma transação (WATCH/MULTI): se outro
+    worker gravar no meio, a operação é refeita sobre a versão dele.
+
+    Returns:
+        Dict: {"version", "overrides", "updated_by", "updated_at"}
+    """
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(CONFIG_KEY, CONFIG_VERSION_KEY)
+                data = pipe.get(CONFIG_KEY)
+                overrides = {} if reset or not data else json.loads(data).get("overrides", {})
+                overrides.update({name: value for name, value in changes.items() if name in FIELD_MAP})
+                state = {
+                    "version": int(pipe.get(CONFIG_VERSION_KEY) or 0) + 1,
+                    "overrides": overrides,
+                    "updated_by": updated_by,
+                    "updated_at": time.time(),
+                }
+                pipe.multi()
+                pipe.set(CONFIG_VERSION_KEY, state["version"])
+                pipe.set(CONFIG_KEY, json.dumps(state))
+                pipe.execute()
+                return state
+            except WatchError:
+                continue  # outro ajuste gravado no meio: refaz sobre ele
+
+
+def apply(config, state: Dict[str, Any]) -> bool:
+    """
+    Aplica `state` em `config` se for mais novo que a versão em uso.
+
+    Parâmetros sem ajuste voltam ao valor original do IFSCConfig.
+    """
+    version = int(state.get("version", 0))
+    with _apply_lock:
+        if version <= config.config_version:
+            return False
+        if not _defaults:
+            _defaults.update({attr: getattr(config, attr) for attr in FIELD_MAP.values()})
+
+        overrides = state.get("overrides", {})
+        for name, attr in FIELD_MAP.items():
+            setattr(config, attr, overrides.get(name, _defaults[attr]))
+        config.config_version = version
+    logger.info(f"⚙️ Configuração v{version} aplicada: {effective(config)}")
+    return True
+
+
+def load_and_apply(config) -> bool:
+    """Lê a versão gravada no Redis e a aplica (usado na inicialização e no pub/sub)."""
+    try:
+        return apply(config, _read())
+    except Exception as e:
+        logger.warning(f"Não foi possível carregar a configuração do Redis: {e}")
+        return False
+
+
+def handle_config_update(payload: Dict[str, Any]):
+    """
+    Handler do canal de configuração. O Redis é a fonte da verdade: a
+    mensagem só avisa que há uma versão nova.
+    """
+    from .chat_system import config
+    load_and_apply(config)
@@ -0,0 +1,319 @@
+"""
+Busca vetorial distribuída em várias coleções (shards).
+
+Cada coleção tem um índice FAISS próprio. A consulta é vetorizada uma única
+vez, enviada em paralelo para os shards selecionados e os top-k de cada um
+são combinados por score.
+"""
+import os
+import logging
+import shutil
+import hashlib
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, Any
+
+from .ingestion import (
+    PDF_PATH,
+    discover_collections,
+    list_index_collections,
+    current_version,
+    version_path,
+    new_version,
+    publish_version,
+    build_vectorstore,
+    load_vectorstore,
+)
+from .faq import load_faq_index, best_faq_match
+from .quantization import load_rescorer, search_with_rescoring
+from .attributes import MetadataFilter, load_attribute_index, search_selected
+
+logger = logging.getLogger(__name__)
+
+# Executor compartilhado por todas as versões carregadas (sobrevive a hot swaps)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    # Threads não sobrevivem a fork: recria o executor no processo filho
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=max(4, os.cpu_count() or 1), thread_name_prefix="shard-search")
+        _executor_pid = os.getpid()
+    return _executor
+
+
+@dataclass
+class Shard:
+    """Uma coleção carregada: índice principal, versão e estruturas auxiliares"""
+    name: str
+    version: str
+    store: Any                          # FAISS (LangChain)
+    faq: Any = None                     # índice de perguntas da FAQ (opcional)
+    rescorer: Any = None                # vetores float32 em disco, se o índice é quantizado
+    attributes: Any = None              # bitmaps de atributos para pré-filtragem (opcional)
+    _doc_ids: Optional[Dict[int, str]] = field(default=None, repr=False)  # Document → id no docstore (sob demanda)
+
+    def doc_id(self, doc: Any) -> Optional[str]:
+        """Id no docstore de um documento retornado pela busca neste shard"""
+        if self._doc_ids is None:
+            store = self.store
+            self._doc_ids = {
+                id(store.docstore.search(doc_id)): doc_id for doc_id in store.index_to_docstore_id.values()
+            }
+        return self._doc_ids.get(id(doc))
+
+
+class ShardedVectorStore:
+    """
+    Conjunto de índices FAISS, um por coleção.
+
+    Args:
+        embeddings: modelo de embeddings compartilhado pelos shards
+        config: IFSCConfig (chunking e parâmetros de busca)
+    """
+
+    def __init__(self, embeddings, config):
+        self.embeddings = embeddings
+        self.config = config
+        self.shards: Dict[str, Shard] = {}
+
+    # -----------------------------
+    # Carregamento / construção
+    # -----------------------------
+    def _open_shard(self, name: str, version: str, store=None) -> Optional[Shard]:
+        """Carrega (ou completa) um shard a partir do diretório da versão"""
+        path = version_path(name, version)
+        if store is None:
+            store = load_vectorstore(path, self.embeddings)
+            if store is None:
+                return None
+        return Shard(
+            name=name,
+            version=version,
+            store=store,
+            faq=load_faq_index(path, self.embeddings),
+            rescorer=load_rescorer(path),
+            attributes=load_attribute_index(path),
+        )
+
+    def load_or_build(
+        self, build_missing: bool = True, reuse: Optional["ShardedVectorStore"] = None
+    ) -> "ShardedVectorStore":
+        """
+        Carrega a versão ativa (CURRENT) de cada coleção e, se
+        `build_missing`, constrói as coleções que ainda não têm índice.
+
+        Shards de `reuse` cuja versão não mudou são reaproveitados em vez de
+        recarregados do disco.
+        """
+        collections = discover_collections(PDF_PATH) if build_missing else {}
+        names = set(collections) | set(list_index_collections())
+
+        shards = {}
+        for name in sorted(names):
+            version = current_version(name)
+            previous = reuse.shards.get(name) if reuse is not None else None
+            if previous is not None and version and previous.version == version:
+                shards[name] = previous
+                continue
+            shard = self._open_shard(name, version) if version else None
+            if shard is None and name in collections:
+                logger.info(f"🔧 Criando índice da coleção '{name}'...")
+                shard = self._build_version(name, collections[name])
+            if shard is not None:
+                quantized = f", {shard.rescorer.kind}" if shard.rescorer else ""
+                logger.info(
+                    f"🔁 Coleção '{name}' carregada (versão {shard.version}, {shard.store.index.ntotal} vetores{quantized})"
+                )
+                shards[name] = shard
+        self.shards = shards
+        return self
+
+    def _build_version(self, name: str, files, progress=None) -> Optional[Shard]:
+        """Constrói uma nova versão do índice e publica o ponteiro CURRENT"""
+        version, path = new_version(name)
+        try:
+            store = build_vectorstore(files, self.embeddings, self.config, path, progress)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)  # versão incompleta nunca fica em disco
+            raise
+        if store is None:
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        publish_version(name, version, keep=self.config.index_versions_keep)
+        return self._open_shard(name, version, store=store)
+
+    def rebuild_shard(self, name: str, progress=None) -> bool:
+        """
+        Reconstrói o índice de uma única coleção a partir dos arquivos fonte
+        em uma nova versão e o substitui sem afetar os demais shards.
+
+        `progress` recebe os eventos de ingestion.build_vectorstore.
+        """
+        files = discover_collections(PDF_PATH).get(name)
+        if not files:
+            logger.warning(f"Coleção '{name}' não possui documentos.")
+            return False
+        shard = self._build_version(name, files, progress)
+        if shard is None:
+            return False
+        self.shards = {**self.shards, name: shard}  # troca atômica do dicionário
+        logger.info(f"✅ Coleção '{name}' reconstruída (versão {shard.version}).")
+        return True
+
+    # -----------------------------
+    # Versão e validação
+    # -----------------------------
+    @property
+    def versions(self) -> Dict[str, str]:
+        """Coleção → versão carregada"""
+        return {name: shard.version for name, shard in self.shards.items()}
+
+    @property
+    def version(self) -> str:
+        """Identificador curto do conjunto de versões carregadas"""
+        key = ",".join(f"{name}@{ver}" for name, ver in sorted(self.versions.items()))
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def has_faq(self) -> bool:
+        return any(shard.faq is not None for shard in self.shards.values())
+
+    def validate(self) -> bool:
+        """
+        Verifica se todos os shards estão íntegros: não vazios, com a mesma
+        dimensão e respondendo a uma busca de teste.
+        """
+        import numpy as np
+
+        if not self.shards:
+            return False
+        dims = {shard.store.index.d for shard in self.shards.values()}
+        if len(dims) != 1:
+            logger.error(f"Shards com dimensões diferentes: {dims}")
+            return False
+        probe = np.zeros((1, dims.pop()), dtype="float32")
+        for name, shard in self.shards.items():
+            if shard.store.index.ntotal == 0:
+                logger.error(f"Coleção '{name}' está vazia")
+                return False
+            try:
+                shard.store.index.search(probe, 1)
+            except Exception as e:
+                logger.error(f"Busca de teste falhou na coleção '{name}': {e}")
+                return False
+        return True
+
+    # -----------------------------
+    # Busca
+    # -----------------------------
+    @property
+    def names(self) -> List[str]:
+        return sorted(self.shards)
+
+    def select(self, collections: Optional[List[str]] = None) -> Dict[str, Shard]:
+        """Retorna os shards pedidos (todos, se nenhum válido for informado)"""
+        shards = self.shards
+        if not collections:
+            return shards
+        selected = {name: shards[name] for name in collections if name in shards}
+        unknown = set(collections) - set(selected)
+        if unknown:
+            logger.warning(f"Coleções desconhecidas ignoradas: {sorted(unknown)}")
+        return selected or shards
+
+    def chunk_ref(self, doc: Any) -> Optional[Tuple[str, str]]:
+        """(coleção, id no docstore) de um documento retornado pela busca"""
+        shard = self.shards.get(doc.metadata.get("collection"))
+        doc_id = shard.doc_id(doc) if shard is not None else None
+        return (shard.name, doc_id) if doc_id is not None else None
+
+    def hydrate(self, refs: List[Tuple[str, str]]) -> Optional[List[Any]]:
+        """Documentos do docstore local a partir de (coleção, id); None se algum faltar"""
+        docs = []
+        for name, doc_id in refs:
+            shard = self.shards.get(name)
+            doc = shard.store.docstore.search(doc_id) if shard is not None else None
+            if doc is None or isinstance(doc, str):  # InMemoryDocstore devolve uma mensagem se não achar
+                return None
+            docs.append(doc)
+        return docs
+
+    def faq_lookup(
+        self, query_vector: List[float], collections: Optional[List[str]] = None
+    ) -> Optional[Tuple[Any, float]]:
+        """Pergunta da FAQ mais parecida nas coleções selecionadas (e similaridade)"""
+        stores = [shard.faq for shard in self.select(collections).values() if shard.faq is not None]
+        return best_faq_match(stores, query_vector) if stores else None
+
+    def _search_shard(self, shard: Shard, query_vector: List[float], k: int,
+                      metadata_filter: Optional[MetadataFilter] = None) -> List[Tuple[Any, float]]:
+        """
+        Busca em um shard; índices quantizados são re-ranqueados em float32.
+
+        Com `metadata_filter`, só as posições com os atributos pedidos são
+        consideradas (um shard sem nenhuma nem chega a ser buscado).
+        """
+        ids = None
+        if metadata_filter:
+            if shard.attributes is None:
+                logger.warning(f"Coleção '{shard.name}' sem índice de atributos (reconstrua); filtro ignorado")
+            else:
+                ids = shard.attributes.select(metadata_filter)
+                if ids is not None and ids.size == 0:
+                    return []
+
+        if ids is not None:
+            hits = search_selected(
+                shard.store, shard.rescorer, query_vector, k, ids, oversample=self.config.rescore_oversample
+            )
+        elif shard.rescorer is not None:
+            hits = search_with_rescoring(
+                shard.store, shard.rescorer, query_vector, k, oversample=self.config.rescore_oversample
+            )
+        else:
+            hits = shard.store.similarity_search_with_score_by_vector(query_vector, k=k)
+        for doc, _ in hits:
+            doc.metadata.setdefault("collection", shard.name)
+        return hits
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int,
+        collections: Optional[List[str]] = None,
+        query_vector: Optional[List[float]] = None,
+        metadata_filter: Optional[MetadataFilter] = None,
+    ) -> List[Tuple[Any, float]]:
+        """
+        Busca os k documentos mais próximos nos shards selecionados.
+
+        A distância L2 do FAISS é comparável entre shards (mesmo modelo de
+        embeddings), então o merge é uma ordenação crescente por score.
+        `query_vector` evita recalcular o embedding quando já disponível.
+        Um filtro deduzido da pergunta que não encontra nada é descartado;
+        um filtro explícito (estrito) pode retornar lista vazia.
+        """
+        shards = list(self.select(collections).values())
+        if not shards:
+            return []
+
+        if query_vector is None:
+            query_vector = self.embeddings.embed_query(query)
+
+        def search(shard: Shard):
+            return self._search_shard(shard, query_vector, k, metadata_filter)
+
+        if len(shards) == 1:
+            results = [search(shards[0])]
+        else:
+            results = list(_get_executor().map(search, shards))
+
+        merged = [hit for hits in results for hit in hits]
+        if not merged and metadata_filter and not metadata_filter.strict:
+            logger.info(f"Filtro {metadata_filter.describe()} sem resultados; buscando sem filtro")
+            return self.similarity_search_with_score(query, k, collections, query_vector)
+        merged.sort(key=lambda hit: hit[1])
+        return merged[:k]
@@ -0,0 +1,74 @@
+"""
+Configuração do Gunicorn para produção (pre-fork)
+
+O processo pai carrega a aplicação e os índices (RAGSystem) uma única vez e
+só então cria os workers Uvicorn por fork. Os índices ficam compartilhados
+entre os workers por copy-on-write; histórico, resumos e demais caches
+mutáveis ficam no Redis.
+
+Uso:
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Reinício gracioso: `kill -HUP <pid do master>` recria os workers sem
+derrubar conexões em andamento. Para trocar apenas o índice não é preciso
+reiniciar (POST /admin/index/reload).
+"""
+import gc
+import os
+import time
+import logging
+import multiprocessing
+
+_boot_started_at = time.time()
+logger = logging.getLogger("gunicorn.error")
+
+# -----------------------------
+# Servidor
+# -----------------------------
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True                  # importa app.main no pai, antes do fork
+timeout = int(os.getenv("WORKER_TIMEOUT", 120))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+accesslog = "-"
+
+
+def _memory_line() -> str:
+    from app.core.metrics import process_memory
+
+    memory = process_memory()
+    rss = memory.get("rss_bytes", 0) / 2**20
+    pss = memory.get("pss_bytes", 0) / 2**20
+    return f"RSS={rss:.0f}MiB PSS={pss:.0f}MiB"
+
+
+# -----------------------------
+# Hooks
+# -----------------------------
+def when_ready(server):
+    """Aquece o RAGSystem no pai, congela o heap e reporta o tempo de subida."""
+    if os.getenv("PRELOAD_RAG", "true").lower() == "true":
+        try:
+            from app.services.chat_system import warm_up
+
+            warm_up()
+        except Exception as e:
+            # Sem chaves/índices o servidor sobe mesmo assim; cada worker tenta na 1ª requisição
+            logger.error(f"❌ Falha ao aquecer RAGSystem no processo pai: {e}")
+
+    # Objetos já carregados não serão mais tocados pelo GC, preservando as páginas compartilhadas
+    gc.collect()
+    gc.freeze()
+    logger.info(f"🚀 Master pronto em {time.time() - _boot_started_at:.2f}s ({_memory_line()}); {workers} workers")
+
+
+def post_worker_init(worker):
+    """Reporta a memória de cada worker depois de inicializado."""
+    logger.info(f"👷 Worker {worker.pid} pronto ({_memory_line()})")
+
+
+def worker_exit(server, worker):
+    logger.info(f"👋 Worker {worker.pid} finalizado")
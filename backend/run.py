@@ -1,5 +1,9 @@
 """
 Script para executar o servidor FastAPI
+
+- Desenvolvimento (padrão): Uvicorn em processo único, com reload
+- Produção (API_MODE=production): Gunicorn pre-fork (gunicorn.conf.py),
+  que carrega os índices no processo pai antes de criar os workers
 """
 import os
 import uvicorn
@@ -17,6 +21,7 @@ def main():
     port = int(os.getenv("API_PORT", 8000))
     reload = os.getenv("API_RELOAD", "true").lower() == "true"
     log_level = os.getenv("LOG_LEVEL", "info").lower()
+    production = os.getenv("API_MODE", "development").lower() == "production"
     
     print("🚀 Iniciando servidor IFSC Chat API...")
     print(f"🌐 Host: {host}:{port}")
@@ -29,6 +34,13 @@ def main():
     if not os.getenv("MARITACA_API_KEY"):
         print("⚠️ ATENÇÃO: MARITACA_API_KEY não está definida!")
     
+    # Produção: substitui este processo pelo master do Gunicorn
+    if production:
+        print("🏭 Modo produção: Gunicorn pre-fork")
+        backend_dir = Path(__file__).parent
+        os.chdir(backend_dir)
+        os.execvp("gunicorn", ["gunicorn", "-c", str(backend_dir / "gunicorn.conf.py"), "app.main:app"])
+
     # Executar servidor
     uvicorn.run(
         "app.main:app",
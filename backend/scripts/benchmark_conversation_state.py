@@ -0,0 +1,171 @@
+"""
+Benchmark do estado das conversas no Redis
+
+Simula N sessões simultâneas conversando por T turnos (a cada turno o
+histórico é lido e a pergunta e a resposta são acrescentadas, como faz o
+ConversationMemory) e compara a codificação antiga das mensagens
+(`json.dumps` por elemento) com a atual (`encode_message`: msgpack, com
+zlib nas mensagens longas).
+
+Relata, por formato:
+- bytes por sessão no Redis (MEMORY USAGE das chaves) e serializados;
+- tempo de codificação/decodificação por mensagem;
+- latência de leitura do histórico (LRANGE + decodificação) por turno.
+
+Sem Redis acessível (ou com --offline), mede só o tamanho serializado e os
+tempos de codificação.
+
+Uso:
+    python scripts/benchmark_conversation_state.py --sessions 10000 --turns 10 --concurrency 64
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.redis_client import REDIS_URL, decode_message, encode_message  # noqa: E402
+
+BENCH_PREFIX = "bench:conversation:"
+
+WORDS = (
+    "edital inscrição bolsa pesquisa programa pós graduação mestrado doutorado prazo "
+    "documentos orientador disciplina créditos seleção candidatos resultado matrícula "
+    "instituto física são carlos universidade laboratório projeto relatório de da do o a "
+    "para com os as que em no na é deve ser até dias conforme"
+).split()
+
+FORMATS = {
+    "json": (lambda msg: json.dumps(msg).encode("utf-8"), json.loads),
+    "msgpack": (encode_message, decode_message),
+}
+
+
+def make_turns(rng: random.Random, turns: int, question_words: int, answer_words: int):
+    """Pares (pergunta, resposta) com vocabulário parecido com o dos documentos"""
+    def text(words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(max(1, int(rng.gauss(words, words / 4)))))
+
+    return [
+        ({"role": "user", "content": text(question_words) + "?"}, {"role": "assistant", "content": text(answer_words) + "."})
+        for _ in range(turns)
+    ]
+
+
+def codec_timings(messages, encode, decode):
+    """(bytes médios, µs de codificação, µs de decodificação) por mensagem"""
+    start = time.perf_counter()
+    encoded = [encode(msg) for msg in messages]
+    encode_us = (time.perf_counter() - start) / len(messages) * 1e6
+    start = time.perf_counter()
+    for data in encoded:
+        decode(data)
+    decode_us = (time.perf_counter() - start) / len(messages) * 1e6
+    return sum(map(len, encoded)) / len(encoded), encode_us, decode_us
+
+
+def run_sessions(client, conversations, encode, decode, concurrency: int, ttl: int):
+    """Executa os turnos de todas as sessões em paralelo; retorna latências de leitura (ms)"""
+    def session(item):
+        index, turns = item
+        key = f"{BENCH_PREFIX}{index}"
+        reads = []
+        for question, answer in turns:
+            start = time.perf_counter()
+            [decode(data) for data in client.lrange(key, 0, -1)]
+            reads.append((time.perf_counter() - start) * 1000)
+            pipe = client.pipeline()
+            pipe.rpush(key, encode(question), encode(answer))
+            pipe.expire(key, ttl)
+            pipe.execute()
+        return reads
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [ms for reads in executor.map(session, enumerate(conversations)) for ms in reads]
+
+
+def clear(client):
+    for keys in _batches(client.scan_iter(f"{BENCH_PREFIX}*", count=1000), 1000):
+        client.delete(*keys)
+
+
+def _batches(iterable, size: int):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    """Executa o benchmark e imprime uma tabela comparativa"""
+    parser = argparse.ArgumentParser(description="Benchmark do estado das conversas no Redis")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=10, help="pares pergunta/resposta por sessão")
+    parser.add_argument("--question-words", type=int, default=15)
+    parser.add_argument("--answer-words", type=int, default=150)
+    parser.add_argument("--concurrency", type=int, default=32, help="sessões simultâneas")
+    parser.add_argument("--redis-url", default=REDIS_URL, help="use um banco descartável: as chaves de teste são apagadas")
+    parser.add_argument("--offline", action="store_true", help="não usa o Redis (só tamanho e codificação)")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    conversations = [make_turns(rng, args.turns, args.question_words, args.answer_words) for _ in range(args.sessions)]
+    sample = [msg for turns in conversations[:200] for pair in turns for msg in pair]
+
+    client = None
+    if not args.offline:
+        import redis
+
+        client = redis.Redis.from_url(args.redis_url)
+        try:
+            client.ping()
+        except Exception as e:
+            print(f"⚠️ Redis indisponível ({e}); medindo só a codificação")
+            client = None
+
+    print(
+        f"{args.sessions} sessões × {args.turns} turnos, {args.concurrency} simultâneas "
+        f"({2 * args.turns} mensagens por sessão)\n"
+    )
+    header = f"{'formato':<9} {'B/msg':>7} {'enc µs':>7} {'dec µs':>7} {'B/sessão serial.':>17}"
+    if client is not None:
+        header += f" {'B/sessão Redis':>15} {'leitura p50 ms':>15} {'p95 ms':>7} {'total s':>8}"
+    print(header)
+
+    for name, (encode, decode) in FORMATS.items():
+        bytes_per_msg, encode_us, decode_us = codec_timings(sample, encode, decode)
+        line = (
+            f"{name:<9} {bytes_per_msg:>7.0f} {encode_us:>7.1f} {decode_us:>7.1f} "
+            f"{bytes_per_msg * 2 * args.turns:>17.0f}"
+        )
+        if client is not None:
+            clear(client)
+            start = time.perf_counter()
+            reads = run_sessions(client, conversations, encode, decode, args.concurrency, ttl=3600)
+            elapsed = time.perf_counter() - start
+            keys = [f"{BENCH_PREFIX}{i}" for i in range(args.sessions)]
+            pipe = client.pipeline()
+            for key in keys:
+                pipe.memory_usage(key)
+            per_session = sum(usage or 0 for usage in pipe.execute()) / args.sessions
+            reads.sort()
+            line += (
+                f" {per_session:>15.0f} {statistics.median(reads):>15.3f} "
+                f"{reads[int(len(reads) * 0.95)]:>7.3f} {elapsed:>8.1f}"
+            )
+            clear(client)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark de memória da construção do índice
+
+Gera corpora sintéticos de tamanhos crescentes (TXTs) e constrói o índice de
+cada um em um processo novo, registrando o pico de RSS. Compara o pipeline
+em streaming (`ingestion.build_vectorstore`) com a construção antiga, que
+carregava todas as páginas, todos os chunks e todos os vetores de uma vez.
+
+Os embeddings são sintéticos (vetores aleatórios da dimensão pedida), então o
+benchmark não chama a API.
+
+Uso:
+    python scripts/benchmark_index_build.py --sizes 2000 8000 32000 --dim 1536
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WORDS = (
+    "edital inscrição bolsa pesquisa programa pós graduação mestrado doutorado prazo "
+    "documentos orientador disciplina créditos seleção candidatos resultado matrícula "
+    "instituto física são carlos universidade laboratório projeto relatório"
+).split()
+
+
+def make_corpus(directory: Path, chunks: int, chunk_chars: int, files: int):
+    """Escreve `files` TXTs que somam aproximadamente `chunks` chunks"""
+    import numpy as np
+
+    rng = np.random.default_rng(chunks)
+    per_file = max(1, chunks // files)
+    for index in range(files):
+        with open(directory / f"doc_{index:04d}.txt", "w", encoding="utf-8") as f:
+            for _ in range(per_file):
+                words = rng.choice(WORDS, size=chunk_chars // 10)
+                f.write(" ".join(words) + f" {rng.integers(1 << 40)}\n\n")
+
+
+class SyntheticEmbeddings:
+    """Embeddings aleatórios normalizados (listas de float, como a API)"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _vectors(self, count: int):
+        import numpy as np
+
+        vectors = np.random.default_rng(count).standard_normal((count, self.dim)).astype("float32")
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.tolist()
+
+    def embed_documents(self, texts):
+        return self._vectors(len(texts))
+
+    def embed_query(self, text):
+        return self._vectors(1)[0]
+
+
+def build_all_at_once(files, embeddings, config, index_path: Path):
+    """Construção antiga: corpus, chunks e vetores inteiros em memória"""
+    from langchain_community.vectorstores import FAISS
+    from app.services.ingestion import load_documents, split_documents
+    from app.services.dedup import deduplicate_documents
+
+    pages = load_documents(files)
+    documents = split_documents(pages, config)
+    if config.dedup_enabled:
+        documents, _ = deduplicate_documents(documents, config)
+    texts = [doc.page_content for doc in documents]
+    vectors = []
+    for start in range(0, len(texts), config.embed_batch_size):
+        vectors.extend(embeddings.embed_documents(texts[start:start + config.embed_batch_size]))
+    db = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=[d.metadata for d in documents])
+    index_path.mkdir(parents=True, exist_ok=True)
+    db.save_local(str(index_path))
+    return db
+
+
+def child(mode: str, corpus: Path, dim: int, quantization: str):
+    """Executado no processo filho: constrói e imprime o resultado em JSON"""
+    import logging
+    logging.disable(logging.INFO)
+
+    from app.services.chat_system import IFSCConfig
+    from app.services.ingestion import build_vectorstore
+
+    config = IFSCConfig(index_quantization=quantization)
+    files = sorted(corpus.glob("*.txt"))
+    embeddings = SyntheticEmbeddings(dim)
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        if mode == "streaming":
+            db = build_vectorstore(files, embeddings, config, Path(tmp) / "index")
+        else:
+            db = build_all_at_once(files, embeddings, config, Path(tmp) / "index")
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB no Linux
+    print(json.dumps({"chunks": db.index.ntotal, "seconds": time.perf_counter() - start, "peak_mib": peak_kib / 1024}))
+
+
+def run(mode: str, corpus: Path, dim: int, quantization: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--corpus", str(corpus), "--dim", str(dim),
+         "--quantization", quantization],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"❌ Falha no modo {mode}:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """Mede o pico de RSS por tamanho de corpus e imprime uma tabela"""
+    parser = argparse.ArgumentParser(description="Pico de memória da construção do índice")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 8000, 32000], help="chunks por corpus")
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--quantization", default="none")
+    parser.add_argument("--modes", nargs="+", default=["all_at_once", "streaming"])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--corpus", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, Path(args.corpus), args.dim, args.quantization)
+        return
+
+    print(f"{'chunks':>8} {'modo':<12} {'pico RSS (MiB)':>15} {'tempo (s)':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = Path(tmp)
+            make_corpus(corpus, size, chunk_chars=800, files=args.files)
+            for mode in args.modes:
+                result = run(mode, corpus, args.dim, args.quantization)
+                print(f"{result['chunks']:>8} {mode:<12} {result['peak_mib']:>15.0f} {result['seconds']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark dos tipos de quantização do índice FAISS
+
+Gera vetores sintéticos agrupados (parecidos com embeddings de texto), monta
+um índice para cada tipo e compara com o índice plano float32:
+
+- memória por milhão de chunks (tamanho serializado do índice)
+- latência média de busca
+- recall@k sem e com re-ranqueamento em precisão total
+
+Uso:
+    python scripts/benchmark_quantization.py --vectors 100000 --dim 1536
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.quantization import QUANTIZATION_KINDS, make_index, FullPrecisionRescorer  # noqa: E402
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Vetores normalizados em torno de `clusters` centros"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.35 * rng.standard_normal((count, dim)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    """Executa o benchmark e imprime uma tabela comparativa"""
+    parser = argparse.ArgumentParser(description="Benchmark de quantização do índice")
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20, help="equivale a retriever_candidates_k")
+    parser.add_argument("--oversample", type=int, default=2)
+    parser.add_argument("--pq-subquantizers", type=int, default=64)
+    parser.add_argument("--pq-bits", type=int, default=8)
+    args = parser.parse_args()
+
+    import faiss
+
+    config = SimpleNamespace(pq_subquantizers=args.pq_subquantizers, pq_bits=args.pq_bits)
+    data = synthetic_vectors(args.vectors, args.dim, clusters=max(16, args.vectors // 500), seed=1)
+    queries = data[np.random.default_rng(2).choice(len(data), args.queries, replace=False)]
+    queries = queries + 0.05 * np.random.default_rng(3).standard_normal(queries.shape).astype("float32")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vectors_path = Path(tmp) / "vectors.f32"
+        data.tofile(str(vectors_path))
+
+        truth = None
+        print(f"{'tipo':<8} {'MiB/1M chunks':>14} {'ms/busca':>9} {'recall':>7} {'recall+rescore':>15}")
+        for kind in QUANTIZATION_KINDS:
+            index, effective = make_index(args.dim, kind, config, len(data))
+            if not index.is_trained:
+                index.train(data)
+            index.add(data)
+
+            mib_per_million = faiss.serialize_index(index).nbytes / len(data) * 1_000_000 / 2**20
+
+            start = time.perf_counter()
+            _, found = index.search(queries, args.k)
+            latency_ms = (time.perf_counter() - start) / len(queries) * 1000
+            if truth is None:
+                truth = found  # índice plano = referência exata
+
+            rescorer = FullPrecisionRescorer(vectors_path, args.dim, len(data), effective)
+            _, candidates = index.search(queries, args.k * args.oversample)
+            rescored = []
+            for query, ids in zip(queries, candidates):
+                ids = ids[ids >= 0]
+                rescored.append(ids[np.argsort(rescorer.rescore(query, ids))[:args.k]])
+
+            print(
+                f"{effective:<8} {mib_per_million:>14.0f} {latency_ms:>9.3f} "
+                f"{recall_at_k(found, truth):>7.3f} {recall_at_k(np.array(rescored), truth):>15.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark do tempo de import da aplicação (orçamento de inicialização)
+
+Roda `python -X importtime -c "import app.main"` em processos novos, mostra
+os módulos e pacotes mais caros e falha (código de saída 1) se:
+
+- o import de `app.main` passar do orçamento (`--budget-ms`, melhor execução)
+- algum módulo pesado (FAISS, NumPy, OpenAI, LangChain...) for carregado no
+  import; eles devem ser carregados só no primeiro uso ou no warm_up
+
+Uso:
+    python scripts/check_import_time.py
+    python scripts/check_import_time.py --budget-ms 1500 --runs 5 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = (
+    "faiss",
+    "numpy",
+    "openai",
+    "langchain_openai",
+    "langchain_community",
+    "langchain_core",
+    "langchain_text_splitters",
+    "app.services.chat_system",
+)
+
+
+def measure(module: str):
+    """
+    Importa `module` em um processo novo com -X importtime.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: módulo → (tempo próprio, tempo acumulado) em µs
+    """
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"❌ Falha ao importar {module}:\n{result.stderr[-2000:]}")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if self_us.isdigit():
+            timings[name] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    """Mede o import e compara com o orçamento"""
+    parser = argparse.ArgumentParser(description="Tempo de import da aplicação")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3, help="execuções (vale a mais rápida)")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.runs)]
+    best = min(runs, key=lambda timings: timings.get(args.module, (0, 0))[1])
+    total_ms = best[args.module][1] / 1000
+
+    print(f"⏱️  import {args.module}: {total_ms:.0f}ms (melhor de {args.runs}; orçamento {args.budget_ms:.0f}ms)\n")
+
+    print(f"{'módulo':<50} {'acumulado (ms)':>15}")
+    ranked = sorted(best.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (_, cumulative) in [item for item in ranked if item[0] != args.module][:args.top]:
+        print(f"{name:<50} {cumulative / 1000:>15.1f}")
+
+    packages = defaultdict(int)
+    for name, (self_us, _) in best.items():
+        packages[name.split(".")[0]] += self_us
+    print(f"\n{'pacote':<30} {'próprio (ms)':>13}")
+    for name, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{name:<30} {self_us / 1000:>13.1f}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"import de {args.module} levou {total_ms:.0f}ms (orçamento {args.budget_ms:.0f}ms)")
+    heavy = [name for name in HEAVY_MODULES if name in best]
+    if heavy:
+        failures.append(f"módulos pesados carregados no import: {', '.join(heavy)}")
+
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+    print("\n✅ Dentro do orçamento")
+
+
+if __name__ == "__main__":
+    main()
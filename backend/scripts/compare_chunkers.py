@@ -0,0 +1,180 @@
+"""
+Comparação dos divisores de chunks ("recursive" × "structured")
+
+Divide os documentos com cada divisor e mede:
+
+- número de chunks e tamanho médio (tokens estimados)
+- tokens de contexto: média, por consulta, da soma dos `final_docs_k`
+  chunks recuperados (o que de fato vai para o prompt)
+- recall@k: fração das consultas em que algum dos k primeiros chunks contém
+  a resposta esperada inteira
+
+As consultas de avaliação são os pares P:/R: dos próprios documentos (a
+pergunta é a consulta, a resposta é o trecho esperado) ou um JSONL passado em
+`--queries` com {"query": ..., "expected": ...}.
+
+A recuperação usa TF-IDF (só NumPy, sem chamar a API); `--embeddings openai`
+usa os embeddings configurados em IFSCConfig.
+
+Uso:
+    python scripts/compare_chunkers.py --docs pdfs/
+    python scripts/compare_chunkers.py --docs pdfs/mestrado --queries consultas.jsonl -k 1 3 5
+"""
+import argparse
+import json
+import math
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+class TfidfRetriever:
+    """Busca por similaridade de cosseno entre vetores TF-IDF"""
+
+    def __init__(self, texts):
+        import numpy as np
+
+        tokenized = [TOKEN_PATTERN.findall(text.lower()) for text in texts]
+        df = Counter(term for tokens in tokenized for term in set(tokens))
+        self.vocab = {term: i for i, term in enumerate(df)}
+        self.idf = np.array([math.log((1 + len(texts)) / (1 + df[t])) + 1 for t in self.vocab], dtype="float32")
+        self.matrix = np.stack([self._vector(tokens) for tokens in tokenized]) if texts else None
+
+    def _vector(self, tokens):
+        import numpy as np
+
+        vector = np.zeros(len(self.vocab), dtype="float32")
+        for term, count in Counter(tokens).items():
+            if term in self.vocab:
+                vector[self.vocab[term]] = count
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def search(self, query: str, k: int):
+        import numpy as np
+
+        scores = self.matrix @ self._vector(TOKEN_PATTERN.findall(query.lower()))
+        return list(np.argsort(-scores)[:k])
+
+
+class EmbeddingRetriever:
+    """Busca com os embeddings da aplicação (chama a API)"""
+
+    def __init__(self, texts, config):
+        import numpy as np
+        from app.services.outbound import ResilientEmbeddings
+
+        self.embeddings = ResilientEmbeddings(config)
+        vectors = []
+        for start in range(0, len(texts), config.embed_batch_size):
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + config.embed_batch_size]))
+        self.matrix = np.array(vectors, dtype="float32")
+        self.matrix /= np.linalg.norm(self.matrix, axis=1, keepdims=True)
+
+    def search(self, query: str, k: int):
+        import numpy as np
+
+        vector = np.array(self.embeddings.embed_query(query), dtype="float32")
+        return list(np.argsort(-(self.matrix @ vector))[:k])
+
+
+def load_queries(pages, path):
+    """Consultas de avaliação: JSONL informado ou pares P:/R: dos documentos"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    from app.services.faq import extract_qa_pairs
+
+    return [{"query": pair.page_content, "expected": pair.metadata["answer"]} for pair in extract_qa_pairs(pages)]
+
+
+def evaluate(name, pages, queries, ks, args):
+    """Divide as páginas com o divisor `name` e calcula as métricas"""
+    from app.services.chat_system import IFSCConfig
+    from app.services.conversation_memory import estimate_tokens
+    from app.services.ingestion import split_documents
+
+    config = IFSCConfig(chunker=name)
+    chunks = split_documents(pages, config)
+    texts = [chunk.page_content for chunk in chunks]
+    normalized = [normalize(text) for text in texts]
+    tokens = [estimate_tokens(text) for text in texts]
+
+    if args.embeddings == "openai":
+        retriever = EmbeddingRetriever(texts, config)
+    else:
+        retriever = TfidfRetriever(texts)
+
+    depth = max(max(ks), config.final_docs_k)
+    hits = Counter()
+    context_tokens = 0
+    for item in queries:
+        expected = normalize(item["expected"])
+        ranked = retriever.search(item["query"], depth) if texts else []
+        context_tokens += sum(tokens[i] for i in ranked[:config.final_docs_k])
+        for k in ks:
+            if any(expected in normalized[i] for i in ranked[:k]):
+                hits[k] += 1
+
+    total = max(len(queries), 1)
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "avg_chunk_tokens": sum(tokens) / max(len(tokens), 1),
+        "avg_context_tokens": context_tokens / total,
+        "recall": {k: hits[k] / total for k in ks},
+        "with_section": sum(1 for chunk in chunks if chunk.metadata.get("section")),
+    }
+
+
+def main():
+    """Compara os divisores e imprime uma tabela (ou JSON)"""
+    parser = argparse.ArgumentParser(description="Comparação dos divisores de chunks")
+    parser.add_argument("--docs", default="pdfs", help="pasta com PDFs/TXTs (busca recursiva)")
+    parser.add_argument("--queries", help="JSONL com {query, expected}; padrão: pares P:/R: dos documentos")
+    parser.add_argument("-k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--chunkers", nargs="+", default=["recursive", "structured"])
+    parser.add_argument("--embeddings", choices=["tfidf", "openai"], default="tfidf")
+    parser.add_argument("--json", action="store_true", help="saída em JSON")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    from app.services.ingestion import _supported_files, load_documents
+
+    files = _supported_files(Path(args.docs).rglob("*"))
+    if not files:
+        sys.exit(f"❌ Nenhum PDF/TXT em {args.docs}")
+    pages = load_documents(files)
+    queries = load_queries(pages, args.queries)
+    if not queries:
+        sys.exit("❌ Nenhuma consulta de avaliação (os documentos não têm pares P:/R:; use --queries)")
+
+    results = [evaluate(name, pages, queries, args.k, args) for name in args.chunkers]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"📄 {len(files)} arquivos, {len(pages)} páginas, {len(queries)} consultas ({args.embeddings})\n")
+    recall_header = " ".join(f"{f'recall@{k}':>10}" for k in args.k)
+    print(f"{'divisor':<12} {'chunks':>7} {'tokens/chunk':>13} {'tokens contexto':>16} {recall_header} {'c/ seção':>9}")
+    for r in results:
+        recall = " ".join(f"{r['recall'][k]:>10.1%}" for k in args.k)
+        print(f"{r['chunker']:<12} {r['chunks']:>7} {r['avg_chunk_tokens']:>13.0f} "
+              f"{r['avg_context_tokens']:>16.0f} {recall} {r['with_section']:>9}")
+
+
+if __name__ == "__main__":
+    main()
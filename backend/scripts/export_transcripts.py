@@ -0,0 +1,132 @@
+"""
+Exporta as transcrições do Redis Stream para arquivos comprimidos
+
+Lê o stream `ifsc:transcripts` com um consumer group (vários exportadores
+podem rodar em paralelo sem duplicar eventos), grava cada lote em um arquivo
+novo (JSONL gzip ou Parquet) e só então confirma (XACK) e remove os eventos
+do stream. Eventos lidos mas não confirmados (ex.: exportador interrompido)
+são reprocessados na próxima execução.
+
+Uso:
+    python scripts/export_transcripts.py -o exports/            # esvazia o stream e sai
+    python scripts/export_transcripts.py -o exports/ --follow   # continua consumindo
+    python scripts/export_transcripts.py -o exports/ --format parquet  # requer pyarrow
+"""
+import argparse
+import gzip
+import json
+import os
+import socket
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.redis_client import redis_client  # noqa: E402
+from app.core.transcripts import TRANSCRIPTS_STREAM  # noqa: E402
+
+GROUP = "exporters"
+
+
+def ensure_group(stream: str):
+    """Cria o consumer group (e o stream) se ainda não existirem"""
+    try:
+        redis_client.xgroup_create(stream, GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def read_batch(stream: str, consumer: str, count: int, block_ms, pending: bool):
+    """Lê até `count` eventos; `pending` relê os já entregues e não confirmados"""
+    response = redis_client.xreadgroup(
+        GROUP, consumer, {stream: "0" if pending else ">"}, count=count, block=None if pending else block_ms
+    )
+    if not response:
+        return []
+    return response[0][1]
+
+
+def write_jsonl(path: Path, events):
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def write_parquet(path: Path, events):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("❌ --format parquet requer o pacote pyarrow (pip install pyarrow)")
+    # Campos aninhados viram JSON para manter um esquema estável
+    rows = [
+        {**event, "sources": json.dumps(event.get("sources", []), ensure_ascii=False),
+         "timings": json.dumps(event.get("timings", {}))}
+        for event in events
+    ]
+    pq.write_table(pa.Table.from_pylist(rows), str(path), compression="zstd")
+
+
+def export_batch(entries, output_dir: Path, fmt: str, stream: str) -> int:
+    """Grava o lote em um arquivo novo e confirma os eventos no stream"""
+    events = []
+    for _, fields in entries:
+        try:
+            events.append(json.loads(fields["data"]))
+        except (KeyError, TypeError, ValueError):
+            print(f"⚠️ Evento inválido ignorado: {fields!r}")
+
+    ids = [entry_id for entry_id, _ in entries]
+    if events:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        suffix = "jsonl.gz" if fmt == "jsonl" else "parquet"
+        path = output_dir / f"transcripts-{stamp}-{ids[0].replace('-', '_')}.{suffix}"
+        tmp = path.with_name(path.name + ".tmp")
+        (write_jsonl if fmt == "jsonl" else write_parquet)(tmp, events)
+        os.replace(tmp, path)  # arquivo completo ou nenhum
+        print(f"💾 {len(events)} eventos → {path}")
+
+    redis_client.xack(stream, GROUP, *ids)
+    redis_client.xdel(stream, *ids)
+    return len(events)
+
+
+def main():
+    """Consome o stream de transcrições e grava os arquivos"""
+    parser = argparse.ArgumentParser(description="Exporta transcrições do Redis Stream")
+    parser.add_argument("-o", "--output", required=True, help="diretório de saída")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--batch", type=int, default=5000, help="eventos por arquivo")
+    parser.add_argument("--follow", action="store_true", help="continua aguardando novos eventos")
+    parser.add_argument("--stream", default=TRANSCRIPTS_STREAM)
+    parser.add_argument("--consumer", default=socket.gethostname(),
+                        help="nome estável: pendências de uma execução interrompida são retomadas")
+    args = parser.parse_args()
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ensure_group(args.stream)
+
+    total = 0
+    # Primeiro os eventos pendentes deste consumidor, depois os novos
+    pending = True
+    while True:
+        entries = read_batch(args.stream, args.consumer, args.batch,
+                             block_ms=5000 if args.follow else None, pending=pending)
+        if not entries:
+            if pending:
+                pending = False
+                continue
+            if not args.follow:
+                break
+            continue
+        total += export_batch(entries, output_dir, args.format, args.stream)
+
+    print(f"✅ {total} transcrições exportadas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Worker de jobs de reconstrução de índices
+
+Processo separado dos servidores da API: consome a fila de jobs no Redis
+(enfileirados por POST /admin/index/rebuild), reconstrói as coleções pedidas
+reportando o progresso e, se pelo menos uma coleção foi reconstruída, publica
+o sinal de recarga para os servidores em execução. Ao subir, recupera os jobs
+deixados por workers que morreram no meio da execução.
+
+Uso:
+    python scripts/index_worker.py           # roda até ser interrompido
+    python scripts/index_worker.py --once    # processa um job (se houver) e sai
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("index_worker")
+
+
+def run_job(job_id: str, store) -> str:
+    """Executa um job de reconstrução e retorna o estado final"""
+    from app.services import index_jobs as jobs
+    from app.services.ingestion import PDF_PATH, discover_collections
+    from app.core.pubsub import publish, INDEX_UPDATES_CHANNEL
+
+    job = jobs.get_job(job_id)
+    if job is None or job["status"] != jobs.QUEUED or job["cancel_requested"]:
+        if job is not None and job["status"] == jobs.QUEUED:
+            jobs.update_job(job_id, status=jobs.CANCELLED, finished_at=time.time())
+        logger.info(f"⏭️ Job {job_id} ignorado (inexistente ou cancelado)")
+        return jobs.CANCELLED
+
+    available = discover_collections(PDF_PATH)
+    names = job["collections"] or sorted(available)
+    missing = [name for name in names if name not in available]
+    if missing:
+        jobs.update_job(job_id, status=jobs.FAILED, finished_at=time.time(),
+                        error=f"Coleções sem documentos: {', '.join(missing)}")
+        return jobs.FAILED
+
+    jobs.update_job(job_id, status=jobs.RUNNING, started_at=time.time(), worker=f"{os.uname().nodename}:{os.getpid()}")
+    progress = jobs.JobProgress(job_id, files_total=sum(len(available[name]) for name in names))
+    rebuilt, failed = [], []
+    try:
+        for name in names:
+            progress.start_collection(name)
+            (rebuilt if store.rebuild_shard(name, progress=progress) else failed).append(name)
+    except jobs.JobCancelled:
+        status, error = jobs.CANCELLED, None
+        logger.info(f"🛑 Job {job_id} cancelado")
+    except Exception as e:
+        status, error = jobs.FAILED, str(e)
+        logger.exception(f"❌ Job {job_id} falhou: {e}")
+    else:
+        status = jobs.FAILED if failed else jobs.SUCCEEDED
+        error = f"Falharam: {', '.join(failed)}" if failed else None
+
+    # Coleções concluídas antes de um cancelamento/falha já foram publicadas
+    # (CURRENT atualizado); os servidores precisam carregá-las também
+    receivers = 0
+    if rebuilt:
+        receivers = publish(INDEX_UPDATES_CHANNEL, {"action": "reload", "collections": rebuilt, "job_id": job_id})
+
+    fields = {"status": status, "finished_at": time.time(), "rebuilt": rebuilt, "workers_notified": receivers}
+    if error:
+        fields["error"] = error
+    jobs.update_job(job_id, progress=progress.state, **fields)
+    logger.info(f"🏁 Job {job_id}: {status} (reconstruídas: {rebuilt or 'nenhuma'}, {receivers} servidores notificados)")
+    return status
+
+
+def main():
+    """Consome a fila de jobs"""
+    parser = argparse.ArgumentParser(description="Worker de reconstrução de índices")
+    parser.add_argument("--once", action="store_true", help="Processa no máximo um job e sai")
+    args = parser.parse_args()
+
+    from app.services.chat_system import config
+    from app.services.outbound import ResilientEmbeddings
+    from app.services.vector_shards import ShardedVectorStore
+    from app.services import index_jobs as jobs
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("⚠️ ATENÇÃO: OPENAI_API_KEY não está definida!")
+        sys.exit(1)
+
+    store = ShardedVectorStore(ResilientEmbeddings(config), config)
+    jobs.recover_stale_jobs()
+    logger.info("👷 Worker de índices aguardando jobs...")
+    while True:
+        try:
+            job_id = jobs.next_job(timeout=5)
+        except Exception as e:
+            logger.warning(f"Fila indisponível ({e}); tentando de novo em 5s")
+            time.sleep(5)
+            continue
+        if job_id:
+            # Se run_job não terminar, o job fica na lista de processamento e
+            # é recuperado quando o lease expirar
+            with jobs.JobLease(job_id):
+                run_job(job_id, store)
+            jobs.finish_job(job_id)
+        if args.once:
+            break
+
+
+if __name__ == "__main__":
+    main()
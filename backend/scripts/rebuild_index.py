@@ -0,0 +1,49 @@
+"""
+Script para reconstruir os índices vetoriais das coleções
+
+Uso:
+    python scripts/rebuild_index.py                 # todas as coleções
+    python scripts/rebuild_index.py -c mestrado     # apenas uma coleção
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Adicionar o diretório backend ao path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def main():
+    """Reconstrói as coleções pedidas (ou todas)"""
+    parser = argparse.ArgumentParser(description="Reconstrói índices FAISS por coleção")
+    parser.add_argument("-c", "--collection", action="append", help="Nome da coleção (pode repetir)")
+    parser.add_argument("--no-reload", action="store_true", help="Não avisa os servidores em execução")
+    args = parser.parse_args()
+
+    from app.services.chat_system import config
+    from app.services.outbound import ResilientEmbeddings
+    from app.services.ingestion import PDF_PATH, discover_collections
+    from app.services.vector_shards import ShardedVectorStore
+    from app.core.pubsub import publish, INDEX_UPDATES_CHANNEL
+
+    if not os.getenv("OPENAI_API_KEY"):
+        print("⚠️ ATENÇÃO: OPENAI_API_KEY não está definida!")
+        sys.exit(1)
+
+    embeddings = ResilientEmbeddings(config)
+    store = ShardedVectorStore(embeddings, config)
+
+    names = args.collection or sorted(discover_collections(PDF_PATH))
+    failed = [name for name in names if not store.rebuild_shard(name)]
+    print(f"✅ Coleções reconstruídas: {len(names) - len(failed)}/{len(names)}")
+    if not args.no_reload and len(failed) < len(names):
+        receivers = publish(INDEX_UPDATES_CHANNEL, {"action": "reload", "collections": names})
+        print(f"📡 {receivers} workers notificados para carregar a nova versão")
+    if failed:
+        print(f"❌ Falharam: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
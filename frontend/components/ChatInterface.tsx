@@ -1,17 +1,23 @@
 "use client"
 
 import { useState, useEffect, useRef } from 'react'
-import { LogOut, User, Send } from 'lucide-react'
+import { LogOut, User, Send, Square } from 'lucide-react'
 import ReactMarkdown from 'react-markdown'
 import { sendMessage } from '@/lib/api'
+import { ChatSocket, QuestionCancelledError } from '@/lib/chatSocket'
+import { randomId } from '@/lib/utils'
 
 interface Message {
   id: string
   content: string
   role: 'user' | 'assistant'
   timestamp: Date
+  idempotencyKey?: string
 }
 
+// Mensagens enviadas como histórico (a pergunta atual + as 4 mais recentes)
+const HISTORY_FALLBACK_MESSAGES = 5
+
 export default function ChatInterface() {
   const [user, setUser] = useState<any>(null)
   const [message, setMessage] = useState('')
@@ -19,6 +25,9 @@ export default function ChatInterface() {
   const [isLoading, setIsLoading] = useState(false)
   const [conversationId, setConversationId] = useState<string | null>(null)
   const messagesEndRef = useRef<null | HTMLDivElement>(null)
+  // Conexão WebSocket da conversa e pergunta em andamento (para cancelar)
+  const socketRef = useRef<ChatSocket | null>(null)
+  const questionIdRef = useRef<string | null>(null)
 
   useEffect(() => {
     const userData = localStorage.getItem('user_data')
@@ -38,6 +47,51 @@ export default function ChatInterface() {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" })
   }, [messages])
 
+  useEffect(() => {
+    return () => socketRef.current?.close()
+  }, [])
+
+  // Cria ou atualiza a mensagem do assistente que está recebendo a resposta
+  const setAssistantContent = (id: string, update: (content: string) => string) => {
+    setMessages(prev => prev.some(m => m.id === id)
+      ? prev.map(m => m.id === id ? { ...m, content: update(m.content) } : m)
+      : [...prev, { id, content: update(''), role: 'assistant', timestamp: new Date() }]
+    )
+  }
+
+  // Envia pelo WebSocket; se a conexão não abrir, cai para o POST /chat
+  const askOverSocket = async (userMessage: Message, sessionId: string, assistantId: string): Promise<boolean> => {
+    if (typeof WebSocket === 'undefined') return false
+    if (!socketRef.current) socketRef.current = new ChatSocket(sessionId)
+    try {
+      await socketRef.current.connect()
+    } catch (err) {
+      console.warn('⚠️ WebSocket indisponível, usando POST /chat:', err)
+      socketRef.current = null
+      return false
+    }
+
+    questionIdRef.current = userMessage.idempotencyKey || null
+    try {
+      const answer = await socketRef.current.ask(
+        userMessage.content,
+        text => setAssistantContent(assistantId, content => content + text),
+        questionIdRef.current || undefined
+      )
+      setAssistantContent(assistantId, () => answer.response)
+    } catch (err) {
+      if (!(err instanceof QuestionCancelledError)) throw err
+      setAssistantContent(assistantId, content => (content ? content + '\n\n' : '') + '_Resposta interrompida._')
+    } finally {
+      questionIdRef.current = null
+    }
+    return true
+  }
+
+  const handleCancel = () => {
+    if (questionIdRef.current) socketRef.current?.cancel(questionIdRef.current)
+  }
+
   const handleLogout = () => {
     localStorage.removeItem('access_token')
     localStorage.removeItem('user_data')
@@ -51,14 +105,16 @@ export default function ChatInterface() {
       id: Date.now().toString(),
       content: message.trim(),
       role: 'user',
-      timestamp: new Date()
+      timestamp: new Date(),
+      idempotencyKey: randomId()
     }
 
     // Garante que já tenha um conversationId (sessão)
+    const sessionId = conversationId || randomId()
     if (!conversationId) {
-      const newId = crypto.randomUUID()
-      setConversationId(newId)
+      setConversationId(sessionId)
     }
+    const assistantId = (Date.now() + 1).toString()
 
     const newMessages = [...messages, userMessage]
     setMessages(newMessages)
@@ -66,35 +122,36 @@ export default function ChatInterface() {
     setIsLoading(true)
 
     try {
-      // Monta histórico (últimas N mensagens)
-      const history = newMessages.slice(-20).map(m => ({
+      // WebSocket: a conversa fica no servidor, então só a pergunta é enviada
+      if (await askOverSocket(userMessage, sessionId, assistantId)) return
+
+      // Monta histórico (últimas N mensagens). O backend guarda a conversa no
+      // Redis; o histórico enviado só é usado se ela tiver expirado, então
+      // bastam as mensagens recentes que entram no prompt
+      const history = newMessages.slice(-HISTORY_FALLBACK_MESSAGES).map(m => ({
         role: m.role === 'user' ? 'user' : 'assistant',
         content: m.content
       }))
 
       console.log('📤 ChatInterface -> history a enviar (len=', history.length, '):', history)
 
+      // Uma chave por mensagem: as repetições dentro de sendMessage usam a mesma
       const resp = await sendMessage(
         userMessage.content,
-        conversationId || undefined,
-        history // <-- FUNDAMENTAL
+        sessionId,
+        history, // <-- FUNDAMENTAL
+        userMessage.idempotencyKey
       )
 
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        content: resp.content,
-        role: 'assistant',
-        timestamp: new Date()
-      }
-      setMessages(prev => [...prev, assistantMessage])
+      setAssistantContent(assistantId, () => resp.content)
 
       // Se o backend retornar um session_id novo, atualiza
-      if (resp.session_id && resp.session_id !== conversationId) {
+      if (resp.session_id && resp.session_id !== sessionId) {
         setConversationId(resp.session_id)
       }
     } catch (err) {
       const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: `${assistantId}-erro`,
         content: `Erro: ${err instanceof Error ? err.message : 'Erro desconhecido'}`,
         role: 'assistant',
         timestamp: new Date()
@@ -166,7 +223,7 @@ export default function ChatInterface() {
               </div>
             ))
           )}
-          {isLoading && (
+          {isLoading && messages[messages.length - 1]?.role !== 'assistant' && (
             <div className="flex items-start gap-4 justify-start">
               <img src="/ifsc-logo.png" alt="Avatar do Bot" className="w-10 h-10 rounded-full shadow-md border" />
               <div className="bg-white border text-gray-800 max-w-xs px-5 py-3 rounded-2xl rounded-bl-none shadow-sm">
@@ -194,13 +251,23 @@ export default function ChatInterface() {
               className="w-full pl-4 pr-12 py-3 border rounded-full focus:ring-2 focus:ring-blue-500 focus:border-transparent transition-shadow"
               disabled={isLoading}
             />
-            <button 
-              onClick={handleSendMessage}
-              disabled={isLoading || !message.trim()}
-              className="absolute right-2 top-1/2 -translate-y-1/2 w-10 h-10 bg-blue-600 text-white rounded-full hover:bg-blue-700 disabled:opacity-50 disabled:cursor-not-allowed flex items-center justify-center transition-transform active:scale-90"
-            >
-              <Send className="h-5 w-5" />
-            </button>
+            {isLoading && socketRef.current ? (
+              <button
+                onClick={handleCancel}
+                title="Parar resposta"
+                className="absolute right-2 top-1/2 -translate-y-1/2 w-10 h-10 bg-gray-600 text-white rounded-full hover:bg-gray-700 flex items-center justify-center transition-transform active:scale-90"
+              >
+                <Square className="h-4 w-4" />
+              </button>
+            ) : (
+              <button 
+                onClick={handleSendMessage}
+                disabled={isLoading || !message.trim()}
+                className="absolute right-2 top-1/2 -translate-y-1/2 w-10 h-10 bg-blue-600 text-white rounded-full hover:bg-blue-700 disabled:opacity-50 disabled:cursor-not-allowed flex items-center justify-center transition-transform active:scale-90"
+              >
+                <Send className="h-5 w-5" />
+              </button>
+            )}
           </div>
         </div>
       </footer>
@@ -1,4 +1,5 @@
 import { logout } from './auth'
+import { randomId } from './utils'
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 
@@ -68,7 +69,17 @@ function getAuthHeaders(): Record<string, string> {
   return {}
 }
 
-export async function sendMessage(message: string | { content: string }, conversationId?: string, history?: { role: string, content: string }[]) {
+// Tentativas do POST /chat: falhas de rede, 409 (execução em andamento ainda
+// não terminou) e erros temporários do servidor são repetidos com a mesma
+// Idempotency-Key, então o backend devolve a resposta já gerada em vez de rodar de novo
+const SEND_MAX_ATTEMPTS = 3
+const SEND_RETRY_STATUSES = [409, 502, 503, 504]
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
+// idempotencyKey: gere uma chave por mensagem do usuário e reutilize-a se a
+// mesma mensagem for reenviada
+export async function sendMessage(message: string | { content: string }, conversationId?: string, history?: { role: string, content: string }[], idempotencyKey: string = randomId()) {
   const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
   const token = typeof window !== 'undefined' ? (localStorage.getItem('access_token') || '') : ''
 
@@ -81,27 +92,45 @@ export async function sendMessage(message: string | { content: string }, convers
   // DEBUG: log do payload
   console.log('📤 sendMessage -> POST', `${API_BASE}/chat`, 'body=', body)
 
-  try {
-    const response = await fetch(`${API_BASE}/chat`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'Authorization': `Bearer ${token}`
-      },
-      body: JSON.stringify(body)
-    })
+  for (let attempt = 1; ; attempt++) {
+    let response: Response
+    try {
+      response = await fetch(`${API_BASE}/chat`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${token}`,
+          'Idempotency-Key': idempotencyKey
+        },
+        body: JSON.stringify(body)
+      })
+    } catch (error) {
+      // Falha de rede: a pergunta pode ter chegado ao servidor
+      if (attempt < SEND_MAX_ATTEMPTS) {
+        console.warn(`⚠️ sendMessage: falha de rede, tentativa ${attempt + 1}/${SEND_MAX_ATTEMPTS}`)
+        await sleep(1000 * attempt)
+        continue
+      }
+      console.error('❌ Exceção sendMessage:', error)
+      throw error
+    }
+
+    if (SEND_RETRY_STATUSES.includes(response.status) && attempt < SEND_MAX_ATTEMPTS) {
+      console.warn(`⚠️ sendMessage: HTTP ${response.status}, tentativa ${attempt + 1}/${SEND_MAX_ATTEMPTS}`)
+      await sleep(1000 * attempt)
+      continue
+    }
 
     // Lança erro para status não OK
     if (!response.ok) {
       const text = await response.text()
-      throw new Error(`HTTP ${response.status}: ${text}`)
+      const error = new Error(`HTTP ${response.status}: ${text}`)
+      console.error('❌ Exceção sendMessage:', error)
+      throw error
     }
 
     const data = await response.json()
     console.log('📡 /chat status:', response.status)
     return data
-  } catch (error) {
-    console.error('❌ Exceção sendMessage:', error)
-    throw error
   }
-}
\ No newline at end of file
+}
@@ -0,0 +1,142 @@
+import { randomId } from './utils'
+
+const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+
+// Cliente do chat via WebSocket (GET /chat/ws). A conexão é autenticada uma
+// única vez pela primeira mensagem e a conversa fica no servidor: cada
+// pergunta envia só o texto, e a resposta chega em trechos ("token")
+
+export interface SocketAnswer {
+  response: string
+  sources: string[]
+  response_type?: string
+  degraded: string[]
+  processing_time: number
+}
+
+export class QuestionCancelledError extends Error {
+  constructor() {
+    super('Pergunta cancelada')
+    this.name = 'QuestionCancelledError'
+    Object.setPrototypeOf(this, QuestionCancelledError.prototype)  // instanceof com target ES5
+  }
+}
+
+interface PendingQuestion {
+  onToken: (text: string) => void
+  resolve: (answer: SocketAnswer) => void
+  reject: (error: Error) => void
+}
+
+// Tempo máximo para a conexão ficar pronta (abertura + autenticação)
+const CONNECT_TIMEOUT_MS = 10000
+
+function socketUrl(conversationId?: string): string {
+  const url = `${API_BASE_URL.replace(/^http/, 'ws')}/chat/ws`
+  return conversationId ? `${url}?conversation_id=${encodeURIComponent(conversationId)}` : url
+}
+
+export class ChatSocket {
+  private ws: WebSocket | null = null
+  private ready: Promise<string> | null = null
+  private pending = new Map<string, PendingQuestion>()
+
+  constructor(private conversationId?: string) {}
+
+  // Abre a conexão (se ainda não estiver aberta) e resolve com o id da conversa
+  connect(): Promise<string> {
+    if (this.ready) return this.ready
+
+    this.ready = new Promise<string>((resolve, reject) => {
+      const token = localStorage.getItem('access_token') || ''
+      const ws = new WebSocket(socketUrl(this.conversationId))
+      this.ws = ws
+      let settled = false
+      let timer: ReturnType<typeof setTimeout> | undefined
+
+      const fail = (error: Error) => {
+        clearTimeout(timer)
+        if (!settled) {
+          settled = true
+          reject(error)
+        }
+        if (this.ws === ws) this.reset(error)  // ignora eventos de uma conexão já substituída
+        ws.close()
+      }
+      timer = setTimeout(() => fail(new Error('Tempo esgotado ao conectar ao chat')), CONNECT_TIMEOUT_MS)
+
+      // O token vai na primeira mensagem, não na URL (que aparece nos logs de acesso)
+      ws.onopen = () => ws.send(JSON.stringify({ type: 'auth', token, conversation_id: this.conversationId }))
+      ws.onerror = () => fail(new Error('Falha na conexão com o chat'))
+      ws.onclose = (event) => fail(new Error(event.reason || `Conexão encerrada (${event.code})`))
+      ws.onmessage = (event) => {
+        const data = JSON.parse(event.data)
+        if (data.type === 'ready') {
+          clearTimeout(timer)
+          settled = true
+          this.conversationId = data.conversation_id
+          resolve(data.conversation_id)
+          return
+        }
+        this.dispatch(data)
+      }
+    })
+    return this.ready
+  }
+
+  // Envia uma pergunta; `onToken` recebe os trechos da resposta conforme chegam
+  async ask(message: string, onToken: (text: string) => void, id: string = randomId()): Promise<SocketAnswer> {
+    await this.connect()
+    return new Promise<SocketAnswer>((resolve, reject) => {
+      this.pending.set(id, { onToken, resolve, reject })
+      this.ws!.send(JSON.stringify({ type: 'message', id, message }))
+    })
+  }
+
+  // Interrompe a pergunta; o servidor responde com "cancelled"
+  cancel(id: string) {
+    if (this.pending.has(id) && this.ws?.readyState === WebSocket.OPEN) {
+      this.ws.send(JSON.stringify({ type: 'cancel', id }))
+    }
+  }
+
+  close() {
+    const ws = this.ws
+    this.reset(new Error('Conexão encerrada'))
+    ws?.close()
+  }
+
+  private dispatch(data: any) {
+    const question = data.id ? this.pending.get(data.id) : undefined
+    if (!question) {
+      if (data.type === 'error') console.warn('⚠️ ChatSocket:', data.detail)
+      return
+    }
+    switch (data.type) {
+      case 'token':
+        question.onToken(data.text)
+        break
+      case 'done':
+        this.pending.delete(data.id)
+        question.resolve(data)
+        break
+      case 'cancelled':
+        this.pending.delete(data.id)
+        question.reject(new QuestionCancelledError())
+        break
+      case 'error':
+        this.pending.delete(data.id)
+        question.reject(new Error(data.detail))
+        break
+    }
+  }
+
+  // Conexão perdida: falha as perguntas em andamento; a próxima reconecta
+  private reset(error: Error) {
+    this.ws = null
+    this.ready = null
+    const pending = this.pending
+    this.pending = new Map()
+    pending.forEach(question => question.reject(error))
+  }
+}